@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Actuator Power, Thermal Rise and Saturation (T-CTL-083, Mode E)
+
+Purpose
+-------
+Reduce Mode E actuator logs (supply voltage, current, temperature, command) to the
+power-budget, thermal and saturation figures required by
+docs/21_Actuator_Authority_and_Power_Budget.md sections 4–6:
+- energy (J), mean / RMS / peak electrical power (W) and duty cycle
+- supply voltage range, RMS and peak current
+- temperature rise (°C) with a 63% rise time and a first-order time-constant fit
+- command saturation events with their run-lengths
+
+Each channel is optional. Anything whose columns are not given is left blank in the
+summary and reported as "not measured" by delta_report_generator.py (no inference).
+
+Method
+------
+One streaming pass per input file; samples are never held in memory.
+- Power is instantaneous P = V * I. Time integrals (energy, mean voltage, RMS current,
+  RMS power) use the trapezoid rule on the sample timestamps, so irregular sampling is
+  handled. Means and RMS values are time-weighted over the log duration.
+- Duty cycle: fraction of time with |P| > --active-power-w (sample-and-hold from each
+  sample to the next).
+- Saturation: a sample is saturated when |command| >= --command-limit. A run starts at
+  the first saturated sample and ends at the next unsaturated sample; its duration is
+  the time in between.
+- Temperature is averaged into --thermal-bin-s time bins. From that trace:
+  * temp_rise_c = max - reference (the --ambient-temp-c if given, else the first bin)
+  * t63_s = time from the first bin until 63.2% of the rise (linear interpolation)
+  * fit_tau_s: least-squares fit of T(t) = T_final - dT * exp(-t / tau). For each tau
+    the best (T_final, dT) is a linear fit, and tau is found by golden-section search
+    on log(tau). It is left blank when the optimum sits at the search bound (the trace
+    is too short to resolve the time constant).
+
+Chunks and merging
+------------------
+A log split into files (in time order) gives the same result as one file: each file is
+reduced separately (in parallel with --workers) and the results are merged. The seam
+interval between consecutive files is integrated, and a saturation run that spans a
+file boundary is counted once. Unfinished state can be saved with --save-state and
+passed back later as an --input, so long closed-loop runs can be merged day by day
+without re-reading raw data.
+
+Outputs
+-------
+- processed/actuator_power_summary.csv        (one row; read by delta_report_generator.py)
+- processed/actuator_saturation_events.csv    (one row per saturation run)
+- processed/actuator_thermal_trace.csv        (binned temperature; only with --temp-col)
+
+Usage Example
+-------------
+python3 actuator_power_metrics.py \
+  --input results/T-CTL-083/RUN_YYYY-MM-DD_XYZ/raw/actuator_part1.csv \
+  --input results/T-CTL-083/RUN_YYYY-MM-DD_XYZ/raw/actuator_part2.csv \
+  --output results/T-CTL-083/RUN_YYYY-MM-DD_XYZ/processed \
+  --time-col time_s \
+  --voltage-col supply_v --current-col supply_a --active-power-w 0.5 \
+  --temp-col driver_temp_c --ambient-temp-c 22.5 \
+  --command-col cmd_v --command-limit 9.5 \
+  --workers 2
+
+Notes
+-----
+- Input files must be given in time order and timestamps must be strictly increasing,
+  also across files.
+- Power is electrical input power at the measurement point (driver supply or actuator
+  terminals, whichever you log); state which in the run package README.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analysis_io import open_text_read, process_pool, write_csv, write_text
+
+STATE_VERSION = 1
+RISE_FRACTION = 1.0 - math.exp(-1.0)  # 63.2%
+GOLDEN = (math.sqrt(5.0) - 1.0) / 2.0
+
+# (t, voltage, current, temperature, command); absent channels are None.
+Sample = Tuple[float, Optional[float], Optional[float], Optional[float], Optional[float]]
+
+
+@dataclass(frozen=True)
+class ActuatorConfig:
+    time_col: str
+    voltage_col: Optional[str] = None
+    current_col: Optional[str] = None
+    temp_col: Optional[str] = None
+    command_col: Optional[str] = None
+    active_power_w: Optional[float] = None
+    command_limit: Optional[float] = None
+    thermal_bin_s: float = 1.0
+
+    @property
+    def has_power(self) -> bool:
+        return self.voltage_col is not None and self.current_col is not None
+
+    def columns(self) -> List[Optional[str]]:
+        return [self.voltage_col, self.current_col, self.temp_col, self.command_col]
+
+
+class ActuatorAccumulator:
+    """
+    Streaming reducer for one contiguous log segment. feed() samples in time order,
+    then merge() later segments into it; summary_row() reports the result.
+    """
+
+    def __init__(self, cfg: ActuatorConfig) -> None:
+        self.cfg = cfg
+        self.n_segments = 1  # raw log files reduced into this accumulator
+        self.n_samples = 0
+        self.first: Optional[Sample] = None
+        self.last: Optional[Sample] = None
+        # Trapezoid time integrals
+        self.int_v = 0.0
+        self.int_i2 = 0.0
+        self.int_p = 0.0
+        self.int_p2 = 0.0
+        self.active_s = 0.0
+        self.saturated_s = 0.0
+        # Extremes
+        self.v_min = math.inf
+        self.v_max = -math.inf
+        self.i_peak_abs = 0.0
+        self.p_peak = -math.inf
+        self.temp_max = -math.inf
+        # Temperature bins: bin index -> [sum, n]
+        self.temp_bins: Dict[int, List[float]] = {}
+        # Saturation runs: [start_s, end_s or None while open, n_samples, peak_abs_command]
+        self.runs: List[List[Optional[float]]] = []
+        self.saturated_samples = 0
+
+    def _is_saturated(self, cmd: Optional[float]) -> bool:
+        return cmd is not None and abs(cmd) >= self.cfg.command_limit  # type: ignore[operator]
+
+    def _interval(self, a: Sample, b: Sample) -> None:
+        t0, v0, i0, _, c0 = a
+        t1, v1, i1, _, _ = b
+        dt = t1 - t0
+        if dt <= 0:
+            raise ValueError(f"Time must be strictly increasing: {t1!r} after {t0!r}")
+        if v0 is not None:
+            self.int_v += 0.5 * (v0 + v1) * dt  # type: ignore[operator]
+        if i0 is not None:
+            self.int_i2 += 0.5 * (i0 * i0 + i1 * i1) * dt  # type: ignore[operator]
+        if v0 is not None and i0 is not None:
+            p0 = v0 * i0
+            p1 = v1 * i1  # type: ignore[operator]
+            self.int_p += 0.5 * (p0 + p1) * dt
+            self.int_p2 += 0.5 * (p0 * p0 + p1 * p1) * dt
+            if abs(p0) > self.cfg.active_power_w:  # type: ignore[operator]
+                self.active_s += dt
+        if self._is_saturated(c0):
+            self.saturated_s += dt
+
+    def feed(self, s: Sample) -> None:
+        if self.last is not None:
+            self._interval(self.last, s)
+        else:
+            self.first = s
+        self.last = s
+        self.n_samples += 1
+
+        t, v, i, temp, cmd = s
+        if v is not None:
+            self.v_min = min(self.v_min, v)
+            self.v_max = max(self.v_max, v)
+        if i is not None:
+            self.i_peak_abs = max(self.i_peak_abs, abs(i))
+        if v is not None and i is not None:
+            self.p_peak = max(self.p_peak, v * i)
+        if temp is not None:
+            self.temp_max = max(self.temp_max, temp)
+            acc = self.temp_bins.setdefault(int(math.floor(t / self.cfg.thermal_bin_s)), [0.0, 0])
+            acc[0] += temp
+            acc[1] += 1
+        if cmd is not None:
+            runs = self.runs
+            is_open = bool(runs) and runs[-1][1] is None
+            if self._is_saturated(cmd):
+                self.saturated_samples += 1
+                if is_open:
+                    runs[-1][2] += 1  # type: ignore[operator]
+                    runs[-1][3] = max(runs[-1][3], abs(cmd))  # type: ignore[type-var]
+                else:
+                    runs.append([t, None, 1, abs(cmd)])
+            elif is_open:
+                runs[-1][1] = t
+
+    def feed_many(self, samples: Iterable[Sample]) -> None:
+        for s in samples:
+            self.feed(s)
+
+    def merge(self, other: "ActuatorAccumulator") -> None:
+        """
+        Append a later segment: integrate the seam interval, add both segments'
+        integrals and join a saturation run that spans the boundary.
+        """
+        n_segments = self.n_segments + other.n_segments
+        if other.first is None:
+            self.n_segments = n_segments
+            return
+        if self.last is None:
+            self.__dict__.update(other.__dict__)
+            self.n_segments = n_segments
+            return
+        self._interval(self.last, other.first)
+
+        self.n_segments = n_segments
+        self.n_samples += other.n_samples
+        self.int_v += other.int_v
+        self.int_i2 += other.int_i2
+        self.int_p += other.int_p
+        self.int_p2 += other.int_p2
+        self.active_s += other.active_s
+        self.saturated_s += other.saturated_s
+        self.v_min = min(self.v_min, other.v_min)
+        self.v_max = max(self.v_max, other.v_max)
+        self.i_peak_abs = max(self.i_peak_abs, other.i_peak_abs)
+        self.p_peak = max(self.p_peak, other.p_peak)
+        self.temp_max = max(self.temp_max, other.temp_max)
+        for k, (sm, n) in other.temp_bins.items():
+            acc = self.temp_bins.setdefault(k, [0.0, 0])
+            acc[0] += sm
+            acc[1] += n
+        self.saturated_samples += other.saturated_samples
+
+        rest = other.runs
+        if self.runs and self.runs[-1][1] is None:
+            head = self.runs[-1]
+            if rest and rest[0][0] == other.first[0]:
+                # Saturated across the seam: one run.
+                head[1] = rest[0][1]
+                head[2] += rest[0][2]  # type: ignore[operator]
+                head[3] = max(head[3], rest[0][3])  # type: ignore[type-var]
+                rest = rest[1:]
+            else:
+                head[1] = other.first[0]
+        self.runs.extend([list(r) for r in rest])
+        self.last = other.last
+
+    def to_state(self) -> Dict[str, object]:
+        cfg = self.cfg
+        return {
+            "state_version": STATE_VERSION,
+            "channels": cfg.columns(),
+            "active_power_w": cfg.active_power_w,
+            "command_limit": cfg.command_limit,
+            "thermal_bin_s": cfg.thermal_bin_s,
+            "n_segments": self.n_segments,
+            "n_samples": self.n_samples,
+            "first": self.first,
+            "last": self.last,
+            "integrals": [self.int_v, self.int_i2, self.int_p, self.int_p2, self.active_s, self.saturated_s],
+            # JSON has no infinities; empty extremes are stored as null.
+            "extremes": [None if math.isinf(x) else x for x in (self.v_min, self.v_max, self.p_peak, self.temp_max)],
+            "i_peak_abs": self.i_peak_abs,
+            "temp_bins": [[k, sm, n] for k, (sm, n) in sorted(self.temp_bins.items())],
+            "runs": self.runs,
+            "saturated_samples": self.saturated_samples,
+        }
+
+    @classmethod
+    def from_state(cls, cfg: ActuatorConfig, state: Dict[str, object], *, path: str) -> "ActuatorAccumulator":
+        if state.get("state_version") != STATE_VERSION:
+            raise ValueError(f"Unsupported actuator state version in {path}")
+        if state.get("channels") != cfg.columns():
+            raise ValueError(f"Channel columns in {path} {state.get('channels')} do not match the current --*-col arguments.")
+        saved = (state.get("active_power_w"), state.get("command_limit"), state.get("thermal_bin_s"))
+        if saved != (cfg.active_power_w, cfg.command_limit, cfg.thermal_bin_s):
+            # Duty cycle, saturation runs and temperature bins were computed with the saved values.
+            raise ValueError(
+                f"Saved (active_power_w, command_limit, thermal_bin_s) {saved} in {path} "
+                f"do not match the current arguments."
+            )
+        a = cls(cfg)
+        a.n_segments = int(state.get("n_segments", 1))  # states saved before n_segments was stored
+        a.n_samples = int(state["n_samples"])
+        a.first = tuple(state["first"]) if state["first"] is not None else None  # type: ignore[assignment]
+        a.last = tuple(state["last"]) if state["last"] is not None else None  # type: ignore[assignment]
+        a.int_v, a.int_i2, a.int_p, a.int_p2, a.active_s, a.saturated_s = (float(x) for x in state["integrals"])
+        v_min, v_max, p_peak, temp_max = state["extremes"]
+        a.v_min = math.inf if v_min is None else float(v_min)
+        a.v_max = -math.inf if v_max is None else float(v_max)
+        a.p_peak = -math.inf if p_peak is None else float(p_peak)
+        a.temp_max = -math.inf if temp_max is None else float(temp_max)
+        a.i_peak_abs = float(state["i_peak_abs"])
+        a.temp_bins = {int(k): [float(sm), int(n)] for k, sm, n in state["temp_bins"]}
+        a.runs = [list(r) for r in state["runs"]]
+        a.saturated_samples = int(state["saturated_samples"])
+        return a
+
+    def thermal_trace(self) -> List[Tuple[float, float, int]]:
+        """
+        (bin centre time s, mean temperature, n samples) in time order.
+        """
+        b = self.cfg.thermal_bin_s
+        return [((k + 0.5) * b, sm / n, int(n)) for k, (sm, n) in sorted(self.temp_bins.items())]
+
+    def closed_runs(self) -> List[Tuple[float, float, int, float, bool]]:
+        """
+        Saturation runs as (start_s, end_s, n_samples, peak_abs_command, open_at_end).
+        A run still open at the end of the data is closed at the last timestamp.
+        """
+        t_end = self.last[0] if self.last is not None else 0.0
+        return [
+            (float(r[0]), float(t_end if r[1] is None else r[1]), int(r[2]), float(r[3]), r[1] is None)  # type: ignore[arg-type]
+            for r in self.runs
+        ]
+
+
+def _t63(trace: List[Tuple[float, float, int]], reference: float, rise: float) -> Optional[float]:
+    if rise <= 0:
+        return None
+    target = reference + RISE_FRACTION * rise
+    t0 = trace[0][0]
+    prev_t, prev_y = trace[0][0], trace[0][1]
+    if prev_y >= target:
+        return 0.0
+    for t, y, _ in trace[1:]:
+        if y >= target:
+            return (prev_t - t0) + (target - prev_y) / (y - prev_y) * (t - prev_t)
+        prev_t, prev_y = t, y
+    return None
+
+
+def _fit_at_tau(s: List[float], y: List[float], tau: float) -> Tuple[float, float, float]:
+    """
+    Least squares y = c - d * exp(-s / tau) for fixed tau. Returns (sse, c, d).
+    """
+    e = [math.exp(-si / tau) for si in s]
+    n = len(s)
+    me = sum(e) / n
+    my = sum(y) / n
+    see = sum((ei - me) ** 2 for ei in e)
+    if see <= 0:
+        return math.inf, my, 0.0
+    slope = sum((ei - me) * (yi - my) for ei, yi in zip(e, y)) / see
+    c = my - slope * me
+    sse = sum((yi - c - slope * ei) ** 2 for ei, yi in zip(e, y))
+    return sse, c, -slope
+
+
+def fit_first_order(trace: List[Tuple[float, float, int]], bin_s: float) -> Optional[Tuple[float, float, float]]:
+    """
+    Fit T(t) = T_final - dT * exp(-t / tau) to the binned trace. Returns
+    (tau_s, T_final, rms_residual) or None if tau is not resolved by the data.
+    """
+    if len(trace) < 4:
+        return None
+    t0 = trace[0][0]
+    s = [t - t0 for t, _, _ in trace]
+    y = [v for _, v, _ in trace]
+    lo, hi = math.log(bin_s), math.log(10.0 * max(s[-1], bin_s))
+    a, b = lo, hi
+    x1 = b - GOLDEN * (b - a)
+    x2 = a + GOLDEN * (b - a)
+    f1 = _fit_at_tau(s, y, math.exp(x1))[0]
+    f2 = _fit_at_tau(s, y, math.exp(x2))[0]
+    while b - a > 1e-6:
+        if f1 <= f2:
+            b, x2, f2 = x2, x1, f1
+            x1 = b - GOLDEN * (b - a)
+            f1 = _fit_at_tau(s, y, math.exp(x1))[0]
+        else:
+            a, x1, f1 = x1, x2, f2
+            x2 = a + GOLDEN * (b - a)
+            f2 = _fit_at_tau(s, y, math.exp(x2))[0]
+    x = 0.5 * (a + b)
+    if x - lo < 1e-3 or hi - x < 1e-3:
+        return None
+    tau = math.exp(x)
+    sse, c, _ = _fit_at_tau(s, y, tau)
+    return tau, c, math.sqrt(sse / len(s))
+
+
+SUMMARY_COLUMNS = [
+    "n_segments",
+    "n_samples",
+    "t_start_s",
+    "t_end_s",
+    "duration_s",
+    "voltage_mean_v",
+    "voltage_min_v",
+    "voltage_max_v",
+    "current_rms_a",
+    "current_peak_abs_a",
+    "energy_j",
+    "mean_power_w",
+    "rms_power_w",
+    "peak_power_w",
+    "active_power_threshold_w",
+    "duty_cycle",
+    "ambient_temp_c",
+    "temp_start_c",
+    "temp_end_c",
+    "temp_max_c",
+    "temp_rise_c",
+    "temp_rise_reference",
+    "t63_s",
+    "fit_tau_s",
+    "fit_temp_final_c",
+    "fit_rms_residual_c",
+    "command_limit",
+    "saturation_events",
+    "saturated_samples",
+    "saturated_time_s",
+    "saturated_fraction",
+    "max_saturation_s",
+    "mean_saturation_s",
+]
+
+
+def summary_row(acc: ActuatorAccumulator, ambient_temp_c: Optional[float]) -> List[object]:
+    cfg = acc.cfg
+    if acc.first is None or acc.last is None or acc.n_samples < 2:
+        raise ValueError("Need at least 2 samples in total.")
+    t_start, t_end = acc.first[0], acc.last[0]
+    dur = t_end - t_start
+    row: Dict[str, object] = {k: "" for k in SUMMARY_COLUMNS}
+    row.update(n_segments=acc.n_segments, n_samples=acc.n_samples, t_start_s=t_start, t_end_s=t_end, duration_s=dur)
+
+    if cfg.voltage_col is not None:
+        row.update(voltage_mean_v=acc.int_v / dur, voltage_min_v=acc.v_min, voltage_max_v=acc.v_max)
+    if cfg.current_col is not None:
+        row.update(current_rms_a=math.sqrt(acc.int_i2 / dur), current_peak_abs_a=acc.i_peak_abs)
+    if cfg.has_power:
+        row.update(
+            energy_j=acc.int_p,
+            mean_power_w=acc.int_p / dur,
+            rms_power_w=math.sqrt(max(acc.int_p2, 0.0) / dur),
+            peak_power_w=acc.p_peak,
+            active_power_threshold_w=cfg.active_power_w,
+            duty_cycle=acc.active_s / dur,
+        )
+
+    if cfg.temp_col is not None:
+        trace = acc.thermal_trace()
+        start = trace[0][1]
+        reference = start if ambient_temp_c is None else ambient_temp_c
+        rise = acc.temp_max - reference
+        t63 = _t63(trace, reference, rise)
+        fit = fit_first_order(trace, cfg.thermal_bin_s)
+        row.update(
+            ambient_temp_c="" if ambient_temp_c is None else ambient_temp_c,
+            temp_start_c=start,
+            temp_end_c=trace[-1][1],
+            temp_max_c=acc.temp_max,
+            temp_rise_c=rise,
+            temp_rise_reference="start" if ambient_temp_c is None else "ambient",
+            t63_s="" if t63 is None else t63,
+        )
+        if fit is not None:
+            row.update(fit_tau_s=fit[0], fit_temp_final_c=fit[1], fit_rms_residual_c=fit[2])
+
+    if cfg.command_col is not None:
+        runs = acc.closed_runs()
+        durations = [r[1] - r[0] for r in runs]
+        row.update(
+            command_limit=cfg.command_limit,
+            saturation_events=len(runs),
+            saturated_samples=acc.saturated_samples,
+            saturated_time_s=acc.saturated_s,
+            saturated_fraction=acc.saturated_s / dur,
+            max_saturation_s=max(durations) if durations else 0.0,
+            mean_saturation_s=sum(durations) / len(durations) if durations else 0.0,
+        )
+    return [row[k] for k in SUMMARY_COLUMNS]
+
+
+def _iter_samples(path: str, cfg: ActuatorConfig) -> Iterable[Sample]:
+    with open_text_read(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        wanted = [cfg.time_col] + [c for c in cfg.columns() if c is not None]
+        missing = [c for c in wanted if c not in header]
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {missing}. Found: {header}")
+        idx = [header.index(cfg.time_col)] + [header.index(c) if c is not None else -1 for c in cfg.columns()]
+        names = [cfg.time_col] + cfg.columns()
+        prev_t = -math.inf
+        for r, row in enumerate(reader):
+            if not row:
+                continue
+            vals: List[Optional[float]] = []
+            for j, col in zip(idx, names):
+                if j < 0:
+                    vals.append(None)
+                    continue
+                try:
+                    v = float(row[j])
+                except Exception as e:
+                    raise ValueError(
+                        f"Non-numeric value in {path} at row {r+2} col '{col}': {row[j] if j < len(row) else None!r}"
+                    ) from e
+                if not math.isfinite(v):
+                    raise ValueError(f"Non-finite value in {path} at row {r+2} col '{col}': {v!r}")
+                vals.append(v)
+            if vals[0] <= prev_t:  # type: ignore[operator]
+                raise ValueError(f"Time column must be strictly increasing in {path} at row {r+2}: {vals[0]!r}")
+            prev_t = vals[0]  # type: ignore[assignment]
+            yield (vals[0], vals[1], vals[2], vals[3], vals[4])  # type: ignore[misc]
+
+
+def _reduce_segment(args: Tuple[str, ActuatorConfig]) -> ActuatorAccumulator:
+    path, cfg = args
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return ActuatorAccumulator.from_state(cfg, json.load(f), path=path)
+    acc = ActuatorAccumulator(cfg)
+    acc.feed_many(_iter_samples(path, cfg))
+    if acc.n_samples == 0:
+        raise ValueError(f"No data rows in {path}")
+    return acc
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Reduce Mode E actuator logs to power, thermal-rise and saturation metrics.")
+    ap.add_argument(
+        "--input",
+        action="append",
+        required=True,
+        help="Actuator log CSV segment (.csv/.csv.gz) or saved state (.json), in time order. Can be repeated.",
+    )
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--time-col", required=True, help="Time column name (seconds).")
+    ap.add_argument("--voltage-col", default=None, help="Supply/terminal voltage column (V).")
+    ap.add_argument("--current-col", default=None, help="Current column (A).")
+    ap.add_argument(
+        "--active-power-w",
+        type=float,
+        default=None,
+        help="Duty cycle counts time with |P| above this (W). Required with --voltage-col and --current-col.",
+    )
+    ap.add_argument("--temp-col", default=None, help="Actuator/driver temperature column (°C).")
+    ap.add_argument("--ambient-temp-c", type=float, default=None, help="Measured ambient temperature; rise is taken from it.")
+    ap.add_argument("--thermal-bin-s", type=float, default=1.0, help="Temperature averaging bin (s). Default: 1.0")
+    ap.add_argument("--command-col", default=None, help="Actuator command column (command units).")
+    ap.add_argument("--command-limit", type=float, default=None, help="Saturation when |command| >= this. Required with --command-col.")
+    ap.add_argument("--workers", type=int, default=1, help="Segments reduced in parallel. Default: 1")
+    ap.add_argument(
+        "--save-state",
+        default=None,
+        help="Optional path to save the merged state (.json) for merging with later segments.",
+    )
+
+    args = ap.parse_args(argv)
+    if args.temp_col is None and args.voltage_col is None and args.current_col is None and args.command_col is None:
+        raise ValueError("Give at least one of --voltage-col, --current-col, --temp-col, --command-col.")
+    has_power = args.voltage_col is not None and args.current_col is not None
+    if has_power and args.active_power_w is None:
+        raise ValueError("--active-power-w is required when --voltage-col and --current-col are given.")
+    if args.active_power_w is not None and args.active_power_w < 0:
+        raise ValueError("--active-power-w must be >= 0.")
+    if (args.command_col is None) != (args.command_limit is None):
+        raise ValueError("Provide both --command-col and --command-limit, or neither.")
+    if args.command_limit is not None and args.command_limit <= 0:
+        raise ValueError("--command-limit must be positive.")
+    if args.thermal_bin_s <= 0:
+        raise ValueError("--thermal-bin-s must be positive.")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1.")
+
+    cfg = ActuatorConfig(
+        time_col=args.time_col,
+        voltage_col=args.voltage_col,
+        current_col=args.current_col,
+        temp_col=args.temp_col,
+        command_col=args.command_col,
+        active_power_w=args.active_power_w if has_power else None,
+        command_limit=args.command_limit,
+        thermal_bin_s=args.thermal_bin_s,
+    )
+    jobs = [(path, cfg) for path in args.input]
+    if args.workers > 1 and len(jobs) > 1:
+        with process_pool(args.workers) as pool:
+            segments = list(pool.map(_reduce_segment, jobs))
+    else:
+        segments = [_reduce_segment(j) for j in jobs]
+
+    total = segments[0]
+    for path, seg in zip(args.input[1:], segments[1:]):
+        try:
+            total.merge(seg)
+        except ValueError as e:
+            raise ValueError(f"{e} at the start of {path} (inputs must be in time order)") from e
+
+    if args.save_state:
+        write_text(args.save_state, json.dumps(total.to_state()) + "\n")
+
+    out_dir = args.output
+    write_csv(
+        os.path.join(out_dir, "actuator_power_summary.csv"),
+        SUMMARY_COLUMNS,
+        [summary_row(total, args.ambient_temp_c)],
+    )
+    if cfg.command_col is not None:
+        write_csv(
+            os.path.join(out_dir, "actuator_saturation_events.csv"),
+            ["event_index", "start_time_s", "end_time_s", "duration_s", "n_samples", "peak_abs_command", "open_at_end"],
+            (
+                [k, t0, t1, t1 - t0, n, peak, str(open_end).lower()]
+                for k, (t0, t1, n, peak, open_end) in enumerate(total.closed_runs())
+            ),
+        )
+    if cfg.temp_col is not None:
+        write_csv(
+            os.path.join(out_dir, "actuator_thermal_trace.csv"),
+            ["time_s", "temp_mean_c", "n_samples"],
+            ([t, v, n] for t, v, n in total.thermal_trace()),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
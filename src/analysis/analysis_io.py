@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Shared Input/Output Layer
+
+Purpose
+-------
+One place for how the analysis scripts read and write processed files, so every
+script gets the same behavior:
+
+- Large-buffer bulk writes (rows are handed to csv.writer.writerows in one call).
+- Optional gzip compression: any output path ending in ".gz" is compressed.
+- Atomic write-then-rename: outputs are written to a temporary file in the target
+  directory and moved into place with os.replace, so a crashed or interrupted run
+  never leaves a half-written CSV that looks valid.
+- Transparent compressed inputs: readers detect gzip by its magic bytes, so
+  "x.csv" and "x.csv.gz" are read the same way.
+- Output directories are created on demand before every write (one stat when they
+  already exist), so a processed/ tree deleted between worker jobs is recreated.
+- Optional parsed-input cache: a long-lived process (analysis_worker.py) can install a
+  bounded LRU so repeated jobs on the same raw files skip CSV parsing. Entries are
+  keyed by path, size and mtime, so an edited file is always re-parsed. Command-line
+  runs never install a cache and behave exactly as before.
+- Process pools: scripts that fan out with --workers create their pool through
+  process_pool(). A threaded host process (analysis_worker.py) switches it to the
+  "spawn" start method, because forking a process that has other threads running can
+  deadlock the children. Command-line runs keep the platform default.
+
+This module is imported by the scripts in src/analysis/. It has no CLI.
+
+Notes
+-----
+- gzip output is written with mtime=0 so identical data gives identical bytes
+  (deterministic outputs; hashes in run manifests stay stable).
+- Compressed outputs trade some CPU for a large cut in disk footprint; leave
+  compression off for small one-row summaries.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import csv
+import gzip
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+GZIP_MAGIC = b"\x1f\x8b"
+WRITE_BUFFER_BYTES = 1 << 20  # 1 MiB
+GZIP_LEVEL = 6
+
+
+def ensure_dir(path: str) -> None:
+    """
+    Create directory `path` (and parents) if it does not exist.
+    """
+    if path:
+        os.makedirs(path, exist_ok=True)
+
+
+def is_gzip_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def gz_name(name: str, compress: bool) -> str:
+    """
+    Return `name` with ".gz" appended when `compress` is set.
+    """
+    return name + ".gz" if compress and not name.endswith(".gz") else name
+
+
+def open_text_read(path: str) -> IO[str]:
+    """
+    Open a text file for reading, decompressing gzip transparently.
+    """
+    if is_gzip_file(path):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, "r", newline="", encoding="utf-8")
+
+
+@contextlib.contextmanager
+def atomic_open(path: str, *, binary: bool = False) -> Iterator[IO]:
+    """
+    Open `path` for writing via a temporary file that replaces `path` only when the
+    block exits without error. Paths ending in ".gz" are gzip-compressed.
+    """
+    out_dir = os.path.dirname(os.path.abspath(path))
+    ensure_dir(out_dir)
+    # pid + thread id: concurrent jobs in one worker process never share a temp file.
+    tmp_path = os.path.join(out_dir, f".{os.path.basename(path)}.tmp-{os.getpid()}-{threading.get_ident()}")
+
+    raw = open(tmp_path, "wb", buffering=WRITE_BUFFER_BYTES)
+    try:
+        if path.endswith(".gz"):
+            stream: IO[bytes] = gzip.GzipFile(
+                filename="", mode="wb", fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0
+            )
+        else:
+            stream = raw
+        if binary:
+            f: IO = stream
+        else:
+            f = io.TextIOWrapper(stream, encoding="utf-8", newline="", write_through=False)
+        try:
+            yield f
+            f.flush()
+        finally:
+            if not binary:
+                f.detach()
+            if stream is not raw:
+                stream.close()
+        raw.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        raw.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_csv(path: str, header: Sequence[object], rows: Iterable[Sequence[object]]) -> None:
+    """
+    Atomically write a CSV (gzip if `path` ends in ".gz") with one bulk writerows call.
+    """
+    with atomic_open(path) as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+
+
+def write_text(path: str, text: str) -> None:
+    """
+    Atomically write a text file (gzip if `path` ends in ".gz").
+    """
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+def list_csv_files(input_dir: str) -> List[str]:
+    """
+    Sorted list of .csv and .csv.gz files directly inside `input_dir`.
+    """
+    if not os.path.isdir(input_dir):
+        raise ValueError(f"Input path is not a directory: {input_dir}")
+
+    files = []
+    for name in os.listdir(input_dir):
+        low = name.lower()
+        if low.endswith(".csv") or low.endswith(".csv.gz"):
+            files.append(os.path.join(input_dir, name))
+
+    files.sort()
+    if not files:
+        raise ValueError(f"No .csv files found in input directory: {input_dir}")
+    return files
+
+
+class ReadCache:
+    """
+    Thread-safe, bounded LRU of parsed inputs. Callers must treat cached values as
+    read-only: the same object is handed to every job that reads the file.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        if max_entries < 1:
+            raise ValueError("ReadCache max_entries must be >= 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Tuple[Hashable, ...], loader: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]  # type: ignore[return-value]
+            self.misses += 1
+        # Parse outside the lock so other jobs are not blocked; a concurrent miss on the
+        # same key just parses twice.
+        value = loader()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+_read_cache: Optional[ReadCache] = None
+
+
+def install_read_cache(cache: Optional[ReadCache]) -> None:
+    """
+    Enable (or, with None, disable) parsed-input caching for this process.
+    """
+    global _read_cache
+    _read_cache = cache
+
+
+def cached_read(kind: str, path: str, extra: Tuple[Hashable, ...], loader: Callable[[], T]) -> T:
+    """
+    Return loader() directly, or via the installed ReadCache keyed by
+    (kind, absolute path, size, mtime_ns, *extra).
+    """
+    cache = _read_cache
+    if cache is None:
+        return loader()
+    st = os.stat(path)
+    key = (kind, os.path.abspath(path), st.st_size, st.st_mtime_ns) + tuple(extra)
+    return cache.get_or_load(key, loader)
+
+
+_process_start_method: Optional[str] = None
+
+
+def install_process_start_method(method: Optional[str]) -> None:
+    """
+    Use multiprocessing start method `method` (e.g. "spawn") for process_pool() in this
+    process; None restores the platform default.
+    """
+    global _process_start_method
+    if method is not None:
+        multiprocessing.get_context(method)  # reject unknown methods up front
+    _process_start_method = method
+
+
+def process_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    """
+    ProcessPoolExecutor using the installed start method (platform default if none).
+    """
+    method = _process_start_method
+    ctx = None if method is None else multiprocessing.get_context(method)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
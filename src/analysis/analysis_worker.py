@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Persistent Local Analysis Worker
+
+Purpose
+-------
+During a test day the same raw files are re-analysed many times with different
+thresholds, windows or metric lists. Each `python3 src/analysis/*.py` run pays for
+interpreter startup and re-parses every CSV. This worker stays running, keeps recently
+parsed inputs in a bounded in-memory LRU, and runs the same script entry points on a
+thread pool, so repeated jobs return in milliseconds.
+
+Jobs write exactly the same output files as the command-line scripts; the worker only
+changes how fast they run, not what they produce.
+
+Jobs
+----
+- impact     -> impact_peak_metrics.py
+- leak       -> leak_rate_metrics.py
+- normalize  -> normalization_utils.py
+- delta      -> delta_report_generator.py
+- leak-fit   -> leak_decay_fit.py
+- rainflow   -> rainflow_fatigue_metrics.py
+- rollup     -> rollup_metrics.py
+- field-map  -> field_mapping.py
+- index      -> results_index.py
+- coupon     -> coupon_join.py
+- align      -> time_alignment.py
+- trigger    -> shm_event_trigger.py
+- stft       -> stft_band_monitor.py
+- roc        -> roc_evaluation.py
+- actuator   -> actuator_power_metrics.py
+- modal-drift -> modal_drift_tracker.py
+
+Job arguments are the script's normal command-line arguments. Jobs that print their
+results (index mean/sql/ingest, rollup query) write to a per-job buffer that is returned
+in the reply and printed by `submit`, never to the worker's console.
+
+Protocol
+--------
+HTTP on localhost (loopback only). Every request must carry the per-start token in an
+X-Worker-Token header, a Host header naming the bound host:port, and (for POST) a
+Content-Type of application/json; anything else is rejected before it reaches a job.
+- POST /run     body {"job": "<name>", "args": [...], "cwd": "<client cwd>"}
+                reply {"ok": true, "exit_code": 0, "elapsed_ms": ..., "stdout": "..."}
+                or {"ok": false, "error": "...", "stdout": "..."}
+- GET  /status  reply {"jobs": [...], "cache": {"entries", "max_entries", "hits", "misses"}}
+
+On start the worker writes a fresh random token to a file readable only by its user
+(--token-file, default ~/.ahis_analysis_worker/<port>.token) and removes it on exit;
+`submit` and `status` read the same file. Other local users and web pages (which can
+reach loopback ports but cannot read the file or set the header) cannot run jobs.
+
+Relative paths in job arguments are resolved against the worker's working directory,
+so the client refuses to submit from a different directory (start the worker from the
+repo root and submit from there, or use absolute paths with --any-cwd).
+
+Cache
+-----
+Entries are keyed by file path, size and modification time (plus parse options such as
+column names), so an edited or replaced raw file is always re-parsed. Size the cache
+with --cache-entries (number of parsed files kept). Sampled logs are cached as
+column-oriented TimeSeries (one float64 buffer per column), so a cached log costs
+about 8 bytes per value.
+
+Usage Example
+-------------
+Start the worker (from the repo root):
+  python3 src/analysis/analysis_worker.py serve --port 8765 --workers 4 --cache-entries 64
+
+Submit jobs (same arguments as the scripts):
+  python3 src/analysis/analysis_worker.py submit leak -- \
+    --input results/T-PRS-050/<RUN_ID>/raw/pressure_log.csv \
+    --output results/T-PRS-050/<RUN_ID>/processed \
+    --rate-threshold 5.0 --window-seconds 2.0
+
+Notes
+-----
+- Jobs share one Python process: they run concurrently on threads, and CPU-heavy jobs
+  are still serialised by the interpreter lock. The gain is from skipped startup and
+  parsing, not from parallel computation.
+- Jobs that fan out to processes (leak-fit, rainflow and actuator with --workers)
+  start them with the "spawn" method inside the worker; forking a threaded server can
+  deadlock the children.
+- Argument errors are reported as exit code 2; details are printed in the worker's log.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hmac
+import io
+import json
+import os
+import secrets
+import sys
+import time
+import traceback
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+import actuator_power_metrics
+import analysis_io
+import coupon_join
+import delta_report_generator
+import field_mapping
+import impact_peak_metrics
+import leak_decay_fit
+import leak_rate_metrics
+import modal_drift_tracker
+import normalization_utils
+import results_index
+import rainflow_fatigue_metrics
+import roc_evaluation
+import rollup_metrics
+import shm_event_trigger
+import stft_band_monitor
+import time_alignment
+
+JOBS: Dict[str, Callable[..., int]] = {
+    "impact": impact_peak_metrics.main,
+    "leak": leak_rate_metrics.main,
+    "normalize": normalization_utils.main,
+    "delta": delta_report_generator.main,
+    "leak-fit": leak_decay_fit.main,
+    "rainflow": rainflow_fatigue_metrics.main,
+    "rollup": rollup_metrics.main,
+    "field-map": field_mapping.main,
+    "index": results_index.main,
+    "coupon": coupon_join.main,
+    "align": time_alignment.main,
+    "trigger": shm_event_trigger.main,
+    "stft": stft_band_monitor.main,
+    "roc": roc_evaluation.main,
+    "actuator": actuator_power_metrics.main,
+    "modal-drift": modal_drift_tracker.main,
+}
+
+# Jobs whose results go to stdout; their main() takes an `out` stream. Per-job buffers
+# (not contextlib.redirect_stdout, which is process-wide) keep concurrent jobs apart.
+OUTPUT_JOBS = frozenset({"index", "rollup"})
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+MAX_REQUEST_BYTES = 1 << 20
+TOKEN_HEADER = "X-Worker-Token"
+
+
+def _run_job(job: str, args: List[str]) -> Dict[str, object]:
+    t0 = time.perf_counter()
+    out = io.StringIO()
+    try:
+        code = JOBS[job](args, out=out) if job in OUTPUT_JOBS else JOBS[job](args)
+    except SystemExit as e:
+        # argparse exits on bad arguments; report it instead of killing the worker thread.
+        code = e.code if isinstance(e.code, int) else 2
+    except Exception as e:
+        traceback.print_exc()
+        return {
+            "ok": False,
+            "error": f"{type(e).__name__}: {e}",
+            "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+            "stdout": out.getvalue(),
+        }
+    return {
+        "ok": code == 0,
+        "exit_code": code,
+        "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+        "stdout": out.getvalue(),
+    }
+
+
+def _default_token_file(port: int) -> str:
+    return os.path.join(os.path.expanduser("~"), ".ahis_analysis_worker", f"{port}.token")
+
+
+def _host_port(host: str, port: int) -> str:
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+
+def _write_token(path: str) -> str:
+    """
+    Write a fresh token to `path`, readable and writable by the current user only.
+    """
+    token = secrets.token_hex(32)
+    token_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(token_dir, mode=0o700, exist_ok=True)
+    # Replace rather than reuse: an existing file may have been created by someone else.
+    if os.path.lexists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def _read_token(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise ValueError(f"Worker token file not found: {path} (is the worker running on this port?)") from None
+
+
+def _make_handler(
+    pool: ThreadPoolExecutor,
+    cache: analysis_io.ReadCache,
+    allow_any_cwd: bool,
+    token: str,
+    host_port: str,
+):
+    server_cwd = os.getcwd()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: Dict[str, object]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            # Host check: a browser page on a rebinding DNS name sends its own host name.
+            if self.headers.get("Host") != host_port:
+                self._reply(403, {"ok": False, "error": f"Host header must be {host_port}"})
+                return False
+            if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"), token.encode("utf-8")):
+                self._reply(403, {"ok": False, "error": f"missing or wrong {TOKEN_HEADER}"})
+                return False
+            return True
+
+        def do_GET(self) -> None:
+            if not self._authorized():
+                return
+            if self.path != "/status":
+                self._reply(404, {"ok": False, "error": "unknown path"})
+                return
+            self._reply(200, {"ok": True, "cwd": server_cwd, "jobs": sorted(JOBS), "cache": cache.stats()})
+
+        def do_POST(self) -> None:
+            if not self._authorized():
+                return
+            if self.path != "/run":
+                self._reply(404, {"ok": False, "error": "unknown path"})
+                return
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                self._reply(415, {"ok": False, "error": "Content-Type must be application/json"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_REQUEST_BYTES:
+                self._reply(400, {"ok": False, "error": "missing or oversized request body"})
+                return
+            try:
+                req = json.loads(self.rfile.read(length).decode("utf-8"))
+                job = req["job"]
+                args = req.get("args") or []
+                if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+                    raise ValueError("args must be a list of strings")
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"ok": False, "error": f"bad request: {e}"})
+                return
+            if job not in JOBS:
+                self._reply(400, {"ok": False, "error": f"unknown job '{job}'. Available: {sorted(JOBS)}"})
+                return
+            if not allow_any_cwd and req.get("cwd") != server_cwd:
+                self._reply(
+                    409,
+                    {
+                        "ok": False,
+                        "error": f"client cwd {req.get('cwd')!r} differs from worker cwd {server_cwd!r}; "
+                        "relative paths would resolve differently. Submit from the worker's directory.",
+                    },
+                )
+                return
+            result = pool.submit(_run_job, job, args).result()
+            self._reply(200, result)
+
+        def log_message(self, fmt: str, *args: object) -> None:
+            sys.stderr.write(f"[analysis_worker] {self.address_string()} {fmt % args}\n")
+
+    return Handler
+
+
+def _cmd_serve(args: argparse.Namespace) -> int:
+    if args.host not in LOOPBACK_HOSTS:
+        raise ValueError(f"--host must be a loopback address {LOOPBACK_HOSTS}; the worker has no authentication.")
+    if args.workers < 1 or args.cache_entries < 1:
+        raise ValueError("--workers and --cache-entries must be >= 1.")
+
+    cache = analysis_io.ReadCache(args.cache_entries)
+    analysis_io.install_read_cache(cache)
+    analysis_io.install_process_start_method("spawn")
+    token_file = args.token_file or _default_token_file(args.port)
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        server = ThreadingHTTPServer(
+            (args.host, args.port),
+            _make_handler(pool, cache, args.any_cwd, _write_token(token_file), _host_port(args.host, args.port)),
+        )
+        sys.stderr.write(
+            f"[analysis_worker] serving on http://{_host_port(args.host, args.port)} "
+            f"(cwd={os.getcwd()}, workers={args.workers}, cache_entries={args.cache_entries}, "
+            f"token_file={token_file})\n"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(token_file)
+    return 0
+
+
+def _request(args: argparse.Namespace, path: str, body: Optional[Dict[str, object]]) -> Dict[str, object]:
+    token = _read_token(args.token_file or _default_token_file(args.port))
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(
+        f"http://{_host_port(args.host, args.port)}{path}",
+        data=data,
+        headers={"Content-Type": "application/json", TOKEN_HEADER: token},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=args.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read().decode("utf-8"))
+
+
+def _cmd_submit(args: argparse.Namespace) -> int:
+    job_args = list(args.job_args)
+    if job_args and job_args[0] == "--":
+        job_args = job_args[1:]
+    reply = _request(args, "/run", {"job": args.job, "args": job_args, "cwd": os.getcwd()})
+    if reply.get("stdout"):
+        sys.stdout.write(str(reply["stdout"]))
+    if "error" in reply:
+        sys.stderr.write(f"analysis_worker: {reply['error']}\n")
+    if "elapsed_ms" in reply:
+        sys.stderr.write(f"analysis_worker: {args.job} finished in {reply['elapsed_ms']:.1f} ms\n")
+    code = reply.get("exit_code")
+    return code if isinstance(code, int) else 1
+
+
+def _cmd_status(args: argparse.Namespace) -> int:
+    print(json.dumps(_request(args, "/status", None), indent=2))
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Persistent local worker for AHIS analysis jobs.")
+    ap.add_argument("--host", default="127.0.0.1", help="Loopback address. Default: 127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765, help="TCP port. Default: 8765")
+    ap.add_argument(
+        "--token-file",
+        default=None,
+        help="Per-start access token written by serve and read by submit/status. "
+        "Default: ~/.ahis_analysis_worker/<port>.token",
+    )
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("serve", help="Run the worker in the foreground.")
+    s.add_argument("--workers", type=int, default=4, help="Concurrent jobs. Default: 4")
+    s.add_argument("--cache-entries", type=int, default=64, help="Parsed input files kept in memory. Default: 64")
+    s.add_argument(
+        "--any-cwd",
+        action="store_true",
+        help="Accept jobs from clients in other directories (only safe with absolute paths).",
+    )
+    s.set_defaults(func=_cmd_serve)
+
+    c = sub.add_parser("submit", help="Submit one job and wait for it.")
+    c.add_argument("job", choices=sorted(JOBS), help="Job name.")
+    c.add_argument("job_args", nargs=argparse.REMAINDER, help="Script arguments (after --).")
+    c.add_argument("--timeout", type=float, default=3600.0, help="Seconds to wait for the job. Default: 3600")
+    c.set_defaults(func=_cmd_submit)
+
+    st = sub.add_parser("status", help="Show worker jobs and cache statistics.")
+    st.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait. Default: 10")
+    st.set_defaults(func=_cmd_status)
+
+    args = ap.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Coupon-Level Join of Impact Peaks and Panel Normalization (T-IMP-010)
+
+Purpose
+-------
+delta_report_generator.py used to normalize a group-mean peak delta by the AHIS group's
+mean areal density and thickness. That is an approximation whenever coupons in a group
+differ in mass or thickness. This script links every hit to the coupon it was fired at
+and normalizes each peak by that coupon's own areal density and thickness.
+
+Join
+----
+1) Coupon map: hit filename -> coupon_id.
+2) normalized_panel_metrics.csv indexed once into a dict coupon_id -> PanelMetrics.
+3) Each impact_peak_summary.csv row is looked up in both dicts (one pass over the peaks,
+   linear in hits + coupons). Group and config come from the coupon's panel metrics.
+4) Each hit's coupon group must equal the hit's group in the file-group map
+   (impact_file_groups.csv, which impact_peak_metrics.py used for the impact stats),
+   so the coupon stats and the impact stats describe the same hits per group.
+
+Outputs
+-------
+- processed/impact_coupon_peaks.csv
+    filename,coupon_id,config,group,metric,peak_abs_value,areal_density_kg_m2,thickness_mm,
+    peak_abs_per_kg_m2,peak_abs_per_mm
+- processed/impact_coupon_group_stats.csv (per group and metric, hit-weighted)
+    group,metric,n_hits,n_coupons,mean_peak_abs,mean_peak_abs_per_kg_m2,mean_peak_abs_per_mm,
+    mean_inv_areal_density,mean_inv_thickness_mm
+
+The mean_inv_* columns let delta_report_generator.py (--coupon-stats) compute the
+per-coupon normalized delta exactly:
+    mean_i[(peak_i - mean_baseline) / ad_i] = mean(peak/ad) - mean_baseline * mean(1/ad)
+
+Strictness / No Guessing
+------------------------
+- Every hit in the peak summary must be in the coupon map, and every mapped coupon must
+  be in the panel metrics; otherwise the script errors out.
+- Every hit must have a group in the file-group map equal to its coupon's group in the
+  panel metrics; mismatches are listed per filename and are an error.
+- Duplicate coupon_id rows in the panel metrics are an error.
+
+Usage Example
+-------------
+python3 coupon_join.py \
+  --peaks results/T-IMP-010/RUN_x/processed/impact_peak_summary.csv \
+  --coupon-map results/T-IMP-010/RUN_x/processed/impact_file_groups.csv \
+  --panel-metrics results/T-IMP-010/RUN_x/processed/normalized_panel_metrics.csv \
+  --output results/T-IMP-010/RUN_x/processed
+
+The coupon map needs columns filename,coupon_id; impact_file_groups.csv can carry the
+extra coupon_id column alongside group. File groups are read from --file-groups, or from
+the coupon map's group column when --file-groups is not given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import gz_name, open_text_read, write_csv
+from normalization_utils import PanelMetrics, load_panel_metrics
+
+
+@dataclass(frozen=True)
+class CouponPeak:
+    filename: str
+    metric: str
+    peak_abs_value: float
+    panel: PanelMetrics
+
+    @property
+    def per_kg_m2(self) -> float:
+        return self.peak_abs_value / self.panel.areal_density_kg_m2
+
+    @property
+    def per_mm(self) -> float:
+        return self.peak_abs_value / self.panel.thickness_mm
+
+
+def _read_rows(path: str, required: Sequence[str]) -> List[Dict[str, str]]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = set(required) - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        rows = list(reader)
+    if not rows:
+        raise ValueError(f"No data rows in {path}")
+    return rows
+
+
+def _load_coupon_map(path: str) -> Dict[str, str]:
+    mapping: Dict[str, str] = {}
+    for i, r in enumerate(_read_rows(path, ["filename", "coupon_id"])):
+        fn = (r["filename"] or "").strip()
+        coupon = (r["coupon_id"] or "").strip()
+        if not fn or not coupon:
+            raise ValueError(f"Empty filename/coupon_id in {path} at row {i+2}")
+        if mapping.get(fn, coupon) != coupon:
+            raise ValueError(f"File '{fn}' is mapped to more than one coupon in {path}")
+        mapping[fn] = coupon
+    return mapping
+
+
+def _load_file_groups(path: str) -> Dict[str, str]:
+    groups: Dict[str, str] = {}
+    for i, r in enumerate(_read_rows(path, ["filename", "group"])):
+        fn = (r["filename"] or "").strip()
+        grp = (r["group"] or "").strip()
+        if not fn or not grp:
+            raise ValueError(f"Empty filename/group in {path} at row {i+2}")
+        if groups.get(fn, grp) != grp:
+            raise ValueError(f"File '{fn}' is mapped to more than one group in {path}")
+        groups[fn] = grp
+    return groups
+
+
+def index_panels(panels: Sequence[PanelMetrics], *, path: str) -> Dict[str, PanelMetrics]:
+    index: Dict[str, PanelMetrics] = {}
+    for p in panels:
+        if p.coupon_id in index:
+            raise ValueError(f"Duplicate coupon_id '{p.coupon_id}' in {path}")
+        index[p.coupon_id] = p
+    return index
+
+
+def join_peaks(
+    peaks_path: str,
+    coupon_map: Dict[str, str],
+    panels: Dict[str, PanelMetrics],
+    file_groups: Dict[str, str],
+) -> List[CouponPeak]:
+    rows = _read_rows(peaks_path, ["filename", "metric", "peak_abs_value"])
+    out: List[CouponPeak] = []
+    unmapped = set()
+    unknown = set()
+    ungrouped = set()
+    mismatched: Dict[str, str] = {}
+    for i, r in enumerate(rows):
+        fn = (r["filename"] or "").strip()
+        coupon = coupon_map.get(fn)
+        if coupon is None:
+            unmapped.add(fn)
+            continue
+        panel = panels.get(coupon)
+        if panel is None:
+            unknown.add(coupon)
+            continue
+        grp = file_groups.get(fn)
+        if grp is None:
+            ungrouped.add(fn)
+        elif grp != panel.group:
+            mismatched[fn] = f"{fn} (coupon '{coupon}' is in group '{panel.group}', file map says '{grp}')"
+        try:
+            value = float(r["peak_abs_value"])
+        except Exception as e:
+            raise ValueError(
+                f"Non-numeric value in {peaks_path} at row {i+2} col 'peak_abs_value': {r['peak_abs_value']!r}"
+            ) from e
+        out.append(CouponPeak(filename=fn, metric=(r["metric"] or "").strip(), peak_abs_value=value, panel=panel))
+
+    if unmapped:
+        raise ValueError("Coupon map missing entries for these files: " + ", ".join(sorted(unmapped)))
+    if unknown:
+        raise ValueError("Coupons not found in panel metrics: " + ", ".join(sorted(unknown)))
+    if ungrouped:
+        raise ValueError("File-group map missing entries for these files: " + ", ".join(sorted(ungrouped)))
+    if mismatched:
+        raise ValueError(
+            "Coupon group differs from the file-group map for: " + "; ".join(mismatched[k] for k in sorted(mismatched))
+        )
+    return out
+
+
+def _write_coupon_peaks(out_path: str, joined: Sequence[CouponPeak]) -> None:
+    write_csv(
+        out_path,
+        [
+            "filename",
+            "coupon_id",
+            "config",
+            "group",
+            "metric",
+            "peak_abs_value",
+            "areal_density_kg_m2",
+            "thickness_mm",
+            "peak_abs_per_kg_m2",
+            "peak_abs_per_mm",
+        ],
+        (
+            [
+                c.filename,
+                c.panel.coupon_id,
+                c.panel.config,
+                c.panel.group,
+                c.metric,
+                c.peak_abs_value,
+                c.panel.areal_density_kg_m2,
+                c.panel.thickness_mm,
+                c.per_kg_m2,
+                c.per_mm,
+            ]
+            for c in joined
+        ),
+    )
+
+
+def _write_coupon_group_stats(out_path: str, joined: Sequence[CouponPeak]) -> None:
+    # (group, metric) -> [n, sum peak, sum peak/ad, sum peak/mm, sum 1/ad, sum 1/mm], coupons
+    sums: Dict[Tuple[str, str], List[float]] = {}
+    coupons: Dict[Tuple[str, str], set] = {}
+    for c in joined:
+        key = (c.panel.group, c.metric)
+        acc = sums.setdefault(key, [0.0] * 6)
+        acc[0] += 1
+        acc[1] += c.peak_abs_value
+        acc[2] += c.per_kg_m2
+        acc[3] += c.per_mm
+        acc[4] += 1.0 / c.panel.areal_density_kg_m2
+        acc[5] += 1.0 / c.panel.thickness_mm
+        coupons.setdefault(key, set()).add(c.panel.coupon_id)
+
+    write_csv(
+        out_path,
+        [
+            "group",
+            "metric",
+            "n_hits",
+            "n_coupons",
+            "mean_peak_abs",
+            "mean_peak_abs_per_kg_m2",
+            "mean_peak_abs_per_mm",
+            "mean_inv_areal_density",
+            "mean_inv_thickness_mm",
+        ],
+        (
+            [grp, metric, int(acc[0]), len(coupons[(grp, metric)])] + [x / acc[0] for x in acc[1:]]
+            for (grp, metric), acc in sorted(sums.items())
+        ),
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Join AHIS impact peaks to per-coupon panel normalization.")
+    ap.add_argument("--peaks", required=True, help="Path to impact_peak_summary.csv (processed).")
+    ap.add_argument("--coupon-map", required=True, help="CSV with columns filename,coupon_id.")
+    ap.add_argument("--panel-metrics", required=True, help="Path to normalized_panel_metrics.csv (processed).")
+    ap.add_argument(
+        "--file-groups",
+        default=None,
+        help="CSV with columns filename,group (impact_file_groups.csv). Default: the --coupon-map file.",
+    )
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--gzip", action="store_true", help="Write outputs gzip-compressed (.csv.gz).")
+
+    args = ap.parse_args(argv)
+    panels = index_panels(load_panel_metrics(args.panel_metrics), path=args.panel_metrics)
+    file_groups = _load_file_groups(args.file_groups or args.coupon_map)
+    joined = join_peaks(args.peaks, _load_coupon_map(args.coupon_map), panels, file_groups)
+
+    _write_coupon_peaks(os.path.join(args.output, gz_name("impact_coupon_peaks.csv", args.gzip)), joined)
+    _write_coupon_group_stats(
+        os.path.join(args.output, gz_name("impact_coupon_group_stats.csv", args.gzip)), joined
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
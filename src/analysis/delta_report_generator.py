@@ -8,6 +8,7 @@ Generate a concise, engineer-readable delta summary from:
 1) impact peak group stats (baseline vs ahis) from impact_peak_metrics.py
 2) normalized panel metrics (kg/m^2, thickness mm) from normalization_utils.py
 3) optional leak onset/leak rate summaries from leak_rate_metrics.py
+4) optional Mode E actuator power/thermal/saturation summary from actuator_power_metrics.py
 
 This script produces:
 - processed/DELTA_REPORT.md  (one-page Markdown summary)
@@ -29,8 +30,20 @@ B) Normalized panel metrics CSV (required for mass/thickness normalization):
    normalized_panel_metrics.csv with columns:
    coupon_id,config,group,mass_kg,area_m2,thickness_mm,areal_density_kg_m2,notes
 
-C) Leak summaries (optional):
+C) Coupon-level stats (optional, recommended):
+   impact_coupon_group_stats.csv from coupon_join.py. When given, the normalized deltas use
+   each AHIS hit's own coupon areal density/thickness instead of the AHIS group means:
+   mean_i[(peak_i - mean_baseline) / ad_i] = mean(peak/ad) - mean_baseline * mean(1/ad)
+
+D) Leak summaries (optional):
    leak_onset_summary.csv and leak_rate_summary.csv
+   (if leak_rate_summary.csv carries fit_* decay-model columns, they are reported too)
+
+E) Actuator summary (optional, Mode E):
+   actuator_power_summary.csv from actuator_power_metrics.py. Channels that were not
+   logged are blank there and reported as "not measured".
+
+Any input may also be given gzip-compressed (.csv.gz); it is read transparently.
 
 Usage Example
 -------------
@@ -41,9 +54,15 @@ python3 delta_report_generator.py \
   --baseline-group baseline \
   --ahis-group ahis
 
+Optional coupon-level normalization:
+  --coupon-stats results/T-IMP-010/RUN_x/processed/impact_coupon_group_stats.csv
+
 Optional leak inputs:
   --leak-onset results/T-PRS-050/RUN_y/processed/leak_onset_summary.csv \
   --leak-rate  results/T-PRS-050/RUN_y/processed/leak_rate_summary.csv
+
+Optional actuator input:
+  --actuator-summary results/T-CTL-083/RUN_z/processed/actuator_power_summary.csv
 """
 
 from __future__ import annotations
@@ -52,7 +71,9 @@ import argparse
 import csv
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import cached_read, open_text_read, write_csv, write_text
 
 
 @dataclass(frozen=True)
@@ -72,8 +93,24 @@ class PanelGroupAgg:
     mean_thickness_mm: float
 
 
+@dataclass(frozen=True)
+class CouponGroupStat:
+    group: str
+    metric: str
+    n_hits: int
+    mean_peak_abs: float
+    mean_peak_abs_per_kg_m2: float
+    mean_peak_abs_per_mm: float
+    mean_inv_areal_density: float
+    mean_inv_thickness_mm: float
+
+
 def _read_csv(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
-    with open(path, "r", newline="", encoding="utf-8") as f:
+    return cached_read("csv_rows_nonempty", path, (), lambda: _parse_csv(path))
+
+
+def _parse_csv(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    with open_text_read(path) as f:
         reader = csv.DictReader(f)
         if reader.fieldnames is None:
             raise ValueError(f"CSV has no header row: {path}")
@@ -162,6 +199,43 @@ def _load_panel_metrics(path: str) -> Dict[str, PanelGroupAgg]:
     return aggs
 
 
+def _load_coupon_stats(path: str) -> Dict[Tuple[str, str], CouponGroupStat]:
+    headers, rows = _read_csv(path)
+    float_cols = [
+        "mean_peak_abs",
+        "mean_peak_abs_per_kg_m2",
+        "mean_peak_abs_per_mm",
+        "mean_inv_areal_density",
+        "mean_inv_thickness_mm",
+    ]
+    missing = {"group", "metric", "n_hits"}.union(float_cols) - set(headers)
+    if missing:
+        raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+
+    out: Dict[Tuple[str, str], CouponGroupStat] = {}
+    for i, r in enumerate(rows):
+        key = ((r["group"] or "").strip(), (r["metric"] or "").strip())
+        if key in out:
+            raise ValueError(f"Duplicate coupon stats rows for group='{key[0]}' metric='{key[1]}' in {path}.")
+        vals = {c: _parse_float(r[c], path=path, col=c, row_idx=i) for c in float_cols}
+        out[key] = CouponGroupStat(
+            group=key[0],
+            metric=key[1],
+            n_hits=_parse_int(r["n_hits"], path=path, col="n_hits", row_idx=i),
+            **vals,
+        )
+    return out
+
+
+def _find_coupon_stat(
+    stats: Dict[Tuple[str, str], CouponGroupStat], group: str, metric: str
+) -> CouponGroupStat:
+    s = stats.get((group, metric))
+    if s is None:
+        raise ValueError(f"Missing coupon stats for group='{group}' metric='{metric}'.")
+    return s
+
+
 def _find_stat(stats: List[ImpactGroupStat], group: str, metric: str) -> ImpactGroupStat:
     matches = [s for s in stats if s.group == group and s.metric == metric]
     if not matches:
@@ -171,6 +245,34 @@ def _find_stat(stats: List[ImpactGroupStat], group: str, metric: str) -> ImpactG
     return matches[0]
 
 
+ACTUATOR_COLUMNS = [
+    "duration_s",
+    "n_samples",
+    "voltage_mean_v",
+    "voltage_min_v",
+    "voltage_max_v",
+    "current_rms_a",
+    "current_peak_abs_a",
+    "energy_j",
+    "mean_power_w",
+    "rms_power_w",
+    "peak_power_w",
+    "active_power_threshold_w",
+    "duty_cycle",
+    "ambient_temp_c",
+    "temp_max_c",
+    "temp_rise_c",
+    "temp_rise_reference",
+    "t63_s",
+    "fit_tau_s",
+    "command_limit",
+    "saturation_events",
+    "saturated_time_s",
+    "saturated_fraction",
+    "max_saturation_s",
+]
+
+
 def _load_optional_single_row(path: str, required_cols: List[str]) -> Dict[str, str]:
     headers, rows = _read_csv(path)
     missing = set(required_cols) - set(headers)
@@ -181,22 +283,26 @@ def _load_optional_single_row(path: str, required_cols: List[str]) -> Dict[str,
     return rows[0]
 
 
+def _measured(row: Dict[str, str], key: str, unit: str) -> str:
+    # Channels that were not logged are blank; say so instead of inferring a value.
+    value = (row.get(key) or "").strip()
+    return f"{value} {unit}".rstrip() if value else "not measured"
+
+
+def _resolved(row: Dict[str, str], key: str) -> str:
+    value = (row.get(key) or "").strip()
+    return f"{value} s" if value else "not resolved by the data"
+
+
 def _write_csv_kv(out_path: str, kv: List[Tuple[str, str]]) -> None:
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["key", "value"])
-        for k, v in kv:
-            w.writerow([k, v])
+    write_csv(out_path, ["key", "value"], kv)
 
 
 def _write_md(out_path: str, text: str) -> None:
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(text)
+    write_text(out_path, text)
 
 
-def main() -> int:
+def main(argv: Optional[Sequence[str]] = None) -> int:
     ap = argparse.ArgumentParser(description="Generate AHIS one-page delta report from processed PoC metrics.")
     ap.add_argument("--impact-stats", required=True, help="Path to impact_peak_group_stats.csv (processed).")
     ap.add_argument("--panel-metrics", required=True, help="Path to normalized_panel_metrics.csv (processed).")
@@ -209,13 +315,24 @@ def main() -> int:
         required=True,
         help="Metric name from impact stats to include (e.g., strain_ue, accel_g). Can be repeated.",
     )
+    ap.add_argument(
+        "--coupon-stats",
+        default=None,
+        help="Optional impact_coupon_group_stats.csv (coupon_join.py) for per-coupon normalization.",
+    )
     ap.add_argument("--leak-onset", default=None, help="Optional path to leak_onset_summary.csv (processed).")
     ap.add_argument("--leak-rate", default=None, help="Optional path to leak_rate_summary.csv (processed).")
+    ap.add_argument(
+        "--actuator-summary",
+        default=None,
+        help="Optional actuator_power_summary.csv (actuator_power_metrics.py) for Mode E runs.",
+    )
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     stats = _load_impact_stats(args.impact_stats)
     panel_aggs = _load_panel_metrics(args.panel_metrics)
+    coupon_stats = _load_coupon_stats(args.coupon_stats) if args.coupon_stats else None
 
     if args.baseline_group not in panel_aggs:
         raise ValueError(f"Baseline group '{args.baseline_group}' not found in panel metrics.")
@@ -250,16 +367,25 @@ def main() -> int:
         a = _find_stat(stats, args.ahis_group, metric)
 
         delta = a.mean_peak_abs - b.mean_peak_abs
-        # Normalize by AHIS mean areal density and thickness (explicit choice; reviewer can change).
-        delta_per_kgm2 = delta / ahis_panel.mean_areal_density_kg_m2
-        delta_per_mm = delta / ahis_panel.mean_thickness_mm
+        if coupon_stats is not None:
+            # Per-coupon: each AHIS hit's delta over its own coupon's areal density/thickness.
+            bc = _find_coupon_stat(coupon_stats, args.baseline_group, metric)
+            ac = _find_coupon_stat(coupon_stats, args.ahis_group, metric)
+            delta_per_kgm2 = ac.mean_peak_abs_per_kg_m2 - bc.mean_peak_abs * ac.mean_inv_areal_density
+            delta_per_mm = ac.mean_peak_abs_per_mm - bc.mean_peak_abs * ac.mean_inv_thickness_mm
+            basis = "per-coupon"
+        else:
+            # Normalize by AHIS mean areal density and thickness (explicit choice; reviewer can change).
+            delta_per_kgm2 = delta / ahis_panel.mean_areal_density_kg_m2
+            delta_per_mm = delta / ahis_panel.mean_thickness_mm
+            basis = "AHIS group mean"
 
         lines.append(f"### Metric: `{metric}`\n")
         lines.append(f"- Baseline: n={b.n}, mean|peak|={b.mean_peak_abs:.6g}, std={b.std_peak_abs_sample:.6g}\n")
         lines.append(f"- AHIS: n={a.n}, mean|peak|={a.mean_peak_abs:.6g}, std={a.std_peak_abs_sample:.6g}\n")
         lines.append(f"- Δ(mean|peak|) = {delta:.6g} (AHIS − Baseline)\n")
-        lines.append(f"- Normalized Δ per AHIS areal density = {delta_per_kgm2:.6g} / (kg/m²)\n")
-        lines.append(f"- Normalized Δ per AHIS thickness = {delta_per_mm:.6g} / mm\n")
+        lines.append(f"- Normalized Δ per AHIS areal density ({basis}) = {delta_per_kgm2:.6g} / (kg/m²)\n")
+        lines.append(f"- Normalized Δ per AHIS thickness ({basis}) = {delta_per_mm:.6g} / mm\n")
 
         kv.extend([
             (f"{metric}_baseline_mean_abs_peak", f"{b.mean_peak_abs}"),
@@ -267,6 +393,7 @@ def main() -> int:
             (f"{metric}_delta_mean_abs_peak", f"{delta}"),
             (f"{metric}_delta_per_ahis_areal_density", f"{delta_per_kgm2}"),
             (f"{metric}_delta_per_ahis_thickness_mm", f"{delta_per_mm}"),
+            (f"{metric}_normalization_basis", basis),
         ])
 
     # Optional leak section
@@ -288,6 +415,79 @@ def main() -> int:
                 ("leak_mean_dp_dt_per_s", lr["mean_dp_dt_per_s"]),
                 ("leak_median_dp_dt_per_s", lr["median_dp_dt_per_s"]),
             ])
+            if (lr.get("fit_tau_s") or "").strip():
+                lines.append(
+                    f"- Decay fit (exponential toward {lr['fit_ambient_pressure']}): tau={lr['fit_tau_s']} s, "
+                    f"ΔP0={lr['fit_delta_p0']}, RMS residual={lr['fit_rms_residual']}, R²={lr['fit_r_squared']}\n"
+                )
+                if (lr.get("fit_leak_rate_pv_per_s") or "").strip():
+                    lines.append(f"- Standard leak rate at fit start: {lr['fit_leak_rate_pv_per_s']} (pressure·m³/s)\n")
+                if (lr.get("fit_equiv_leak_area_m2") or "").strip():
+                    lines.append(
+                        f"- Equivalent leak area (Cd·A): {lr['fit_equiv_leak_area_m2']} m² "
+                        f"(choked at fit start: {lr['fit_choked_at_start']})\n"
+                    )
+                kv.extend([
+                    (f"leak_{k}", lr[k])
+                    for k in (
+                        "fit_tau_s",
+                        "fit_delta_p0",
+                        "fit_ambient_pressure",
+                        "fit_rms_residual",
+                        "fit_max_abs_residual",
+                        "fit_r_squared",
+                        "fit_leak_rate_pv_per_s",
+                        "fit_equiv_leak_area_m2",
+                        "fit_choked_at_start",
+                    )
+                    if k in lr
+                ])
+
+    # Optional actuator section (Mode E)
+    if args.actuator_summary:
+        act = _load_optional_single_row(args.actuator_summary, ACTUATOR_COLUMNS)
+
+        lines.append("\n## Actuator Power / Thermal / Saturation (Mode E)\n")
+        lines.append(f"- Duration: {act['duration_s']} s ({act['n_samples']} samples)\n")
+        if (act["voltage_mean_v"] or "").strip():
+            lines.append(
+                f"- Supply voltage: mean {act['voltage_mean_v']} V "
+                f"(min {act['voltage_min_v']} V, max {act['voltage_max_v']} V)\n"
+            )
+        else:
+            lines.append("- Supply voltage: not measured\n")
+        if (act["current_rms_a"] or "").strip():
+            lines.append(f"- Current: RMS {act['current_rms_a']} A, peak |I| {act['current_peak_abs_a']} A\n")
+        else:
+            lines.append("- Current: not measured\n")
+        if (act["mean_power_w"] or "").strip():
+            lines.append(
+                f"- Power: mean {act['mean_power_w']} W, RMS {act['rms_power_w']} W, "
+                f"peak {act['peak_power_w']} W, energy {act['energy_j']} J\n"
+            )
+            lines.append(f"- Duty cycle (|P| > {act['active_power_threshold_w']} W): {act['duty_cycle']}\n")
+        else:
+            lines.append("- Power and duty cycle: not measured\n")
+        if (act["temp_rise_c"] or "").strip():
+            lines.append(
+                f"- Temperature rise: {act['temp_rise_c']} °C above {act['temp_rise_reference']} "
+                f"(max {act['temp_max_c']} °C, ambient {_measured(act, 'ambient_temp_c', '°C')})\n"
+            )
+            lines.append(
+                f"- Thermal time constant: 63% rise time {_resolved(act, 't63_s')}, "
+                f"first-order fit tau {_resolved(act, 'fit_tau_s')}\n"
+            )
+        else:
+            lines.append("- Temperature rise: not measured\n")
+        if (act["saturation_events"] or "").strip():
+            lines.append(
+                f"- Saturation (|command| >= {act['command_limit']}): {act['saturation_events']} events, "
+                f"{act['saturated_time_s']} s total ({act['saturated_fraction']} of run), "
+                f"longest {act['max_saturation_s']} s\n"
+            )
+        else:
+            lines.append("- Command saturation: not logged\n")
+        kv.extend([(f"actuator_{k}", act[k]) for k in ACTUATOR_COLUMNS])
 
     # Closing discipline
     lines.append("\n## Interpretation Discipline\n")
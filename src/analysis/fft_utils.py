@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Pure-Python Radix-2 FFT Helpers
+
+Purpose
+-------
+Small FFT helpers shared by the analysis scripts (cross-correlation in
+time_alignment.py). The scripts are standard-library only, so this is an iterative
+in-place radix-2 Cooley–Tukey transform on Python lists, with bit-reversal tables
+and twiddle factors cached per transform size.
+
+This module is imported by the scripts in src/analysis/. It has no CLI.
+
+Notes
+-----
+- Lengths must be powers of two; use next_pow2() and zero-pad.
+- The inverse transform is scaled by 1/n.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+_tables: Dict[int, Tuple[List[int], List[float], List[float]]] = {}
+
+
+def next_pow2(n: int) -> int:
+    """
+    Smallest power of two >= n (and >= 1).
+    """
+    p = 1
+    while p < n:
+        p <<= 1
+    return p
+
+
+def _plan(n: int) -> Tuple[List[int], List[float], List[float]]:
+    plan = _tables.get(n)
+    if plan is not None:
+        return plan
+    if n < 1 or n & (n - 1):
+        raise ValueError(f"FFT length must be a power of two, got {n}")
+    bits = n.bit_length() - 1
+    rev = [int(format(i, f"0{bits}b")[::-1], 2) if bits else 0 for i in range(n)]
+    half = n // 2
+    cos_t = [math.cos(2.0 * math.pi * k / n) for k in range(half)]
+    sin_t = [math.sin(2.0 * math.pi * k / n) for k in range(half)]
+    plan = (rev, cos_t, sin_t)
+    _tables[n] = plan
+    return plan
+
+
+def fft_inplace(re: List[float], im: List[float], *, inverse: bool = False) -> None:
+    """
+    In-place complex FFT of (re, im). Forward uses exp(-2*pi*i*k*n/N).
+    """
+    n = len(re)
+    if len(im) != n:
+        raise ValueError("re and im must have the same length")
+    rev, cos_t, sin_t = _plan(n)
+    for i in range(n):
+        j = rev[i]
+        if j > i:
+            re[i], re[j] = re[j], re[i]
+            im[i], im[j] = im[j], im[i]
+
+    sign = 1.0 if inverse else -1.0
+    size = 2
+    while size <= n:
+        half = size // 2
+        step = n // size
+        for start in range(0, n, size):
+            k = 0
+            for i in range(start, start + half):
+                j = i + half
+                wr = cos_t[k]
+                wi = sign * sin_t[k]
+                tr = wr * re[j] - wi * im[j]
+                ti = wr * im[j] + wi * re[j]
+                re[j] = re[i] - tr
+                im[j] = im[i] - ti
+                re[i] += tr
+                im[i] += ti
+                k += step
+        size <<= 1
+
+    if inverse:
+        inv_n = 1.0 / n
+        for i in range(n):
+            re[i] *= inv_n
+            im[i] *= inv_n
+
+
+def cross_correlate(x: Sequence[float], y: Sequence[float]) -> Tuple[List[float], int]:
+    """
+    Linear cross-correlation c[k] = sum_j x[j + k] * y[j] for k = -(len(y)-1) .. len(x)-1,
+    via zero-padded FFT. Returns (c, k_min) where c[0] corresponds to lag k_min.
+    """
+    n, m = len(x), len(y)
+    if n == 0 or m == 0:
+        raise ValueError("cross_correlate needs non-empty inputs")
+    size = next_pow2(n + m - 1)
+    xr = list(x) + [0.0] * (size - n)
+    xi = [0.0] * size
+    yr = list(y) + [0.0] * (size - m)
+    yi = [0.0] * size
+    fft_inplace(xr, xi)
+    fft_inplace(yr, yi)
+    # X * conj(Y)
+    pr = [a * c + b * d for a, b, c, d in zip(xr, xi, yr, yi)]
+    pi = [b * c - a * d for a, b, c, d in zip(xr, xi, yr, yi)]
+    fft_inplace(pr, pi, inverse=True)
+    # Circular index k mod size: negative lags sit at the end.
+    out = pr[size - (m - 1) :] + pr[:n] if m > 1 else pr[:n]
+    return out, -(m - 1)
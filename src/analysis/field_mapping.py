@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Strain/Damage Field Mapping over Sensor Node Arrays (T-IMP-011 / T-SHM-061)
+
+Purpose
+-------
+Turn per-node peak values from a sparse PVDF node or strain gauge array into a map over
+the panel, for localization and damage-extent reporting.
+
+Method
+------
+The map at every grid point is a fixed linear combination of the node values:
+
+    field = W @ node_values        (W: n_grid x n_nodes)
+
+W depends only on the fixture geometry (node coordinates, panel grid) and the method,
+so it is computed once per fixture and cached; each hit then costs one matrix-vector
+product.
+
+Interpolation methods (--method):
+- idw: inverse-distance weighting, w_j ∝ 1 / d_j^p (--idw-power, default 2). Exact at
+  nodes, never overshoots the node values.
+- rbf: radial basis interpolation with a linear polynomial term. Kernels (--rbf-kernel):
+  thin_plate (r^2 log r, no shape parameter), gaussian or multiquadric (both need
+  --rbf-epsilon, a length in metres). Smoother than IDW but can overshoot between nodes.
+
+Weight cache
+------------
+W is stored in --cache-dir as <sha256>.f64 (float64, row-major) plus <sha256>.json. The
+hash covers node order and coordinates, grid, method and parameters, so any geometry
+change produces a new entry; nothing is reused by accident.
+
+Inputs
+------
+1) Node map CSV (--nodes), one row per sensor node:
+   node_id,x_m,y_m,metric
+   metric is the column name whose peaks belong to that node (as in impact_peak_summary.csv).
+2) impact_peak_summary.csv from impact_peak_metrics.py (--peaks). Every hit file must
+   have a row for every node metric.
+
+Outputs
+-------
+- processed/field_map_summary.csv  (per hit: max value and its location, mean, extent)
+- processed/field_maps.f64 + processed/field_map_index.csv (only with --write-grids;
+  one row of n_grid float64 values per hit, grid in x-fastest order)
+
+Usage Example
+-------------
+python3 field_mapping.py \
+  --nodes results/T-IMP-011/RUN_x/calibration/node_positions.csv \
+  --peaks results/T-IMP-011/RUN_x/processed/impact_peak_summary.csv \
+  --output results/T-IMP-011/RUN_x/processed \
+  --panel-width-m 0.30 --panel-height-m 0.30 --grid-nx 61 --grid-ny 61 \
+  --method idw --extent-threshold 500
+
+Notes
+-----
+- Coordinates are in metres with the panel origin at (0, 0); grid points are cell centres.
+- Extent = area of grid cells whose mapped value >= --extent-threshold (same units as the
+  peaks). It is an interpolation-based estimate, not an inspection result; report it with
+  the node layout and method.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+from array import array
+from dataclasses import dataclass
+from operator import mul
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import atomic_open, open_text_read, write_csv, write_text
+
+WEIGHTS_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Node:
+    node_id: str
+    x_m: float
+    y_m: float
+    metric: str
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    width_m: float
+    height_m: float
+    nx: int
+    ny: int
+
+    def points(self) -> List[Tuple[float, float]]:
+        dx = self.width_m / self.nx
+        dy = self.height_m / self.ny
+        return [((ix + 0.5) * dx, (iy + 0.5) * dy) for iy in range(self.ny) for ix in range(self.nx)]
+
+    def cell_area_m2(self) -> float:
+        return (self.width_m / self.nx) * (self.height_m / self.ny)
+
+
+@dataclass(frozen=True)
+class MethodSpec:
+    method: str
+    idw_power: float = 2.0
+    rbf_kernel: str = "thin_plate"
+    rbf_epsilon: Optional[float] = None
+
+
+def _parse_float(value: str, *, path: str, col: str, row_idx: int) -> float:
+    try:
+        return float(value)
+    except Exception as e:
+        raise ValueError(
+            f"Non-numeric value in {path} at row {row_idx+2} col '{col}': {value!r}"
+        ) from e
+
+
+def _read_rows(path: str, required: Sequence[str]) -> List[Dict[str, str]]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = set(required) - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        rows = list(reader)
+    if not rows:
+        raise ValueError(f"No data rows in {path}")
+    return rows
+
+
+def _load_nodes(path: str) -> List[Node]:
+    rows = _read_rows(path, ["node_id", "x_m", "y_m", "metric"])
+    nodes: List[Node] = []
+    seen_ids = set()
+    seen_metrics = set()
+    for i, r in enumerate(rows):
+        node_id = (r["node_id"] or "").strip()
+        metric = (r["metric"] or "").strip()
+        if not node_id or not metric:
+            raise ValueError(f"Empty node_id/metric in {path} at row {i+2}")
+        if node_id in seen_ids or metric in seen_metrics:
+            raise ValueError(f"Duplicate node_id or metric in {path} at row {i+2}")
+        seen_ids.add(node_id)
+        seen_metrics.add(metric)
+        nodes.append(
+            Node(
+                node_id=node_id,
+                x_m=_parse_float(r["x_m"], path=path, col="x_m", row_idx=i),
+                y_m=_parse_float(r["y_m"], path=path, col="y_m", row_idx=i),
+                metric=metric,
+            )
+        )
+    if len(nodes) < 3:
+        raise ValueError(f"Need at least 3 nodes for a field map: {path}")
+    return nodes
+
+
+def _invert(m: List[List[float]]) -> List[List[float]]:
+    """
+    Gauss–Jordan inverse with partial pivoting (small systems: one row per node).
+    """
+    n = len(m)
+    a = [row[:] + [1.0 if i == j else 0.0 for j in range(n)] for i, row in enumerate(m)]
+    for col in range(n):
+        piv = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[piv][col]) < 1e-300:
+            raise ValueError("RBF system is singular; check for duplicate or collinear node positions.")
+        a[col], a[piv] = a[piv], a[col]
+        pv = a[col][col]
+        a[col] = [x / pv for x in a[col]]
+        for r in range(n):
+            if r != col and a[r][col] != 0.0:
+                f = a[r][col]
+                a[r] = [x - f * y for x, y in zip(a[r], a[col])]
+    return [row[n:] for row in a]
+
+
+def _kernel(spec: MethodSpec):
+    if spec.rbf_kernel == "thin_plate":
+        return lambda r: 0.0 if r == 0.0 else r * r * math.log(r)
+    eps = spec.rbf_epsilon
+    if eps is None or eps <= 0:
+        raise ValueError(f"--rbf-epsilon (m) is required and must be positive for the {spec.rbf_kernel} kernel.")
+    if spec.rbf_kernel == "gaussian":
+        return lambda r: math.exp(-((r / eps) ** 2))
+    if spec.rbf_kernel == "multiquadric":
+        return lambda r: math.sqrt(1.0 + (r / eps) ** 2)
+    raise ValueError(f"Unknown RBF kernel: {spec.rbf_kernel}")
+
+
+def _idw_weights(nodes: Sequence[Node], pts: Sequence[Tuple[float, float]], power: float) -> List[List[float]]:
+    out: List[List[float]] = []
+    for gx, gy in pts:
+        d = [math.hypot(gx - nd.x_m, gy - nd.y_m) for nd in nodes]
+        exact = [j for j, dj in enumerate(d) if dj == 0.0]
+        if exact:
+            row = [0.0] * len(nodes)
+            row[exact[0]] = 1.0
+        else:
+            inv = [dj ** -power for dj in d]
+            s = sum(inv)
+            row = [w / s for w in inv]
+        out.append(row)
+    return out
+
+
+def _rbf_weights(nodes: Sequence[Node], pts: Sequence[Tuple[float, float]], spec: MethodSpec) -> List[List[float]]:
+    """
+    Solve the augmented system [Phi P; P^T 0] once; each grid row of W is
+    [phi(g) p(g)] @ inverse[:, :n_nodes].
+    """
+    phi = _kernel(spec)
+    n = len(nodes)
+    m = n + 3
+    a = [[0.0] * m for _ in range(m)]
+    for i, ni in enumerate(nodes):
+        for j, nj in enumerate(nodes):
+            a[i][j] = phi(math.hypot(ni.x_m - nj.x_m, ni.y_m - nj.y_m))
+        a[i][n], a[i][n + 1], a[i][n + 2] = 1.0, ni.x_m, ni.y_m
+        a[n][i], a[n + 1][i], a[n + 2][i] = 1.0, ni.x_m, ni.y_m
+    inv = _invert(a)
+    cols = [[inv[r][c] for r in range(m)] for c in range(n)]  # inverse[:, c] for node c
+    out: List[List[float]] = []
+    for gx, gy in pts:
+        basis = [phi(math.hypot(gx - nd.x_m, gy - nd.y_m)) for nd in nodes] + [1.0, gx, gy]
+        out.append([sum(map(mul, basis, col)) for col in cols])
+    return out
+
+
+def _geometry_key(nodes: Sequence[Node], grid: GridSpec, spec: MethodSpec) -> str:
+    payload = {
+        "version": WEIGHTS_VERSION,
+        "nodes": [[nd.node_id, repr(nd.x_m), repr(nd.y_m)] for nd in nodes],
+        "grid": [repr(grid.width_m), repr(grid.height_m), grid.nx, grid.ny],
+        "method": spec.method,
+        "idw_power": repr(spec.idw_power) if spec.method == "idw" else None,
+        "rbf_kernel": spec.rbf_kernel if spec.method == "rbf" else None,
+        "rbf_epsilon": repr(spec.rbf_epsilon) if spec.method == "rbf" else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_or_build_weights(
+    nodes: Sequence[Node], grid: GridSpec, spec: MethodSpec, cache_dir: Optional[str]
+) -> Tuple[array, bool]:
+    """
+    Return (W as a flat row-major float64 array, loaded_from_cache).
+    """
+    n_grid, n_nodes = grid.nx * grid.ny, len(nodes)
+    key = _geometry_key(nodes, grid, spec)
+    bin_path = os.path.join(cache_dir, f"{key}.f64") if cache_dir else None
+
+    if bin_path and os.path.isfile(bin_path):
+        w = array("d")
+        with open(bin_path, "rb") as f:
+            w.frombytes(f.read())
+        if sys.byteorder != "little":
+            w.byteswap()
+        if len(w) == n_grid * n_nodes:
+            return w, True
+
+    pts = grid.points()
+    if spec.method == "idw":
+        rows = _idw_weights(nodes, pts, spec.idw_power)
+    elif spec.method == "rbf":
+        rows = _rbf_weights(nodes, pts, spec)
+    else:
+        raise ValueError(f"Unknown method: {spec.method}")
+    w = array("d", (x for row in rows for x in row))
+
+    if bin_path:
+        out = array("d", w)
+        if sys.byteorder != "little":
+            out.byteswap()
+        with atomic_open(bin_path, binary=True) as f:
+            out.tofile(f)
+        meta = {
+            "version": WEIGHTS_VERSION,
+            "n_grid": n_grid,
+            "n_nodes": n_nodes,
+            "node_ids": [nd.node_id for nd in nodes],
+            "grid": {"width_m": grid.width_m, "height_m": grid.height_m, "nx": grid.nx, "ny": grid.ny},
+            "method": spec.method,
+            "idw_power": spec.idw_power,
+            "rbf_kernel": spec.rbf_kernel,
+            "rbf_epsilon": spec.rbf_epsilon,
+            "layout": "float64-le row-major (grid x nodes), grid in x-fastest order",
+        }
+        write_text(os.path.join(cache_dir, f"{key}.json"), json.dumps(meta, indent=2, sort_keys=True) + "\n")
+    return w, False
+
+
+def _load_hit_vectors(path: str, nodes: Sequence[Node], value_col: str) -> List[Tuple[str, List[float]]]:
+    rows = _read_rows(path, ["filename", "metric", value_col])
+    node_pos = {nd.metric: j for j, nd in enumerate(nodes)}
+    by_file: Dict[str, List[Optional[float]]] = {}
+    order: List[str] = []
+    for i, r in enumerate(rows):
+        j = node_pos.get((r["metric"] or "").strip())
+        if j is None:
+            continue
+        fn = (r["filename"] or "").strip()
+        if fn not in by_file:
+            by_file[fn] = [None] * len(nodes)
+            order.append(fn)
+        by_file[fn][j] = _parse_float(r[value_col], path=path, col=value_col, row_idx=i)
+
+    if not order:
+        raise ValueError(f"No rows in {path} match the node metrics {sorted(node_pos)}")
+    out: List[Tuple[str, List[float]]] = []
+    for fn in order:
+        vec = by_file[fn]
+        missing = [nodes[j].metric for j, v in enumerate(vec) if v is None]
+        if missing:
+            raise ValueError(f"Hit '{fn}' in {path} has no peaks for node metric(s): {missing}")
+        out.append((fn, [float(v) for v in vec]))  # type: ignore[arg-type]
+    return out
+
+
+def map_hits(
+    w: array, n_nodes: int, hits: Sequence[Tuple[str, List[float]]]
+) -> List[Tuple[str, List[float]]]:
+    """
+    One matrix-vector product per hit; W rows are zero-copy views into the flat array.
+    """
+    mv = memoryview(w)
+    rows = [mv[g * n_nodes : (g + 1) * n_nodes] for g in range(len(w) // n_nodes)]
+    return [(fn, [sum(map(mul, row, v)) for row in rows]) for fn, v in hits]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Map AHIS per-node impact peaks onto a panel grid.")
+    ap.add_argument("--nodes", required=True, help="Node map CSV: node_id,x_m,y_m,metric")
+    ap.add_argument("--peaks", required=True, help="impact_peak_summary.csv from impact_peak_metrics.py")
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--panel-width-m", required=True, type=float, help="Panel extent in x (m).")
+    ap.add_argument("--panel-height-m", required=True, type=float, help="Panel extent in y (m).")
+    ap.add_argument("--grid-nx", type=int, default=50, help="Grid cells in x. Default: 50")
+    ap.add_argument("--grid-ny", type=int, default=50, help="Grid cells in y. Default: 50")
+    ap.add_argument("--method", choices=["idw", "rbf"], default="idw", help="Interpolation method. Default: idw")
+    ap.add_argument("--idw-power", type=float, default=2.0, help="IDW distance exponent. Default: 2")
+    ap.add_argument(
+        "--rbf-kernel",
+        choices=["thin_plate", "gaussian", "multiquadric"],
+        default="thin_plate",
+        help="RBF kernel. Default: thin_plate",
+    )
+    ap.add_argument("--rbf-epsilon", type=float, default=None, help="RBF shape length (m) for gaussian/multiquadric.")
+    ap.add_argument(
+        "--value-col",
+        choices=["peak_abs_value", "peak_value"],
+        default="peak_abs_value",
+        help="Which peak column to map. Default: peak_abs_value",
+    )
+    ap.add_argument("--extent-threshold", type=float, default=None, help="Report area where mapped value >= this.")
+    ap.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for cached weight matrices. Default: <output>/field_weight_cache",
+    )
+    ap.add_argument("--write-grids", action="store_true", help="Also write every mapped grid to field_maps.f64.")
+
+    args = ap.parse_args(argv)
+    if args.panel_width_m <= 0 or args.panel_height_m <= 0:
+        raise ValueError("--panel-width-m and --panel-height-m must be positive.")
+    if args.grid_nx < 1 or args.grid_ny < 1:
+        raise ValueError("--grid-nx and --grid-ny must be >= 1.")
+    if args.method == "idw" and args.idw_power <= 0:
+        raise ValueError("--idw-power must be positive.")
+
+    nodes = _load_nodes(args.nodes)
+    grid = GridSpec(width_m=args.panel_width_m, height_m=args.panel_height_m, nx=args.grid_nx, ny=args.grid_ny)
+    spec = MethodSpec(
+        method=args.method, idw_power=args.idw_power, rbf_kernel=args.rbf_kernel, rbf_epsilon=args.rbf_epsilon
+    )
+    cache_dir = args.cache_dir or os.path.join(args.output, "field_weight_cache")
+    w, _ = load_or_build_weights(nodes, grid, spec, cache_dir)
+
+    hits = _load_hit_vectors(args.peaks, nodes, args.value_col)
+    maps = map_hits(w, len(nodes), hits)
+
+    pts = grid.points()
+    cell_area = grid.cell_area_m2()
+    summary_rows = []
+    for fn, field in maps:
+        g_max = max(range(len(field)), key=field.__getitem__)
+        row = [fn, field[g_max], pts[g_max][0], pts[g_max][1], sum(field) / len(field)]
+        if args.extent_threshold is not None:
+            cells = sum(1 for v in field if v >= args.extent_threshold)
+            row += [args.extent_threshold, cells, cells * cell_area]
+        else:
+            row += ["", "", ""]
+        summary_rows.append(row)
+    write_csv(
+        os.path.join(args.output, "field_map_summary.csv"),
+        [
+            "filename",
+            "field_max",
+            "x_at_max_m",
+            "y_at_max_m",
+            "field_mean",
+            "extent_threshold",
+            "extent_cells",
+            "extent_area_m2",
+        ],
+        summary_rows,
+    )
+
+    if args.write_grids:
+        flat = array("d", (v for _, field in maps for v in field))
+        if sys.byteorder != "little":
+            flat.byteswap()
+        with atomic_open(os.path.join(args.output, "field_maps.f64"), binary=True) as f:
+            flat.tofile(f)
+        write_csv(
+            os.path.join(args.output, "field_map_index.csv"),
+            ["row", "filename", "grid_nx", "grid_ny", "panel_width_m", "panel_height_m", "method"],
+            ([i, fn, grid.nx, grid.ny, grid.width_m, grid.height_m, spec.method] for i, (fn, _) in enumerate(maps)),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -27,6 +27,9 @@ Outputs
 - processed/impact_peak_summary.csv
 - processed/impact_peak_group_stats.csv (only if --map is provided)
 
+Raw inputs may be plain .csv or gzip-compressed .csv.gz. Pass --gzip to write the
+processed CSVs compressed (.csv.gz); downstream scripts read either form.
+
 No plots are generated by default (PoC hygiene). Plotting can be added later once real data exists.
 
 Usage Examples
@@ -64,6 +67,9 @@ import os
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Sequence, Tuple
 
+from analysis_io import cached_read, gz_name, list_csv_files, open_text_read, write_csv
+from timeseries import TimeSeries
+
 
 @dataclass(frozen=True)
 class PeakResult:
@@ -76,7 +82,11 @@ class PeakResult:
 
 
 def _read_csv_rows(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
-    with open(path, "r", newline="", encoding="utf-8") as f:
+    return cached_read("csv_rows", path, (), lambda: _parse_csv_rows(path))
+
+
+def _parse_csv_rows(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    with open_text_read(path) as f:
         reader = csv.DictReader(f)
         if reader.fieldnames is None:
             raise ValueError(f"CSV has no header row: {path}")
@@ -87,37 +97,26 @@ def _read_csv_rows(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
         return reader.fieldnames, rows
 
 
-def _parse_float(value: str, *, path: str, col: str, row_idx: int) -> float:
-    try:
-        return float(value)
-    except Exception as e:
-        raise ValueError(
-            f"Non-numeric value in {path} at row {row_idx+2} col '{col}': {value!r}"
-        ) from e
+def _read_waveform(path: str, time_col: str, metrics: Tuple[str, ...]) -> TimeSeries:
+    # Only the time and metric columns are parsed; other columns (notes, IDs) are skipped.
+    return cached_read(
+        "impact_waveform",
+        path,
+        (time_col, metrics),
+        lambda: TimeSeries.from_csv(path, time_col, metrics, increasing=False),
+    )
 
 
 def _compute_peak_for_metric(
+    series: TimeSeries,
     path: str,
-    time_col: str,
     metric_col: str,
 ) -> PeakResult:
-    headers, rows = _read_csv_rows(path)
-
-    if time_col not in headers:
-        raise ValueError(f"Missing time column '{time_col}' in {path}. Found: {headers}")
-    if metric_col not in headers:
-        raise ValueError(f"Missing metric column '{metric_col}' in {path}. Found: {headers}")
-
-    if len(rows) == 0:
-        raise ValueError(f"No data rows in {path}")
-
     best_abs = -1.0
     best_val = 0.0
     best_t = 0.0
 
-    for i, row in enumerate(rows):
-        t = _parse_float(row[time_col], path=path, col=time_col, row_idx=i)
-        v = _parse_float(row[metric_col], path=path, col=metric_col, row_idx=i)
+    for t, v in zip(series.t, series[metric_col]):
         av = abs(v)
         if av > best_abs:
             best_abs = av
@@ -130,25 +129,10 @@ def _compute_peak_for_metric(
         peak_value=best_val,
         peak_abs_value=best_abs,
         t_at_peak_s=best_t,
-        n_rows=len(rows),
+        n_rows=len(series),
     )
 
 
-def _list_csv_files(input_dir: str) -> List[str]:
-    if not os.path.isdir(input_dir):
-        raise ValueError(f"Input path is not a directory: {input_dir}")
-
-    files = []
-    for name in os.listdir(input_dir):
-        if name.lower().endswith(".csv"):
-            files.append(os.path.join(input_dir, name))
-
-    files.sort()
-    if not files:
-        raise ValueError(f"No .csv files found in input directory: {input_dir}")
-    return files
-
-
 def _load_group_map(map_path: str) -> Dict[str, str]:
     """
     Map file must contain header: filename,group
@@ -189,12 +173,11 @@ def _std_sample(xs: Sequence[float]) -> float:
 
 
 def _write_summary_csv(out_path: str, peaks: List[PeakResult]) -> None:
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["filename", "metric", "peak_value", "peak_abs_value", "t_at_peak_s", "n_rows"])
-        for p in peaks:
-            writer.writerow([p.filename, p.metric, p.peak_value, p.peak_abs_value, p.t_at_peak_s, p.n_rows])
+    write_csv(
+        out_path,
+        ["filename", "metric", "peak_value", "peak_abs_value", "t_at_peak_s", "n_rows"],
+        ([p.filename, p.metric, p.peak_value, p.peak_abs_value, p.t_at_peak_s, p.n_rows] for p in peaks),
+    )
 
 
 def _write_group_stats_csv(out_path: str, peaks: List[PeakResult], group_map: Dict[str, str]) -> None:
@@ -221,15 +204,17 @@ def _write_group_stats_csv(out_path: str, peaks: List[PeakResult], group_map: Di
             + ", ".join(sorted(set(missing)))
         )
 
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["group", "metric", "n", "mean_peak_abs", "std_peak_abs_sample"])
-        for (grp, metric), values in sorted(grouped.items()):
-            writer.writerow([grp, metric, len(values), _mean(values), _std_sample(values)])
+    write_csv(
+        out_path,
+        ["group", "metric", "n", "mean_peak_abs", "std_peak_abs_sample"],
+        (
+            [grp, metric, len(values), _mean(values), _std_sample(values)]
+            for (grp, metric), values in sorted(grouped.items())
+        ),
+    )
 
 
-def main() -> int:
+def main(argv: Optional[Sequence[str]] = None) -> int:
     ap = argparse.ArgumentParser(description="Compute AHIS T-IMP-010 impact peak metrics from raw CSV time series.")
     ap.add_argument("--input", required=True, help="Directory containing raw CSV files for a run.")
     ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
@@ -245,27 +230,29 @@ def main() -> int:
         default=None,
         help="Optional CSV mapping file with columns: filename,group for grouped stats.",
     )
+    ap.add_argument("--gzip", action="store_true", help="Write processed CSVs gzip-compressed (.csv.gz).")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
     input_dir: str = args.input
     out_dir: str = args.output
     time_col: str = args.time_col
     metrics: List[str] = args.metric
     map_path: Optional[str] = args.map
 
-    csv_files = _list_csv_files(input_dir)
+    csv_files = list_csv_files(input_dir)
 
     peaks: List[PeakResult] = []
     for path in csv_files:
+        waveform = _read_waveform(path, time_col, tuple(metrics))
         for metric in metrics:
-            peaks.append(_compute_peak_for_metric(path, time_col=time_col, metric_col=metric))
+            peaks.append(_compute_peak_for_metric(waveform, path, metric_col=metric))
 
-    summary_path = os.path.join(out_dir, "impact_peak_summary.csv")
+    summary_path = os.path.join(out_dir, gz_name("impact_peak_summary.csv", args.gzip))
     _write_summary_csv(summary_path, peaks)
 
     if map_path is not None:
         group_map = _load_group_map(map_path)
-        group_stats_path = os.path.join(out_dir, "impact_peak_group_stats.csv")
+        group_stats_path = os.path.join(out_dir, gz_name("impact_peak_group_stats.csv", args.gzip))
         _write_group_stats_csv(group_stats_path, peaks, group_map)
 
     return 0
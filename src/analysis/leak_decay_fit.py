@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Leak Decay Model Fitting (T-PRS-050)
+
+Purpose
+-------
+Fit physical leak parameters to the post-onset pressure decay, so configurations can
+be compared by more than the mean/median dP/dt over the onset window.
+
+Model
+-----
+After leak onset the gauge-to-ambient pressure difference is modelled as a single
+exponential decay:
+
+    p(t) - p_amb = dP0 * exp(-(t - t_onset) / tau)
+
+with p_amb supplied by you (--ambient-pressure; e.g. 0 for a vacuum chamber).
+
+Fitting:
+1) Closed-form initial estimate: ordinary least squares of ln(p - p_amb) vs t
+   (log-linear fit). Samples with p <= p_amb are excluded from this step only.
+2) Refinement: Gauss–Newton on the pressure residuals (not the log residuals, which
+   over-weight the noisy tail). Each iteration builds the 2x2 normal equations from
+   running sums in one pass over the segment; step halving guards against overshoot.
+
+Derived parameters (only when the inputs they need are given):
+- Standard leak rate at fit start: Q = V * dP0 / tau  (pressure-units * m^3 / s)
+  Requires --volume-m3 (pressurised volume).
+- Equivalent leak area (Cd * A, m^2) for choked isothermal orifice flow of an ideal gas:
+      A_eff = V / (tau * sqrt(gamma * R * T) * (2 / (gamma + 1))^((gamma + 1) / (2 * (gamma - 1))))
+  Requires --volume-m3 and --gas-temperature-k; R and gamma default to air.
+  Only meaningful with pressure in Pa and choked flow (p_amb / p <= critical ratio);
+  fit_choked_at_start reports whether that held at the start of the fit window.
+
+Outputs
+-------
+The fit is reported as fit_* columns appended to leak_rate_summary.csv, which
+delta_report_generator.py reads. Two ways to run it:
+
+1) Per run, inside leak_rate_metrics.py (pass --ambient-pressure there).
+2) Across a whole campaign with this script: every run package under --campaign that
+   has processed/leak_onset_summary.csv and processed/leak_rate_timeseries.f64 is fitted
+   (in parallel), its leak_rate_summary.csv gets updated fit_* columns, and one
+   comparison table is written:
+   - <output>/leak_decay_fit_campaign.csv (one row per run)
+
+Usage Example
+-------------
+python3 leak_decay_fit.py \
+  --campaign results/T-PRS-050 \
+  --output results/T-PRS-050 \
+  --ambient-pressure 0 \
+  --volume-m3 0.012 \
+  --gas-temperature-k 293.15
+
+Notes
+-----
+- The fit uses the samples from onset to the end of the log, or only the first
+  --fit-seconds after onset if given.
+- A poor single-exponential fit (low fit_r_squared, structured residuals) usually means
+  the leak path changed during the test; report that instead of the parameters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import open_text_read, process_pool, write_csv
+from timeseries import LEAK_TIMESERIES_COLUMNS, TimeSeries
+
+AIR_GAS_CONSTANT_J_KG_K = 287.05
+AIR_GAMMA = 1.4
+MAX_ITERATIONS = 50
+
+FIT_COLUMNS = [
+    "fit_model",
+    "fit_t_start_s",
+    "fit_t_end_s",
+    "fit_n_samples",
+    "fit_ambient_pressure",
+    "fit_delta_p0",
+    "fit_tau_s",
+    "fit_loglinear_tau_s",
+    "fit_iterations",
+    "fit_rms_residual",
+    "fit_max_abs_residual",
+    "fit_r_squared",
+    "fit_volume_m3",
+    "fit_leak_rate_pv_per_s",
+    "fit_equiv_leak_area_m2",
+    "fit_choked_at_start",
+]
+
+
+@dataclass(frozen=True)
+class GasProps:
+    volume_m3: Optional[float] = None
+    temperature_k: Optional[float] = None
+    gas_constant_j_kg_k: float = AIR_GAS_CONSTANT_J_KG_K
+    gamma: float = AIR_GAMMA
+
+
+@dataclass(frozen=True)
+class DecayFit:
+    t_start_s: float
+    t_end_s: float
+    n_samples: int
+    ambient_pressure: float
+    delta_p0: float
+    tau_s: float
+    loglinear_tau_s: float
+    iterations: int
+    rms_residual: float
+    max_abs_residual: float
+    r_squared: float
+    volume_m3: Optional[float]
+    leak_rate_pv_per_s: Optional[float]
+    equiv_leak_area_m2: Optional[float]
+    choked_at_start: Optional[bool]
+
+    def row(self) -> List[object]:
+        def opt(x: object) -> object:
+            return "" if x is None else x
+
+        return [
+            "exponential",
+            self.t_start_s,
+            self.t_end_s,
+            self.n_samples,
+            self.ambient_pressure,
+            self.delta_p0,
+            self.tau_s,
+            self.loglinear_tau_s,
+            self.iterations,
+            self.rms_residual,
+            self.max_abs_residual,
+            self.r_squared,
+            opt(self.volume_m3),
+            opt(self.leak_rate_pv_per_s),
+            opt(self.equiv_leak_area_m2),
+            "" if self.choked_at_start is None else str(self.choked_at_start).lower(),
+        ]
+
+
+def _loglinear_estimate(s: Sequence[float], y: Sequence[float]) -> Tuple[float, float]:
+    """
+    OLS of ln(y) = ln(A) - k s over samples with y > 0. Returns (A, k).
+    """
+    pairs = [(si, math.log(yi)) for si, yi in zip(s, y) if yi > 0]
+    n = len(pairs)
+    if n < 3:
+        raise ValueError("Need at least 3 post-onset samples above ambient pressure for the decay fit.")
+    sx = sum(p[0] for p in pairs)
+    sy = sum(p[1] for p in pairs)
+    sxx = sum(p[0] * p[0] for p in pairs)
+    sxy = sum(p[0] * p[1] for p in pairs)
+    denom = n * sxx - sx * sx
+    if denom <= 0:
+        raise ValueError("Degenerate time base in decay fit segment.")
+    slope = (n * sxy - sx * sy) / denom
+    intercept = (sy - slope * sx) / n
+    return math.exp(intercept), -slope
+
+
+def _sse(s: Sequence[float], y: Sequence[float], a: float, k: float) -> float:
+    return sum((yi - a * math.exp(-k * si)) ** 2 for si, yi in zip(s, y))
+
+
+def fit_exponential_decay(
+    t: Sequence[float], p: Sequence[float], ambient_pressure: float
+) -> Tuple[float, float, float, int]:
+    """
+    Fit p - ambient = A * exp(-k (t - t[0])). Returns (A, k, k_loglinear, iterations).
+    """
+    t0 = t[0]
+    s = [ti - t0 for ti in t]
+    y = [pi - ambient_pressure for pi in p]
+    a, k = _loglinear_estimate(s, y)
+    k_log = k
+    if k <= 0:
+        raise ValueError("Post-onset pressure is not decaying toward ambient; check --ambient-pressure and units.")
+
+    sse = _sse(s, y, a, k)
+    it = 0
+    for it in range(1, MAX_ITERATIONS + 1):
+        # Normal equations for r = y - A e^{-ks}: J = [-e, A s e].
+        jaa = jak = jkk = ga = gk = 0.0
+        for si, yi in zip(s, y):
+            e = math.exp(-k * si)
+            r = yi - a * e
+            da = -e
+            dk = a * si * e
+            jaa += da * da
+            jak += da * dk
+            jkk += dk * dk
+            ga += da * r
+            gk += dk * r
+        det = jaa * jkk - jak * jak
+        if det <= 0:
+            break
+        step_a = -(jkk * ga - jak * gk) / det
+        step_k = -(jaa * gk - jak * ga) / det
+
+        lam = 1.0
+        while lam > 1e-6:
+            na, nk = a + lam * step_a, k + lam * step_k
+            if nk > 0:
+                new_sse = _sse(s, y, na, nk)
+                if new_sse <= sse:
+                    break
+            lam *= 0.5
+        else:
+            break
+        converged = abs(nk - k) <= 1e-10 * abs(k) and abs(na - a) <= 1e-10 * abs(a)
+        a, k, sse = na, nk, new_sse
+        if converged:
+            break
+    return a, k, k_log, it
+
+
+def fit_leak_decay(
+    t: Sequence[float],
+    p: Sequence[float],
+    onset_idx: int,
+    ambient_pressure: float,
+    gas: GasProps,
+    fit_seconds: Optional[float] = None,
+) -> DecayFit:
+    """
+    Fit the post-onset segment [onset_idx, end] (or onset + fit_seconds) of a pressure log.
+    """
+    if not 0 <= onset_idx < len(t):
+        raise ValueError(f"Onset index {onset_idx} outside the log (n={len(t)}).")
+    end = len(t)
+    if fit_seconds is not None:
+        if fit_seconds <= 0:
+            raise ValueError("--fit-seconds must be positive.")
+        # Time is strictly increasing: binary search for the end of the fit window.
+        end = bisect.bisect_right(t, t[onset_idx] + fit_seconds, onset_idx)
+    seg_t = list(t[onset_idx:end])
+    seg_p = list(p[onset_idx:end])
+    if len(seg_t) < 3:
+        raise ValueError("Need at least 3 post-onset samples for the decay fit.")
+
+    a, k, k_log, iterations = fit_exponential_decay(seg_t, seg_p, ambient_pressure)
+    tau = 1.0 / k
+
+    t0 = seg_t[0]
+    residuals = [pi - ambient_pressure - a * math.exp(-k * (ti - t0)) for ti, pi in zip(seg_t, seg_p)]
+    n = len(residuals)
+    sse = sum(r * r for r in residuals)
+    mean_p = sum(seg_p) / n
+    sst = sum((pi - mean_p) ** 2 for pi in seg_p)
+
+    leak_rate = None
+    area = None
+    choked = None
+    if gas.volume_m3 is not None:
+        leak_rate = gas.volume_m3 * a / tau
+        if gas.temperature_k is not None:
+            g = gas.gamma
+            flow_factor = (2.0 / (g + 1.0)) ** ((g + 1.0) / (2.0 * (g - 1.0)))
+            area = gas.volume_m3 / (tau * math.sqrt(g * gas.gas_constant_j_kg_k * gas.temperature_k) * flow_factor)
+            critical_ratio = (2.0 / (g + 1.0)) ** (g / (g - 1.0))
+            p_start = ambient_pressure + a
+            choked = p_start > 0 and ambient_pressure / p_start <= critical_ratio
+
+    return DecayFit(
+        t_start_s=seg_t[0],
+        t_end_s=seg_t[-1],
+        n_samples=n,
+        ambient_pressure=ambient_pressure,
+        delta_p0=a,
+        tau_s=tau,
+        loglinear_tau_s=1.0 / k_log,
+        iterations=iterations,
+        rms_residual=math.sqrt(sse / n),
+        max_abs_residual=max(abs(r) for r in residuals),
+        r_squared=1.0 - sse / sst if sst > 0 else float("nan"),
+        volume_m3=gas.volume_m3,
+        leak_rate_pv_per_s=leak_rate,
+        equiv_leak_area_m2=area,
+        choked_at_start=choked,
+    )
+
+
+def check_gas_args(gas: GasProps) -> None:
+    if gas.volume_m3 is not None and gas.volume_m3 <= 0:
+        raise ValueError("--volume-m3 must be positive.")
+    if gas.temperature_k is not None:
+        if gas.volume_m3 is None:
+            raise ValueError("--gas-temperature-k requires --volume-m3 (needed for the equivalent leak area).")
+        if gas.temperature_k <= 0:
+            raise ValueError("--gas-temperature-k must be positive (kelvin).")
+    if gas.gas_constant_j_kg_k <= 0 or gas.gamma <= 1.0:
+        raise ValueError("--gas-constant must be > 0 and --gamma must be > 1.")
+
+
+def add_fit_arguments(ap: argparse.ArgumentParser) -> None:
+    """
+    CLI arguments shared by leak_rate_metrics.py and this script.
+    """
+    ap.add_argument("--volume-m3", type=float, default=None, help="Pressurised volume (m^3) for leak rate and area.")
+    ap.add_argument("--gas-temperature-k", type=float, default=None, help="Gas temperature (K) for equivalent leak area.")
+    ap.add_argument(
+        "--gas-constant",
+        type=float,
+        default=AIR_GAS_CONSTANT_J_KG_K,
+        help=f"Specific gas constant (J/(kg K)). Default: {AIR_GAS_CONSTANT_J_KG_K} (air)",
+    )
+    ap.add_argument("--gamma", type=float, default=AIR_GAMMA, help=f"Ratio of specific heats. Default: {AIR_GAMMA} (air)")
+    ap.add_argument("--fit-seconds", type=float, default=None, help="Fit only this many seconds after onset. Default: to end")
+
+
+def gas_from_args(args: argparse.Namespace) -> GasProps:
+    gas = GasProps(
+        volume_m3=args.volume_m3,
+        temperature_k=args.gas_temperature_k,
+        gas_constant_j_kg_k=args.gas_constant,
+        gamma=args.gamma,
+    )
+    check_gas_args(gas)
+    return gas
+
+
+def _read_single_row(path: str) -> Tuple[List[str], Dict[str, str]]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        rows = list(reader)
+    if len(rows) != 1:
+        raise ValueError(f"Expected exactly 1 data row in {path}, found {len(rows)}")
+    return list(reader.fieldnames), rows[0]
+
+
+def update_summary_with_fit(summary_path: str, fit: DecayFit) -> None:
+    """
+    Replace any fit_* columns in leak_rate_summary.csv with the new fit.
+    """
+    headers, row = _read_single_row(summary_path)
+    keep = [h for h in headers if not h.startswith("fit_")]
+    write_csv(summary_path, keep + FIT_COLUMNS, [[row[h] for h in keep] + fit.row()])
+
+
+def _fit_run(job: Tuple[str, float, GasProps, Optional[float]]) -> Tuple[str, DecayFit]:
+    processed_dir, ambient, gas, fit_seconds = job
+    _, onset = _read_single_row(os.path.join(processed_dir, "leak_onset_summary.csv"))
+    try:
+        onset_idx = int(onset["onset_index"])
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Missing or invalid onset_index in {processed_dir}/leak_onset_summary.csv") from e
+    series = TimeSeries.from_f64(
+        os.path.join(processed_dir, "leak_rate_timeseries.f64"),
+        LEAK_TIMESERIES_COLUMNS[1:],
+        time_name=LEAK_TIMESERIES_COLUMNS[0],
+    )
+    fit = fit_leak_decay(series.t, series["pressure"], onset_idx, ambient, gas, fit_seconds)
+    summary = os.path.join(processed_dir, "leak_rate_summary.csv")
+    if os.path.isfile(summary):
+        update_summary_with_fit(summary, fit)
+    return processed_dir, fit
+
+
+def _find_processed_dirs(campaign_root: str) -> List[str]:
+    if not os.path.isdir(campaign_root):
+        raise ValueError(f"Campaign path is not a directory: {campaign_root}")
+    out = []
+    for run_id in sorted(os.listdir(campaign_root)):
+        processed = os.path.join(campaign_root, run_id, "processed")
+        if os.path.isfile(os.path.join(processed, "leak_onset_summary.csv")) and os.path.isfile(
+            os.path.join(processed, "leak_rate_timeseries.f64")
+        ):
+            out.append(processed)
+    if not out:
+        raise ValueError(
+            f"No run packages with processed/leak_onset_summary.csv and leak_rate_timeseries.f64 under {campaign_root}"
+        )
+    return out
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Fit leak-decay models to every AHIS T-PRS-050 run in a campaign.")
+    ap.add_argument("--campaign", required=True, help="Directory containing <RUN_ID>/processed/ leak outputs.")
+    ap.add_argument("--output", required=True, help="Directory for leak_decay_fit_campaign.csv.")
+    ap.add_argument(
+        "--ambient-pressure",
+        required=True,
+        type=float,
+        help="Pressure the leak decays toward (same units as the logs, e.g. 0 for vacuum).",
+    )
+    add_fit_arguments(ap)
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes. Default: CPU count")
+
+    args = ap.parse_args(argv)
+    gas = gas_from_args(args)
+    if args.workers is not None and args.workers < 1:
+        raise ValueError("--workers must be >= 1.")
+
+    jobs = [(d, args.ambient_pressure, gas, args.fit_seconds) for d in _find_processed_dirs(args.campaign)]
+    with process_pool(args.workers) as pool:
+        results = list(pool.map(_fit_run, jobs))
+
+    rows = []
+    for processed_dir, fit in results:
+        run_id = os.path.basename(os.path.dirname(os.path.abspath(processed_dir)))
+        rows.append([run_id] + fit.row())
+    write_csv(os.path.join(args.output, "leak_decay_fit_campaign.csv"), ["run_id"] + FIT_COLUMNS, rows)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
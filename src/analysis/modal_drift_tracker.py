@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Incremental Modal-Frequency Drift Tracker (T-FAT-020)
+
+Purpose
+-------
+Track "stiffness/FRF feature drift" over a long fatigue run from periodic FRF snapshots
+(one FRF magnitude table every N cycles). For each tracked mode, every new snapshot
+updates:
+- the resonance frequency fn (peak picking near the previous estimate)
+- a half-power damping estimate zeta (docs/20_Modal_Testing_FRF_Method.md section 7)
+- drift relative to the reference (first snapshots) and a linear trend vs cycles
+- a two-sided CUSUM change-point flag on fn
+
+All of this is kept as incremental state, so each run only reads the snapshots added
+since the previous run: analysing snapshot 5,000 costs the same as snapshot 5.
+
+Inputs
+------
+A) Snapshot index CSV (--snapshots), appended to as the test runs:
+   cycles,filename
+   Filenames are relative to the index file's directory (or absolute). cycles must be
+   strictly increasing.
+
+B) FRF snapshot CSVs with a frequency column (--freq-col, default frequency_hz) and
+   either a magnitude column (--mag-col) or real/imaginary columns (--re-col/--im-col).
+   Frequencies must be strictly increasing.
+
+C) Mode seeds CSV (--modes):
+   mode_id,f_seed_hz,search_half_width_hz
+   The first snapshot is searched around f_seed_hz; later snapshots around the previous
+   estimate. The half-width should cover the expected change between two snapshots.
+
+Method (per mode, per snapshot)
+-------------------------------
+1) Peak: largest magnitude within previous fn ± search_half_width_hz (bisect into the
+   frequency grid, so only the window is scanned), refined by a parabola through the
+   peak bin and its neighbours.
+2) Damping: half-power bandwidth. The -3 dB (peak/sqrt(2)) crossings either side of the
+   peak are located by linear interpolation, searching up to two half-widths away;
+   zeta = (f2 - f1) / (2 fn). Left blank if a crossing is not found.
+3) Reference: mean fn and zeta of the first --baseline-snapshots snapshots. drift_pct
+   is (fn - fn_ref) / fn_ref * 100.
+4) Trend: running least-squares slope of fn vs cycles (Welford-style co-moments).
+5) Change points: two-sided CUSUM of z = (fn - mean) / sigma against the current
+   baseline, with allowance --cusum-k and threshold --cusum-h (both in sigma units).
+   sigma is the baseline standard deviation, floored at the frequency quantisation
+   df / sqrt(12). When a CUSUM exceeds h the snapshot is flagged, the sums reset and
+   the next --baseline-snapshots snapshots form a new baseline, so one step change is
+   flagged once. While the new baseline fills, each snapshot is still scored (against
+   the mean of the snapshots collected so far, with the previous baseline's sigma), so
+   a second step inside the re-baseline window is flagged rather than absorbed; the
+   re-baseline then restarts. The reference for drift_pct is never reset.
+
+Quality flags per estimate: ok, edge (peak at the search-window edge: the mode may
+have moved further than the half-width), no_half_power (damping not resolved).
+
+Outputs
+-------
+- processed/modal_drift_history.csv   (append-only; one row per snapshot and mode)
+- processed/modal_drift_summary.csv   (one row per mode; rewritten each run)
+- processed/modal_drift_state.json    (incremental state; --state to relocate)
+
+The history file is appended before the state is replaced. The state records the
+history size, so a run interrupted in between is rolled back (history truncated) on
+the next run instead of duplicating rows. Without a state file the history is started
+from scratch.
+
+Usage Example
+-------------
+python3 modal_drift_tracker.py \
+  --snapshots results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/raw/frf_snapshots.csv \
+  --modes results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/raw/mode_seeds.csv \
+  --output results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/processed \
+  --mag-col frf_mag
+
+Notes
+-----
+- Changing --modes, --baseline-snapshots or the CUSUM parameters for an existing state
+  is an error; delete the state (and history) to re-analyse from scratch.
+- Half-power damping is a PoC-level indicator; it is biased for coarse frequency
+  resolution (a few bins across the peak) and for closely spaced modes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import ensure_dir, open_text_read, write_csv, write_text
+from rollup_metrics import RunningStats
+
+STATE_VERSION = 1
+HALF_POWER = 1.0 / math.sqrt(2.0)
+
+HISTORY_COLUMNS = [
+    "snapshot_index",
+    "cycles",
+    "filename",
+    "mode_id",
+    "fn_hz",
+    "zeta",
+    "peak_mag",
+    "quality",
+    "drift_pct",
+    "cusum_pos",
+    "cusum_neg",
+    "change_point",
+]
+
+
+@dataclass(frozen=True)
+class ModeSeed:
+    mode_id: str
+    f_seed_hz: float
+    search_half_width_hz: float
+
+
+@dataclass(frozen=True)
+class PeakEstimate:
+    fn_hz: float
+    zeta: Optional[float]
+    peak_mag: float
+    df_hz: float
+    quality: str
+
+
+def _load_modes(path: str) -> List[ModeSeed]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = {"mode_id", "f_seed_hz", "search_half_width_hz"} - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        modes: List[ModeSeed] = []
+        for i, r in enumerate(reader):
+            mode_id = (r["mode_id"] or "").strip()
+            try:
+                f0, w = float(r["f_seed_hz"]), float(r["search_half_width_hz"])
+            except Exception as e:
+                raise ValueError(f"Non-numeric mode seed in {path} at row {i+2}") from e
+            if not mode_id:
+                raise ValueError(f"Empty mode_id in {path} at row {i+2}")
+            if not (f0 > 0 and w > 0):
+                raise ValueError(f"Require f_seed_hz > 0 and search_half_width_hz > 0 in {path} at row {i+2}")
+            modes.append(ModeSeed(mode_id=mode_id, f_seed_hz=f0, search_half_width_hz=w))
+    if not modes:
+        raise ValueError(f"No modes in {path}")
+    if len({m.mode_id for m in modes}) != len(modes):
+        raise ValueError(f"Duplicate mode_id in {path}")
+    return modes
+
+
+def _load_index(path: str) -> List[Tuple[int, str]]:
+    base = os.path.dirname(os.path.abspath(path))
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = {"cycles", "filename"} - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        out: List[Tuple[int, str]] = []
+        for i, r in enumerate(reader):
+            try:
+                cycles = int(r["cycles"])
+            except Exception as e:
+                raise ValueError(f"Non-integer cycles in {path} at row {i+2}: {r['cycles']!r}") from e
+            name = (r["filename"] or "").strip()
+            if not name:
+                raise ValueError(f"Empty filename in {path} at row {i+2}")
+            if out and cycles <= out[-1][0]:
+                raise ValueError(f"cycles must be strictly increasing in {path} at row {i+2}")
+            out.append((cycles, name if os.path.isabs(name) else os.path.join(base, name)))
+    return out
+
+
+def load_frf(
+    path: str, freq_col: str, mag_col: Optional[str], re_col: Optional[str], im_col: Optional[str]
+) -> Tuple[List[float], List[float]]:
+    """
+    Read one FRF snapshot as (frequencies, magnitudes).
+    """
+    with open_text_read(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        wanted = [freq_col] + ([mag_col] if mag_col else [re_col, im_col])
+        missing = [c for c in wanted if c not in header]
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {missing}. Found: {header}")
+        idx = [header.index(c) for c in wanted]  # type: ignore[arg-type]
+        freqs: List[float] = []
+        mags: List[float] = []
+        for i, row in enumerate(reader):
+            try:
+                vals = [float(row[j]) for j in idx]
+            except Exception as e:
+                raise ValueError(f"Non-numeric value in {path} at row {i+2}") from e
+            if not all(math.isfinite(v) for v in vals):
+                raise ValueError(f"Non-finite value in {path} at row {i+2}")
+            if freqs and vals[0] <= freqs[-1]:
+                raise ValueError(f"Frequency must be strictly increasing in {path} at row {i+2}")
+            freqs.append(vals[0])
+            mags.append(vals[1] if mag_col else math.hypot(vals[1], vals[2]))
+    if len(freqs) < 3:
+        raise ValueError(f"Need at least 3 frequency lines in {path}")
+    return freqs, mags
+
+
+def _half_power_crossing(freqs: Sequence[float], mags: Sequence[float], k: int, level: float, step: int, f_limit: float) -> Optional[float]:
+    j = k
+    while 0 <= j + step < len(freqs):
+        nj = j + step
+        if abs(freqs[nj] - freqs[k]) > f_limit:
+            return None
+        if mags[nj] <= level:
+            # Linear interpolation between j (above) and nj (at/below).
+            frac = (mags[j] - level) / (mags[j] - mags[nj])
+            return freqs[j] + frac * (freqs[nj] - freqs[j])
+        j = nj
+    return None
+
+
+def pick_peak(freqs: Sequence[float], mags: Sequence[float], f_center: float, half_width: float) -> PeakEstimate:
+    """
+    Peak and half-power damping in f_center ± half_width. Only the window (and up to
+    two half-widths for the -3 dB crossings) is scanned.
+    """
+    lo = bisect.bisect_left(freqs, f_center - half_width)
+    hi = bisect.bisect_right(freqs, f_center + half_width)
+    if hi - lo < 1:
+        raise ValueError(f"No frequency lines within {f_center} ± {half_width} Hz")
+    k = max(range(lo, hi), key=mags.__getitem__)
+    quality = "edge" if (k == lo or k == hi - 1) and hi - lo > 1 else "ok"
+
+    fn, peak = freqs[k], mags[k]
+    if 0 < k < len(freqs) - 1:
+        # Vertex of the parabola through (k-1, k, k+1); grid may be non-uniform.
+        x0, x1, x2 = freqs[k - 1], freqs[k], freqs[k + 1]
+        y0, y1, y2 = mags[k - 1], mags[k], mags[k + 1]
+        d01, d12 = (y1 - y0) / (x1 - x0), (y2 - y1) / (x2 - x1)
+        a = (d12 - d01) / (x2 - x0)
+        if a < 0:
+            xv = 0.5 * (x0 + x1) - d01 / (2.0 * a)
+            if x0 < xv < x2:
+                fn = xv
+                peak = y1 + d01 * (xv - x1) + a * (xv - x0) * (xv - x1)
+    df = 0.5 * (freqs[min(k + 1, len(freqs) - 1)] - freqs[max(k - 1, 0)])
+
+    level = peak * HALF_POWER
+    f1 = _half_power_crossing(freqs, mags, k, level, -1, 2.0 * half_width)
+    f2 = _half_power_crossing(freqs, mags, k, level, +1, 2.0 * half_width)
+    zeta: Optional[float] = None
+    if f1 is not None and f2 is not None and fn > 0:
+        zeta = (f2 - f1) / (2.0 * fn)
+    elif quality == "ok":
+        quality = "no_half_power"
+    return PeakEstimate(fn_hz=fn, zeta=zeta, peak_mag=peak, df_hz=df, quality=quality)
+
+
+class ModeTracker:
+    """
+    Incremental per-mode state: seed, reference, trend and CUSUM.
+    """
+
+    def __init__(self, seed: ModeSeed) -> None:
+        self.seed = seed
+        self.f_est = seed.f_seed_hz
+        self.n = 0
+        self.ref_fn = RunningStats()
+        self.ref_zeta = RunningStats()
+        self.base = RunningStats()
+        # sigma of the previous baseline while a re-baseline fills (None: initial baseline).
+        self.rebase_sigma: Optional[float] = None
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+        # Trend co-moments (cycles x, fn y)
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.c_xy = 0.0
+        self.last_cycles: Optional[int] = None
+        self.last_zeta: Optional[float] = None
+        self.change_points: List[List[object]] = []
+
+    def update(self, cycles: int, est: PeakEstimate, baseline_n: int, k: float, h: float) -> List[object]:
+        """
+        Fold one estimate in; returns the history cells from fn_hz onward.
+        """
+        fn = est.fn_hz
+        self.n += 1
+        self.f_est = fn
+        self.last_cycles = cycles
+        self.last_zeta = est.zeta
+
+        dx = cycles - self.mean_x
+        self.mean_x += dx / self.n
+        self.mean_y += (fn - self.mean_y) / self.n
+        self.m2_x += dx * (cycles - self.mean_x)
+        self.c_xy += dx * (fn - self.mean_y)
+
+        if self.ref_fn.n < baseline_n:
+            self.ref_fn.add(fn)
+            if est.zeta is not None:
+                self.ref_zeta.add(est.zeta)
+        drift_pct = (fn - self.ref_fn.mean) / self.ref_fn.mean * 100.0
+
+        change = ""
+        cusum: List[object] = ["", ""]
+        if self.base.n < baseline_n and (self.rebase_sigma is None or self.base.n == 0):
+            self.base.add(fn)
+        else:
+            if self.base.n < baseline_n:
+                # Re-baseline filling: score against the samples collected so far with
+                # the previous baseline's sigma, so a step inside the window is flagged
+                # instead of being absorbed into the new baseline.
+                sigma = max(self.rebase_sigma, est.df_hz / math.sqrt(12.0))  # type: ignore[type-var]
+            else:
+                sigma = max(self.base.std(), est.df_hz / math.sqrt(12.0))
+            z = (fn - self.base.mean) / sigma
+            self.cusum_pos = max(0.0, self.cusum_pos + z - k)
+            self.cusum_neg = max(0.0, self.cusum_neg - z - k)
+            cusum = [self.cusum_pos, self.cusum_neg]
+            if self.cusum_pos > h or self.cusum_neg > h:
+                change = "up" if self.cusum_pos > h else "down"
+                self.change_points.append([cycles, change])
+                self.cusum_pos = self.cusum_neg = 0.0
+                self.rebase_sigma = sigma
+                self.base = RunningStats()
+            elif self.base.n < baseline_n:
+                self.base.add(fn)
+
+        return [
+            fn,
+            "" if est.zeta is None else est.zeta,
+            est.peak_mag,
+            est.quality,
+            drift_pct,
+            *cusum,
+            change,
+        ]
+
+    def slope(self) -> Optional[float]:
+        return self.c_xy / self.m2_x if self.m2_x > 0 else None
+
+    def summary_row(self) -> List[object]:
+        slope = self.slope()
+        last_cp = self.change_points[-1] if self.change_points else ["", ""]
+        return [
+            self.seed.mode_id,
+            self.n,
+            "" if self.last_cycles is None else self.last_cycles,
+            self.ref_fn.mean if self.ref_fn.n else "",
+            self.f_est if self.n else "",
+            (self.f_est - self.ref_fn.mean) / self.ref_fn.mean * 100.0 if self.ref_fn.n else "",
+            "" if slope is None else slope * 1000.0,
+            self.ref_zeta.mean if self.ref_zeta.n else "",
+            "" if self.last_zeta is None else self.last_zeta,
+            len(self.change_points),
+            last_cp[0],
+            last_cp[1],
+        ]
+
+    def to_state(self) -> Dict[str, object]:
+        return {
+            "f_est": self.f_est,
+            "n": self.n,
+            "ref_fn": self.ref_fn.cells(),
+            "ref_zeta": self.ref_zeta.cells(),
+            "base": self.base.cells(),
+            "rebase_sigma": self.rebase_sigma,
+            "cusum": [self.cusum_pos, self.cusum_neg],
+            "trend": [self.mean_x, self.mean_y, self.m2_x, self.c_xy],
+            "last_cycles": self.last_cycles,
+            "last_zeta": self.last_zeta,
+            "change_points": self.change_points,
+        }
+
+    @classmethod
+    def from_state(cls, seed: ModeSeed, state: Dict[str, object]) -> "ModeTracker":
+        def stats(cells: Sequence[object]) -> RunningStats:
+            n = int(cells[0])  # type: ignore[arg-type]
+            return RunningStats.from_cells(n, *(float(c) for c in cells[1:])) if n else RunningStats()  # type: ignore[arg-type]
+
+        t = cls(seed)
+        t.f_est = float(state["f_est"])  # type: ignore[arg-type]
+        t.n = int(state["n"])  # type: ignore[arg-type]
+        t.ref_fn = stats(state["ref_fn"])  # type: ignore[arg-type]
+        t.ref_zeta = stats(state["ref_zeta"])  # type: ignore[arg-type]
+        t.base = stats(state["base"])  # type: ignore[arg-type]
+        t.rebase_sigma = state.get("rebase_sigma")  # type: ignore[assignment]
+        t.cusum_pos, t.cusum_neg = (float(x) for x in state["cusum"])  # type: ignore[union-attr]
+        t.mean_x, t.mean_y, t.m2_x, t.c_xy = (float(x) for x in state["trend"])  # type: ignore[union-attr]
+        t.last_cycles = state["last_cycles"]  # type: ignore[assignment]
+        t.last_zeta = state["last_zeta"]  # type: ignore[assignment]
+        t.change_points = [list(cp) for cp in state["change_points"]]  # type: ignore[union-attr]
+        return t
+
+
+def _params(modes: Sequence[ModeSeed], baseline_n: int, k: float, h: float) -> Dict[str, object]:
+    return {
+        "modes": [[m.mode_id, m.f_seed_hz, m.search_half_width_hz] for m in modes],
+        "baseline_snapshots": baseline_n,
+        "cusum_k": k,
+        "cusum_h": h,
+    }
+
+
+def _append_history(path: str, rows: List[List[object]], expected_bytes: Optional[int]) -> int:
+    """
+    Append rows to the history CSV and return its new size. expected_bytes is the size
+    recorded in the state (None: start a new file); a longer file is rolled back to it.
+    """
+    ensure_dir(os.path.dirname(os.path.abspath(path)))
+    if expected_bytes is None:
+        mode = "w"
+    else:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < expected_bytes:
+            raise ValueError(f"{path} is shorter than recorded in the state ({size} < {expected_bytes} bytes); it was modified.")
+        mode = "r+"
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        if expected_bytes is None:
+            csv.writer(f).writerow(HISTORY_COLUMNS)
+        else:
+            f.seek(expected_bytes)
+            f.truncate()
+        csv.writer(f).writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Incrementally track modal frequency/damping drift across fatigue FRF snapshots.")
+    ap.add_argument("--snapshots", required=True, help="Snapshot index CSV (cycles,filename).")
+    ap.add_argument("--modes", required=True, help="Mode seeds CSV (mode_id,f_seed_hz,search_half_width_hz).")
+    ap.add_argument("--output", required=True, help="Directory for history, summary and (by default) state.")
+    ap.add_argument("--state", default=None, help="State file. Default: <output>/modal_drift_state.json")
+    ap.add_argument("--freq-col", default="frequency_hz", help="Frequency column. Default: frequency_hz")
+    ap.add_argument("--mag-col", default=None, help="FRF magnitude column.")
+    ap.add_argument("--re-col", default=None, help="FRF real-part column (with --im-col, instead of --mag-col).")
+    ap.add_argument("--im-col", default=None, help="FRF imaginary-part column (with --re-col).")
+    ap.add_argument("--baseline-snapshots", type=int, default=10, help="Snapshots per (re)baseline. Default: 10")
+    ap.add_argument("--cusum-k", type=float, default=0.5, help="CUSUM allowance in sigma units. Default: 0.5")
+    ap.add_argument("--cusum-h", type=float, default=5.0, help="CUSUM decision threshold in sigma units. Default: 5.0")
+
+    args = ap.parse_args(argv)
+    if (args.mag_col is None) == (args.re_col is None and args.im_col is None):
+        raise ValueError("Give either --mag-col or both --re-col and --im-col.")
+    if args.mag_col is None and (args.re_col is None or args.im_col is None):
+        raise ValueError("--re-col and --im-col must be given together.")
+    if args.baseline_snapshots < 2:
+        raise ValueError("--baseline-snapshots must be >= 2.")
+    if args.cusum_k < 0 or args.cusum_h <= 0:
+        raise ValueError("--cusum-k must be >= 0 and --cusum-h > 0.")
+
+    modes = _load_modes(args.modes)
+    params = _params(modes, args.baseline_snapshots, args.cusum_k, args.cusum_h)
+    out_dir = args.output
+    state_path = args.state or os.path.join(out_dir, "modal_drift_state.json")
+    history_path = os.path.join(out_dir, "modal_drift_history.csv")
+
+    trackers = [ModeTracker(m) for m in modes]
+    last_cycles: Optional[int] = None
+    n_snapshots = 0
+    history_bytes: Optional[int] = None
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("state_version") != STATE_VERSION:
+            raise ValueError(f"Unsupported modal drift state version in {state_path}")
+        if state.get("params") != json.loads(json.dumps(params)):
+            raise ValueError(
+                f"Modes/baseline/CUSUM parameters differ from those in {state_path}; "
+                f"delete the state to re-analyse from scratch."
+            )
+        trackers = [ModeTracker.from_state(m, state["modes"][m.mode_id]) for m in modes]
+        last_cycles = state["last_cycles"]
+        n_snapshots = int(state["n_snapshots"])
+        history_bytes = int(state["history_bytes"])
+
+    index = _load_index(args.snapshots)
+    start = 0 if last_cycles is None else bisect.bisect_right([c for c, _ in index], last_cycles)
+    if last_cycles is not None and start != n_snapshots:
+        raise ValueError(
+            f"{args.snapshots} has {start} snapshots up to cycles={last_cycles}, but the state recorded "
+            f"{n_snapshots}; the index was edited."
+        )
+
+    rows: List[List[object]] = []
+    for cycles, path in index[start:]:
+        freqs, mags = load_frf(path, args.freq_col, args.mag_col, args.re_col, args.im_col)
+        for t in trackers:
+            est = pick_peak(freqs, mags, t.f_est, t.seed.search_half_width_hz)
+            cells = t.update(cycles, est, args.baseline_snapshots, args.cusum_k, args.cusum_h)
+            rows.append([n_snapshots, cycles, os.path.basename(path), t.seed.mode_id, *cells])
+        n_snapshots += 1
+        last_cycles = cycles
+
+    history_bytes = _append_history(history_path, rows, history_bytes)
+    new_state = {
+        "state_version": STATE_VERSION,
+        "params": params,
+        "n_snapshots": n_snapshots,
+        "last_cycles": last_cycles,
+        "history_bytes": history_bytes,
+        "modes": {t.seed.mode_id: t.to_state() for t in trackers},
+    }
+    write_text(state_path, json.dumps(new_state) + "\n")
+
+    write_csv(
+        os.path.join(out_dir, "modal_drift_summary.csv"),
+        [
+            "mode_id",
+            "n_snapshots",
+            "last_cycles",
+            "ref_fn_hz",
+            "last_fn_hz",
+            "drift_pct",
+            "slope_hz_per_kcycle",
+            "ref_zeta",
+            "last_zeta",
+            "n_change_points",
+            "last_change_cycles",
+            "last_change_direction",
+        ],
+        [t.summary_row() for t in trackers],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
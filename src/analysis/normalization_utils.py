@@ -35,6 +35,7 @@ Optional:
 Outputs
 -------
 - normalized_panel_metrics.csv (computed areal_density_kg_m2, etc.)
+  If --output ends in ".csv.gz" the file is written gzip-compressed.
 
 Usage Example
 -------------
@@ -52,9 +53,10 @@ from __future__ import annotations
 
 import argparse
 import csv
-import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
+
+from analysis_io import cached_read, open_text_read, write_csv
 
 
 @dataclass(frozen=True)
@@ -117,7 +119,11 @@ def normalize_delta_per_thickness_mm(*, metric_delta: float, thickness_mm: float
 
 
 def _read_panel_rows(path: str) -> List[Dict[str, str]]:
-    with open(path, "r", newline="", encoding="utf-8") as f:
+    return cached_read("panel_rows", path, (), lambda: _parse_panel_rows(path))
+
+
+def _parse_panel_rows(path: str) -> List[Dict[str, str]]:
+    with open_text_read(path) as f:
         reader = csv.DictReader(f)
         if reader.fieldnames is None:
             raise ValueError(f"CSV has no header row: {path}")
@@ -197,11 +203,18 @@ def _to_panel_metrics(path: str, rows: List[Dict[str, str]]) -> List[PanelMetric
     return out
 
 
+def load_panel_metrics(path: str) -> List[PanelMetrics]:
+    """
+    Read a panel metadata CSV or a normalized_panel_metrics.csv (same columns plus
+    areal_density_kg_m2, which is recomputed from mass_kg / area_m2) into PanelMetrics.
+    """
+    return _to_panel_metrics(path, _read_panel_rows(path))
+
+
 def _write_normalized_csv(out_path: str, panels: List[PanelMetrics]) -> None:
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([
+    write_csv(
+        out_path,
+        [
             "coupon_id",
             "config",
             "group",
@@ -210,9 +223,9 @@ def _write_normalized_csv(out_path: str, panels: List[PanelMetrics]) -> None:
             "thickness_mm",
             "areal_density_kg_m2",
             "notes",
-        ])
-        for p in panels:
-            w.writerow([
+        ],
+        (
+            [
                 p.coupon_id,
                 p.config,
                 p.group,
@@ -221,17 +234,19 @@ def _write_normalized_csv(out_path: str, panels: List[PanelMetrics]) -> None:
                 p.thickness_mm,
                 p.areal_density_kg_m2,
                 p.notes,
-            ])
+            ]
+            for p in panels
+        ),
+    )
 
 
-def main() -> int:
+def main(argv: Optional[Sequence[str]] = None) -> int:
     ap = argparse.ArgumentParser(description="Compute AHIS normalization metrics from a panel metadata CSV.")
     ap.add_argument("--input", required=True, help="Path to panel metadata CSV (processed).")
-    ap.add_argument("--output", required=True, help="Path to write normalized metrics CSV.")
+    ap.add_argument("--output", required=True, help="Path to write normalized metrics CSV (.csv or .csv.gz).")
 
-    args = ap.parse_args()
-    rows = _read_panel_rows(args.input)
-    panels = _to_panel_metrics(args.input, rows)
+    args = ap.parse_args(argv)
+    panels = load_panel_metrics(args.input)
     _write_normalized_csv(args.output, panels)
     return 0
 
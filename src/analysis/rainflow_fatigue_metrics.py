@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Rainflow Cycle Counting (T-FAT-020)
+
+Purpose
+-------
+Reduce long cyclic strain (or load) logs from fatigue/delamination testing to:
+- a range–mean rainflow histogram (cycle counts per bin)
+- a Palmgren–Miner damage sum against a user-supplied Basquin S-N curve
+
+Method
+------
+Streaming, stack-based rainflow counting (four-point form of ASTM E1049):
+1) Samples are reduced to turning points on the fly (reversals smaller than --gate
+   are ignored as noise). The first sample is always a turning point; until the
+   signal first moves more than --gate, the running minimum and maximum are kept and
+   the one it turns away from becomes the next turning point.
+2) Each turning point is pushed on a stack. Whenever the top four points a,b,c,d satisfy
+   |b-c| <= |a-b| and |b-c| <= |c-d|, (b,c) is a closed full cycle and is removed.
+3) What remains on the stack (the residual) is counted as half cycles at the end.
+
+Memory is bounded by the residual (open half-cycles), not by the log length.
+
+Segments and merging
+--------------------
+Counting a log in segments gives the same result as counting it in one go: closed
+cycles of each segment are kept, and the residuals of consecutive segments are
+concatenated and counted again. Multi-day logs can therefore be split into files
+(passed in time order) and counted in parallel (--workers). Unfinished state can be
+saved with --save-state and passed back later as an --input, so runs can be merged
+across days without re-reading raw data.
+
+S-N curve and damage
+--------------------
+Basquin form: N(S) = C * S^(-m), with S the cycle range (or amplitude = range/2 with
+--sn-stress amplitude) in the same units as the signal. Each full cycle adds 1/N(S);
+each half cycle adds 0.5/N(S). Damage is accumulated per cycle, not from binned values.
+You must supply C and m for your material/layup; nothing is assumed.
+
+Outputs
+-------
+- processed/rainflow_histogram.csv (range_lo, range_hi, mean_lo, mean_hi, cycles)
+- processed/rainflow_summary.csv   (counts, max range, damage sum, S-N parameters)
+
+Usage Example
+-------------
+python3 rainflow_fatigue_metrics.py \
+  --input results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/raw/strain_day1.csv \
+  --input results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/raw/strain_day2.csv \
+  --output results/T-FAT-020/RUN_YYYY-MM-DD_XYZ/processed \
+  --signal-col strain_ue \
+  --range-bin 50 \
+  --mean-bin 50 \
+  --sn-exponent 8 \
+  --sn-coefficient 1e30 \
+  --workers 2
+
+Notes
+-----
+- Input files must be given in time order; each file is one contiguous segment.
+- Half cycles in the residual are counted as 0.5 cycles in the histogram.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analysis_io import open_text_read, process_pool, write_csv, write_text
+
+STATE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class RainflowConfig:
+    range_bin: float
+    mean_bin: float
+    gate: float = 0.0
+    sn_exponent: Optional[float] = None
+    sn_coefficient: Optional[float] = None
+    sn_stress: str = "range"
+
+    def cycle_damage(self, rng: float) -> float:
+        """
+        Damage of one full cycle of the given range: 1 / N(S).
+        """
+        if self.sn_exponent is None or self.sn_coefficient is None:
+            return 0.0
+        s = rng if self.sn_stress == "range" else 0.5 * rng
+        return (s ** self.sn_exponent) / self.sn_coefficient
+
+
+class RainflowCounter:
+    """
+    Streaming rainflow counter. feed() samples in time order, then either finalize()
+    or keep the unfinished state for merge() with the next segment.
+    """
+
+    def __init__(self, cfg: RainflowConfig) -> None:
+        self.cfg = cfg
+        self.hist: Dict[Tuple[int, int], float] = {}
+        self.full_cycles = 0
+        self.half_cycles = 0
+        self.damage = 0.0
+        self.max_range = 0.0
+        self.n_samples = 0
+        self.stack: List[float] = []
+        # Turning-point detector state
+        self._ext: Optional[float] = None  # running extreme since the last turning point
+        self._dir = 0  # +1 rising, -1 falling, 0 unknown
+        # While the direction is unknown: running min/max since the first sample, and
+        # whether the minimum was reached after the maximum.
+        self._lo = 0.0
+        self._hi = 0.0
+        self._lo_last = False
+
+    def _count(self, a: float, b: float, weight: float) -> None:
+        rng = abs(a - b)
+        mean = 0.5 * (a + b)
+        key = (int(math.floor(rng / self.cfg.range_bin)), int(math.floor(mean / self.cfg.mean_bin)))
+        self.hist[key] = self.hist.get(key, 0.0) + weight
+        self.damage += weight * self.cfg.cycle_damage(rng)
+        if rng > self.max_range:
+            self.max_range = rng
+
+    def _push(self, tp: float) -> None:
+        s = self.stack
+        s.append(tp)
+        while len(s) >= 4:
+            a, b, c, d = s[-4], s[-3], s[-2], s[-1]
+            inner = abs(b - c)
+            if inner <= abs(a - b) and inner <= abs(c - d):
+                self._count(b, c, 1.0)
+                self.full_cycles += 1
+                del s[-3:-1]
+            else:
+                break
+
+    def feed(self, x: float) -> None:
+        self.n_samples += 1
+        ext = self._ext
+        if ext is None:
+            # First sample of the stream is always a turning point.
+            self._push(x)
+            self._ext = self._lo = self._hi = x
+            return
+        if self._dir == 0:
+            if x - self._lo > self.cfg.gate:
+                if self._lo != self.stack[-1]:
+                    self._push(self._lo)
+                self._dir = 1
+                self._ext = x
+            elif self._hi - x > self.cfg.gate:
+                if self._hi != self.stack[-1]:
+                    self._push(self._hi)
+                self._dir = -1
+                self._ext = x
+            elif x < self._lo:
+                self._lo = x
+                self._lo_last = True
+            elif x > self._hi:
+                self._hi = x
+                self._lo_last = False
+            return
+        if (self._dir > 0 and x >= ext) or (self._dir < 0 and x <= ext):
+            self._ext = x
+        elif abs(x - ext) > self.cfg.gate:
+            self._push(ext)
+            self._dir = -self._dir
+            self._ext = x
+
+    def feed_many(self, xs: Iterable[float]) -> None:
+        for x in xs:
+            self.feed(x)
+
+    def residual(self) -> List[float]:
+        """
+        Open turning points: the stack plus the pending extreme (if any). Before the
+        direction is known, the running min and max are pending, in the order reached.
+        """
+        out = list(self.stack)
+        if self._ext is None:
+            return out
+        if self._dir != 0:
+            out.append(self._ext)
+            return out
+        pending = (self._hi, self._lo) if self._lo_last else (self._lo, self._hi)
+        for x in pending:
+            if x != out[-1]:
+                out.append(x)
+        return out
+
+    def merge(self, other: "RainflowCounter") -> None:
+        """
+        Append a later segment: keep both sets of closed cycles and count the
+        concatenated residuals again.
+        """
+        tail = other.residual()
+        self.n_samples += other.n_samples
+        self.full_cycles += other.full_cycles
+        self.damage += other.damage
+        self.max_range = max(self.max_range, other.max_range)
+        for key, c in other.hist.items():
+            self.hist[key] = self.hist.get(key, 0.0) + c
+
+        # Re-detect turning points across the seam (the other segment's first point is
+        # not necessarily a reversal once joined), without counting them as samples.
+        n = self.n_samples
+        for x in tail:
+            self.feed(x)
+        self.n_samples = n
+
+    def finalize(self) -> None:
+        """
+        Count the residual as half cycles. The counter cannot be fed afterwards.
+        """
+        res = self.residual()
+        for a, b in zip(res, res[1:]):
+            self._count(a, b, 0.5)
+            self.half_cycles += 1
+        self.stack = []
+        self._ext = None
+        self._dir = 0
+
+    def to_state(self) -> Dict[str, object]:
+        return {
+            "state_version": STATE_VERSION,
+            "range_bin": self.cfg.range_bin,
+            "mean_bin": self.cfg.mean_bin,
+            "sn_exponent": self.cfg.sn_exponent,
+            "sn_coefficient": self.cfg.sn_coefficient,
+            "sn_stress": self.cfg.sn_stress,
+            "n_samples": self.n_samples,
+            "full_cycles": self.full_cycles,
+            "damage": self.damage,
+            "max_range": self.max_range,
+            "residual": self.residual(),
+            "hist": [[ri, mi, c] for (ri, mi), c in sorted(self.hist.items())],
+        }
+
+    @classmethod
+    def from_state(cls, cfg: RainflowConfig, state: Dict[str, object], *, path: str) -> "RainflowCounter":
+        if state.get("state_version") != STATE_VERSION:
+            raise ValueError(f"Unsupported rainflow state version in {path}")
+        if state.get("range_bin") != cfg.range_bin or state.get("mean_bin") != cfg.mean_bin:
+            raise ValueError(
+                f"Bin widths in {path} (range={state.get('range_bin')}, mean={state.get('mean_bin')}) "
+                f"do not match --range-bin/--mean-bin."
+            )
+        saved_sn = (state.get("sn_exponent"), state.get("sn_coefficient"), state.get("sn_stress"))
+        if saved_sn != (cfg.sn_exponent, cfg.sn_coefficient, cfg.sn_stress):
+            # Closed-cycle damage in the state was computed with the saved S-N curve.
+            raise ValueError(f"S-N parameters in {path} {saved_sn} do not match the current --sn-* arguments.")
+        c = cls(cfg)
+        c.n_samples = int(state["n_samples"])
+        c.full_cycles = int(state["full_cycles"])
+        c.damage = float(state["damage"])
+        c.max_range = float(state["max_range"])
+        c.hist = {(int(ri), int(mi)): float(cnt) for ri, mi, cnt in state["hist"]}
+        n = c.n_samples
+        c.feed_many(float(x) for x in state["residual"])
+        c.n_samples = n
+        return c
+
+
+def _iter_signal(path: str, signal_col: str) -> Iterable[float]:
+    with open_text_read(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        if signal_col not in header:
+            raise ValueError(f"Missing signal column '{signal_col}' in {path}. Found: {header}")
+        idx = header.index(signal_col)
+        for i, row in enumerate(reader):
+            try:
+                v = float(row[idx])
+            except Exception as e:
+                raise ValueError(
+                    f"Non-numeric value in {path} at row {i+2} col '{signal_col}': {row[idx] if idx < len(row) else None!r}"
+                ) from e
+            if not math.isfinite(v):
+                raise ValueError(f"Non-finite value in {path} at row {i+2} col '{signal_col}': {v!r}")
+            yield v
+
+
+def _count_segment(args: Tuple[str, str, RainflowConfig]) -> RainflowCounter:
+    path, signal_col, cfg = args
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return RainflowCounter.from_state(cfg, json.load(f), path=path)
+    c = RainflowCounter(cfg)
+    c.feed_many(_iter_signal(path, signal_col))
+    if c.n_samples == 0:
+        raise ValueError(f"No data rows in {path}")
+    return c
+
+
+def _write_histogram(out_path: str, counter: RainflowCounter) -> None:
+    rb, mb = counter.cfg.range_bin, counter.cfg.mean_bin
+    write_csv(
+        out_path,
+        ["range_lo", "range_hi", "mean_lo", "mean_hi", "cycles"],
+        ([ri * rb, (ri + 1) * rb, mi * mb, (mi + 1) * mb, c] for (ri, mi), c in sorted(counter.hist.items())),
+    )
+
+
+def _write_summary(out_path: str, counter: RainflowCounter, n_segments: int, signal_col: str) -> None:
+    cfg = counter.cfg
+    has_sn = cfg.sn_exponent is not None
+    write_csv(
+        out_path,
+        [
+            "signal_col",
+            "n_segments",
+            "n_samples",
+            "full_cycles",
+            "half_cycles",
+            "total_cycles",
+            "max_range",
+            "range_bin",
+            "mean_bin",
+            "gate",
+            "sn_stress",
+            "sn_exponent",
+            "sn_coefficient",
+            "miner_damage_sum",
+        ],
+        [[
+            signal_col,
+            n_segments,
+            counter.n_samples,
+            counter.full_cycles,
+            counter.half_cycles,
+            counter.full_cycles + 0.5 * counter.half_cycles,
+            counter.max_range,
+            cfg.range_bin,
+            cfg.mean_bin,
+            cfg.gate,
+            cfg.sn_stress if has_sn else "",
+            cfg.sn_exponent if has_sn else "",
+            cfg.sn_coefficient if has_sn else "",
+            counter.damage if has_sn else "",
+        ]],
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Rainflow-count AHIS fatigue strain logs and compute Miner's damage.")
+    ap.add_argument(
+        "--input",
+        action="append",
+        required=True,
+        help="Signal CSV segment (.csv/.csv.gz) or saved state (.json), in time order. Can be repeated.",
+    )
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--signal-col", required=True, help="Name of the strain/load column to count.")
+    ap.add_argument("--range-bin", required=True, type=float, help="Histogram bin width for cycle range (signal units).")
+    ap.add_argument("--mean-bin", required=True, type=float, help="Histogram bin width for cycle mean (signal units).")
+    ap.add_argument("--gate", type=float, default=0.0, help="Ignore reversals smaller than this (signal units). Default: 0")
+    ap.add_argument("--sn-exponent", type=float, default=None, help="Basquin exponent m in N = C * S^-m.")
+    ap.add_argument("--sn-coefficient", type=float, default=None, help="Basquin coefficient C in N = C * S^-m.")
+    ap.add_argument(
+        "--sn-stress",
+        choices=["range", "amplitude"],
+        default="range",
+        help="Whether S in the S-N curve is the cycle range or amplitude (range/2). Default: range",
+    )
+    ap.add_argument("--workers", type=int, default=1, help="Segments counted in parallel. Default: 1")
+    ap.add_argument(
+        "--save-state",
+        default=None,
+        help="Optional path to save the merged, unfinalized state (.json) for merging with later segments.",
+    )
+
+    args = ap.parse_args(argv)
+    if args.range_bin <= 0 or args.mean_bin <= 0:
+        raise ValueError("--range-bin and --mean-bin must be positive.")
+    if args.gate < 0:
+        raise ValueError("--gate must be >= 0.")
+    if (args.sn_exponent is None) != (args.sn_coefficient is None):
+        raise ValueError("Provide both --sn-exponent and --sn-coefficient, or neither.")
+    if args.sn_exponent is not None and (args.sn_exponent <= 0 or args.sn_coefficient <= 0):
+        raise ValueError("--sn-exponent and --sn-coefficient must be positive.")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1.")
+
+    cfg = RainflowConfig(
+        range_bin=args.range_bin,
+        mean_bin=args.mean_bin,
+        gate=args.gate,
+        sn_exponent=args.sn_exponent,
+        sn_coefficient=args.sn_coefficient,
+        sn_stress=args.sn_stress,
+    )
+    jobs = [(path, args.signal_col, cfg) for path in args.input]
+    if args.workers > 1 and len(jobs) > 1:
+        with process_pool(args.workers) as pool:
+            segments = list(pool.map(_count_segment, jobs))
+    else:
+        segments = [_count_segment(j) for j in jobs]
+
+    total = segments[0]
+    for seg in segments[1:]:
+        total.merge(seg)
+
+    if args.save_state:
+        write_text(args.save_state, json.dumps(total.to_state()) + "\n")
+
+    total.finalize()
+    out_dir = args.output
+    _write_histogram(os.path.join(out_dir, "rainflow_histogram.csv"), total)
+    _write_summary(os.path.join(out_dir, "rainflow_summary.csv"), total, len(segments), args.signal_col)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
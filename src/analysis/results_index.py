@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — SQLite Results Index Across Run Packages
+
+Purpose
+-------
+Processed results are small CSVs spread over every run package. Cross-run questions
+("mean strain peak for config B over the last 20 runs") otherwise mean re-reading every
+CSV under results/. This script ingests the processed tables into one local SQLite file
+with indexes on test ID, run, config, group, metric and coupon, so such questions are
+index lookups.
+
+The CSVs stay the source of truth; the index can be deleted and rebuilt at any time.
+
+Ingested tables (from <TEST_ID>/<RUN_ID>/processed/, .csv or .csv.gz)
+------------------------------------------------------------------
+- impact_peak_summary.csv       -> impact_peaks
+- impact_peak_group_stats.csv   -> impact_group_stats
+- normalized_panel_metrics.csv  -> panel_metrics
+- leak_onset_summary.csv        -> leak_onset
+- leak_rate_summary.csv         -> leak_rate (including fit_* decay-model columns if present;
+                                   fit_choked_at_start is stored as 1/0)
+- impact_coupon_peaks.csv       -> coupon_peaks (coupon_join.py)
+- delta_report_values.csv       -> delta_values (key/value; numeric values also as REAL)
+- impact_file_groups.csv        -> used to fill impact_peaks.grp
+
+Config for impact rows
+----------------------
+Impact outputs carry a group, not a config. impact_peaks.config and
+impact_group_stats.config are filled from the same run's normalized_panel_metrics.csv
+when that group maps to exactly one config; otherwise they stay NULL (no guessing).
+
+Incremental ingest
+------------------
+Each source file's size and mtime are recorded. A run is re-ingested (all its rows
+replaced in one transaction) only when one of its source files was added, removed or
+changed; unchanged runs are skipped without opening their CSVs. Runs that disappeared
+from disk are dropped from the index.
+
+"Last N runs" means the N most recently modified runs (by processed files) that have
+impact rows matching the other filters (metric, config, group, test ID), so
+"config B over the last 20 runs" averages 20 config-B runs even if newer runs tested
+other configs.
+
+Usage Example
+-------------
+python3 results_index.py ingest --results results --db results/results_index.sqlite
+
+python3 results_index.py mean --db results/results_index.sqlite \
+  --metric strain_ue --config B --last-runs 20
+
+python3 results_index.py sql --db results/results_index.sqlite \
+  "SELECT test_id, run_id, grp, metric, mean_peak_abs FROM impact_group_stats WHERE metric = ?" strain_ue
+
+Python API
+----------
+    from results_index import ResultsIndex
+    with ResultsIndex("results/results_index.sqlite") as idx:
+        idx.ingest("results")
+        n, mean = idx.mean_metric("strain_ue", config="B", last_runs=20)
+
+Notes
+-----
+- Standard library only (sqlite3).
+- The sql subcommand opens the database read-only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from analysis_io import open_text_read
+from leak_decay_fit import FIT_COLUMNS
+
+SCHEMA_VERSION = 2
+
+# table -> (source basename, [(csv column, sql column, sql type)], required csv columns)
+_TABLES: Dict[str, Tuple[str, List[Tuple[str, str, str]], List[str]]] = {
+    "impact_peaks": (
+        "impact_peak_summary.csv",
+        [
+            ("filename", "filename", "TEXT"),
+            ("metric", "metric", "TEXT"),
+            ("peak_value", "peak_value", "REAL"),
+            ("peak_abs_value", "peak_abs_value", "REAL"),
+            ("t_at_peak_s", "t_at_peak_s", "REAL"),
+            ("n_rows", "n_rows", "INTEGER"),
+        ],
+        ["filename", "metric", "peak_abs_value"],
+    ),
+    "impact_group_stats": (
+        "impact_peak_group_stats.csv",
+        [
+            ("group", "grp", "TEXT"),
+            ("metric", "metric", "TEXT"),
+            ("n", "n", "INTEGER"),
+            ("mean_peak_abs", "mean_peak_abs", "REAL"),
+            ("std_peak_abs_sample", "std_peak_abs_sample", "REAL"),
+        ],
+        ["group", "metric", "n", "mean_peak_abs"],
+    ),
+    "panel_metrics": (
+        "normalized_panel_metrics.csv",
+        [
+            ("coupon_id", "coupon_id", "TEXT"),
+            ("config", "config", "TEXT"),
+            ("group", "grp", "TEXT"),
+            ("mass_kg", "mass_kg", "REAL"),
+            ("area_m2", "area_m2", "REAL"),
+            ("thickness_mm", "thickness_mm", "REAL"),
+            ("areal_density_kg_m2", "areal_density_kg_m2", "REAL"),
+            ("notes", "notes", "TEXT"),
+        ],
+        ["coupon_id", "config", "group", "areal_density_kg_m2"],
+    ),
+    "leak_onset": (
+        "leak_onset_summary.csv",
+        [
+            ("onset_index", "onset_index", "INTEGER"),
+            ("onset_time_s", "onset_time_s", "REAL"),
+            ("rate_threshold_pos_per_s", "rate_threshold_pos_per_s", "REAL"),
+            ("window_seconds", "window_seconds", "REAL"),
+            ("derivative_method", "derivative_method", "TEXT"),
+        ],
+        ["onset_index", "onset_time_s"],
+    ),
+    "leak_rate": (
+        "leak_rate_summary.csv",
+        [
+            ("window_start_time_s", "window_start_time_s", "REAL"),
+            ("window_end_time_s", "window_end_time_s", "REAL"),
+            ("n_samples", "n_samples", "INTEGER"),
+            ("mean_dp_dt_per_s", "mean_dp_dt_per_s", "REAL"),
+            ("median_dp_dt_per_s", "median_dp_dt_per_s", "REAL"),
+        ]
+        + [
+            (c, c, "TEXT" if c == "fit_model" else "INTEGER" if c == "fit_choked_at_start" else "REAL")
+            for c in FIT_COLUMNS
+        ],
+        ["mean_dp_dt_per_s"],
+    ),
+    "coupon_peaks": (
+        "impact_coupon_peaks.csv",
+        [
+            ("filename", "filename", "TEXT"),
+            ("coupon_id", "coupon_id", "TEXT"),
+            ("config", "config", "TEXT"),
+            ("group", "grp", "TEXT"),
+            ("metric", "metric", "TEXT"),
+            ("peak_abs_value", "peak_abs_value", "REAL"),
+            ("areal_density_kg_m2", "areal_density_kg_m2", "REAL"),
+            ("thickness_mm", "thickness_mm", "REAL"),
+            ("peak_abs_per_kg_m2", "peak_abs_per_kg_m2", "REAL"),
+            ("peak_abs_per_mm", "peak_abs_per_mm", "REAL"),
+        ],
+        ["filename", "coupon_id", "metric", "peak_abs_value"],
+    ),
+    "delta_values": (
+        "delta_report_values.csv",
+        [("key", "key", "TEXT"), ("value", "value", "TEXT")],
+        ["key", "value"],
+    ),
+}
+
+GROUP_MAP_NAME = "impact_file_groups.csv"
+
+_INDEXES = [
+    ("impact_peaks", ["test_id", "run_id"]),
+    ("impact_peaks", ["metric", "config"]),
+    ("impact_peaks", ["metric", "grp"]),
+    ("impact_group_stats", ["test_id", "run_id"]),
+    ("impact_group_stats", ["metric", "config"]),
+    ("impact_group_stats", ["metric", "grp"]),
+    ("panel_metrics", ["test_id", "run_id"]),
+    ("panel_metrics", ["coupon_id"]),
+    ("panel_metrics", ["config"]),
+    ("panel_metrics", ["grp"]),
+    ("leak_onset", ["test_id", "run_id"]),
+    ("leak_rate", ["test_id", "run_id"]),
+    ("coupon_peaks", ["test_id", "run_id"]),
+    ("coupon_peaks", ["coupon_id"]),
+    ("coupon_peaks", ["metric", "config"]),
+    ("delta_values", ["test_id", "run_id"]),
+    ("delta_values", ["key"]),
+]
+
+
+def _source_names() -> List[str]:
+    return [spec[0] for spec in _TABLES.values()] + [GROUP_MAP_NAME]
+
+
+def _convert(value: Optional[str], sql_type: str) -> object:
+    if value is None:
+        return None
+    v = value.strip()
+    if v == "":
+        return None
+    if sql_type == "REAL":
+        try:
+            return float(v)
+        except ValueError:
+            return v
+    if sql_type == "INTEGER":
+        low = v.lower()
+        if low in ("true", "false"):
+            return int(low == "true")
+        try:
+            return int(v)
+        except ValueError:
+            return v
+    return v
+
+
+def _read_rows(path: str, required: Sequence[str]) -> List[Dict[str, str]]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = set(required) - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        return list(reader)
+
+
+def _run_sources(processed_dir: str) -> Dict[str, Tuple[str, int, int]]:
+    """
+    basename -> (path, size, mtime_ns) for every known source present (.csv preferred over .csv.gz).
+    """
+    out: Dict[str, Tuple[str, int, int]] = {}
+    for name in _source_names():
+        for candidate in (name, name + ".gz"):
+            path = os.path.join(processed_dir, candidate)
+            if os.path.isfile(path):
+                st = os.stat(path)
+                out[name] = (path, st.st_size, st.st_mtime_ns)
+                break
+    return out
+
+
+def _find_runs(results_root: str) -> List[Tuple[str, str, str]]:
+    if not os.path.isdir(results_root):
+        raise ValueError(f"Results path is not a directory: {results_root}")
+    runs: List[Tuple[str, str, str]] = []
+    for test_id in sorted(os.listdir(results_root)):
+        test_dir = os.path.join(results_root, test_id)
+        if not os.path.isdir(test_dir) or test_id.startswith("."):
+            continue
+        for run_id in sorted(os.listdir(test_dir)):
+            run_dir = os.path.join(test_dir, run_id)
+            if os.path.isdir(run_dir) and not run_id.startswith("."):
+                runs.append((test_id, run_id, run_dir))
+    return runs
+
+
+class ResultsIndex:
+    """
+    SQLite index of processed AHIS results. Use as a context manager or call close().
+    """
+
+    def __init__(self, db_path: str, *, read_only: bool = False) -> None:
+        if read_only:
+            if not os.path.isfile(db_path):
+                raise ValueError(f"Index database not found: {db_path}")
+            self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        else:
+            parent = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(parent, exist_ok=True)
+            self.conn = sqlite3.connect(db_path)
+            self._init_schema()
+
+    def __enter__(self) -> "ResultsIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _init_schema(self) -> None:
+        c = self.conn
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(
+                f"Index schema version {version} is not supported (expected {SCHEMA_VERSION}); delete and rebuild it."
+            )
+        with c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "test_id TEXT NOT NULL, run_id TEXT NOT NULL, run_dir TEXT NOT NULL, "
+                "latest_mtime_ns INTEGER NOT NULL, PRIMARY KEY (test_id, run_id))"
+            )
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "path TEXT PRIMARY KEY, test_id TEXT NOT NULL, run_id TEXT NOT NULL, "
+                "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS ix_sources_run ON sources (test_id, run_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS ix_runs_recent ON runs (latest_mtime_ns)")
+            for table, (_, cols, _) in _TABLES.items():
+                extra = ", config TEXT" if table in ("impact_peaks", "impact_group_stats") else ""
+                extra += ", grp TEXT" if table == "impact_peaks" else ""
+                extra += ", value_num REAL" if table == "delta_values" else ""
+                col_sql = ", ".join(f"{sql} {typ}" for _, sql, typ in cols)
+                c.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (test_id TEXT NOT NULL, run_id TEXT NOT NULL, "
+                    f"{col_sql}{extra})"
+                )
+            for table, cols in _INDEXES:
+                c.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{'_'.join(cols)} ON {table} ({', '.join(cols)})")
+            c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _stored_sources(self, test_id: str, run_id: str) -> Dict[str, Tuple[int, int]]:
+        rows = self.conn.execute(
+            "SELECT path, size, mtime_ns FROM sources WHERE test_id = ? AND run_id = ?", (test_id, run_id)
+        )
+        return {p: (s, m) for p, s, m in rows}
+
+    def _delete_run(self, test_id: str, run_id: str) -> None:
+        for table in ["runs", "sources"] + list(_TABLES):
+            self.conn.execute(f"DELETE FROM {table} WHERE test_id = ? AND run_id = ?", (test_id, run_id))
+
+    def _ingest_run(self, test_id: str, run_id: str, run_dir: str, sources: Dict[str, Tuple[str, int, int]]) -> int:
+        c = self.conn
+        self._delete_run(test_id, run_id)
+        n_rows = 0
+
+        group_config: Dict[str, Optional[str]] = {}
+        tables: Dict[str, List[Dict[str, str]]] = {}
+        for table, (name, cols, required) in _TABLES.items():
+            if name in sources:
+                tables[table] = _read_rows(sources[name][0], required)
+        for r in tables.get("panel_metrics", []):
+            g, cfg = (r.get("group") or "").strip(), (r.get("config") or "").strip()
+            if g in group_config and group_config[g] != cfg:
+                group_config[g] = None  # ambiguous: leave config NULL
+            else:
+                group_config.setdefault(g, cfg)
+
+        file_group: Dict[str, str] = {}
+        if GROUP_MAP_NAME in sources:
+            for r in _read_rows(sources[GROUP_MAP_NAME][0], ["filename", "group"]):
+                file_group[(r["filename"] or "").strip()] = (r["group"] or "").strip()
+
+        for table, rows in tables.items():
+            _, cols, _ = _TABLES[table]
+            names = ["test_id", "run_id"] + [sql for _, sql, _ in cols]
+            values: List[List[object]] = []
+            for r in rows:
+                vals: List[object] = [test_id, run_id] + [_convert(r.get(csv_col), typ) for csv_col, _, typ in cols]
+                if table == "impact_peaks":
+                    grp = file_group.get((r.get("filename") or "").strip())
+                    vals += [group_config.get(grp) if grp else None, grp]
+                elif table == "impact_group_stats":
+                    vals.append(group_config.get((r.get("group") or "").strip()))
+                elif table == "delta_values":
+                    num = _convert(r.get("value"), "REAL")
+                    vals.append(num if isinstance(num, float) else None)
+                values.append(vals)
+            if table in ("impact_peaks", "impact_group_stats"):
+                names.append("config")
+            if table == "impact_peaks":
+                names.append("grp")
+            if table == "delta_values":
+                names.append("value_num")
+            c.executemany(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values
+            )
+            n_rows += len(values)
+
+        c.executemany(
+            "INSERT INTO sources (path, test_id, run_id, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            [(p, test_id, run_id, s, m) for p, s, m in sources.values()],
+        )
+        c.execute(
+            "INSERT INTO runs (test_id, run_id, run_dir, latest_mtime_ns) VALUES (?, ?, ?, ?)",
+            (test_id, run_id, run_dir, max(m for _, _, m in sources.values())),
+        )
+        return n_rows
+
+    def ingest(self, results_root: str) -> Dict[str, int]:
+        """
+        Bring the index in line with `results_root`. Returns counts:
+        runs_seen, runs_ingested, runs_unchanged, runs_removed, rows_inserted.
+        """
+        stats = {"runs_seen": 0, "runs_ingested": 0, "runs_unchanged": 0, "runs_removed": 0, "rows_inserted": 0}
+        on_disk = set()
+        for test_id, run_id, run_dir in _find_runs(results_root):
+            sources = _run_sources(os.path.join(run_dir, "processed"))
+            if not sources:
+                continue
+            stats["runs_seen"] += 1
+            on_disk.add((test_id, run_id))
+            current = {p: (s, m) for p, s, m in sources.values()}
+            if current == self._stored_sources(test_id, run_id):
+                stats["runs_unchanged"] += 1
+                continue
+            with self.conn:
+                stats["rows_inserted"] += self._ingest_run(test_id, run_id, run_dir, sources)
+            stats["runs_ingested"] += 1
+
+        root = os.path.abspath(results_root)
+        with self.conn:
+            for test_id, run_id, run_dir in self.conn.execute("SELECT test_id, run_id, run_dir FROM runs").fetchall():
+                inside = os.path.abspath(run_dir).startswith(root + os.sep)
+                if inside and (test_id, run_id) not in on_disk:
+                    self._delete_run(test_id, run_id)
+                    stats["runs_removed"] += 1
+        return stats
+
+    @staticmethod
+    def _recent_runs_sql(
+        last_runs: int, test_id: Optional[str], peak_filters: Sequence[Tuple[str, object]] = ()
+    ) -> Tuple[str, List[object]]:
+        """
+        Most recent runs, restricted to runs with impact_peaks rows matching every
+        (column, value) in `peak_filters` when given.
+        """
+        if last_runs < 1:
+            raise ValueError("last_runs must be >= 1")
+        sql = "SELECT test_id, run_id FROM runs u"
+        where: List[str] = []
+        params: List[object] = []
+        if test_id is not None:
+            where.append("u.test_id = ?")
+            params.append(test_id)
+        if peak_filters:
+            cond = " AND ".join(f"q.{col} = ?" for col, _ in peak_filters)
+            where.append(
+                f"EXISTS (SELECT 1 FROM impact_peaks q WHERE q.test_id = u.test_id AND q.run_id = u.run_id AND {cond})"
+            )
+            params.extend(val for _, val in peak_filters)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY latest_mtime_ns DESC, test_id, run_id LIMIT ?"
+        params.append(last_runs)
+        return sql, params
+
+    def recent_runs(self, last_runs: int, test_id: Optional[str] = None) -> List[Tuple[str, str]]:
+        sql, params = self._recent_runs_sql(last_runs, test_id)
+        return [(t, r) for t, r in self.conn.execute(sql, params)]
+
+    def mean_metric(
+        self,
+        metric: str,
+        *,
+        config: Optional[str] = None,
+        group: Optional[str] = None,
+        test_id: Optional[str] = None,
+        last_runs: Optional[int] = None,
+        column: str = "peak_abs_value",
+    ) -> Tuple[int, Optional[float]]:
+        """
+        (n hits, mean of `column`) over impact_peaks rows matching the filters.
+        `last_runs` counts only runs that have rows matching the other filters.
+        """
+        if column not in ("peak_abs_value", "peak_value"):
+            raise ValueError(f"column must be peak_abs_value or peak_value, got {column!r}")
+        filters: List[Tuple[str, object]] = [("metric", metric)]
+        for col, val in (("config", config), ("grp", group), ("test_id", test_id)):
+            if val is not None:
+                filters.append((col, val))
+        where = [f"p.{col} = ?" for col, _ in filters]
+        params: List[object] = [val for _, val in filters]
+        sql = f"SELECT COUNT(p.{column}), AVG(p.{column}) FROM impact_peaks p"
+        if last_runs is not None:
+            run_filter, run_params = self._recent_runs_sql(last_runs, test_id, filters)
+            sql += f" JOIN ({run_filter}) r ON r.test_id = p.test_id AND r.run_id = p.run_id"
+            params = run_params + params
+        sql += " WHERE " + " AND ".join(where)
+        n, mean = self.conn.execute(sql, params).fetchone()
+        return int(n), mean
+
+    def query(self, sql: str, params: Sequence[object] = ()) -> Tuple[List[str], List[Tuple[object, ...]]]:
+        cur = self.conn.execute(sql, tuple(params))
+        headers = [d[0] for d in cur.description] if cur.description else []
+        return headers, cur.fetchall()
+
+
+def _print_csv(out: TextIO, headers: Sequence[str], rows: Iterable[Sequence[object]]) -> None:
+    w = csv.writer(out)
+    w.writerow(headers)
+    w.writerows(rows)
+
+
+def _cmd_ingest(args: argparse.Namespace, out: TextIO) -> int:
+    with ResultsIndex(args.db) as idx:
+        stats = idx.ingest(args.results)
+    print(", ".join(f"{k}={v}" for k, v in stats.items()), file=out)
+    return 0
+
+
+def _cmd_mean(args: argparse.Namespace, out: TextIO) -> int:
+    with ResultsIndex(args.db, read_only=True) as idx:
+        n, mean = idx.mean_metric(
+            args.metric,
+            config=args.config,
+            group=args.group,
+            test_id=args.test_id,
+            last_runs=args.last_runs,
+            column=args.column,
+        )
+    _print_csv(out, ["metric", "config", "group", "test_id", "last_runs", "n", f"mean_{args.column}"], [
+        [args.metric, args.config or "", args.group or "", args.test_id or "", args.last_runs or "", n,
+         "" if mean is None else mean]
+    ])
+    return 0 if n > 0 else 1
+
+
+def _cmd_sql(args: argparse.Namespace, out: TextIO) -> int:
+    with ResultsIndex(args.db, read_only=True) as idx:
+        headers, rows = idx.query(args.statement, args.params)
+    _print_csv(out, headers, rows)
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None, out: Optional[TextIO] = None) -> int:
+    """
+    Run the CLI. Results are printed to `out` (default: sys.stdout).
+    """
+    ap = argparse.ArgumentParser(description="Index AHIS processed results into SQLite and query them.")
+    ap.add_argument(
+        "--db",
+        default=os.path.join("results", "results_index.sqlite"),
+        help="Index database path. Default: results/results_index.sqlite",
+    )
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    i = sub.add_parser("ingest", help="Ingest new or changed run packages.")
+    i.add_argument("--results", default="results", help="Results root containing <TEST_ID>/<RUN_ID>/. Default: results")
+    i.set_defaults(func=_cmd_ingest)
+
+    m = sub.add_parser("mean", help="Mean impact peak for a metric, optionally by config/group over recent runs.")
+    m.add_argument("--metric", required=True, help="Metric column name, e.g. strain_ue")
+    m.add_argument("--config", default=None, help="Only runs/groups with this panel config.")
+    m.add_argument("--group", default=None, help="Only hits in this group.")
+    m.add_argument("--test-id", default=None, help="Only this test ID, e.g. T-IMP-010")
+    m.add_argument(
+        "--last-runs",
+        type=int,
+        default=None,
+        help="Only the N most recently updated runs that have hits matching the other filters.",
+    )
+    m.add_argument(
+        "--column", choices=["peak_abs_value", "peak_value"], default="peak_abs_value", help="Default: peak_abs_value"
+    )
+    m.set_defaults(func=_cmd_mean)
+
+    s = sub.add_parser("sql", help="Run a read-only SQL statement and print CSV.")
+    s.add_argument("statement", help="SQL statement (use ? placeholders for parameters).")
+    s.add_argument("params", nargs="*", help="Parameter values for ? placeholders.")
+    s.set_defaults(func=_cmd_sql)
+
+    args = ap.parse_args(argv)
+    return args.func(args, out or sys.stdout)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
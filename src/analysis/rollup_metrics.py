@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Time-Bucketed Rollups for Long Environmental Logs (T-THM / T-FAT)
+
+Purpose
+-------
+Thermal and vacuum cycling runs log temperature plus SHM/strain channels for hours or
+days. Answering a drift question ("what was the mean strain between hour 10 and 14?")
+should not require re-reading the full-rate raw log. This script builds per-bucket
+statistics once, then answers range queries from the rollups only.
+
+Build (one streaming pass)
+--------------------------
+For every channel and every bucket width (e.g., 10 s, 60 s, 3600 s) it stores:
+count, min, max, mean, std (sample, n-1).
+
+Accumulators are mergeable (Welford / Chan parallel update), so each raw sample
+updates only the finest open bucket. When a fine bucket closes it is written and
+merged into the open bucket of the next coarser width. Each bucket width must
+therefore be an integer multiple of the next finer width. Buckets are aligned to
+t = 0 of the log's time base: bucket i of width w covers [i*w, (i+1)*w).
+
+Empty cells are treated as missing samples (not counted). Non-numeric cells are errors.
+
+Query
+-----
+A query over [start, end) combines the coarsest buckets that fit entirely inside the
+range, then fills the edges with finer buckets. At the finest width, buckets that
+overlap the range edges are included whole, so the reported covered span can be
+slightly wider than requested (at most one finest bucket on each side).
+
+Outputs (build)
+---------------
+- processed/rollup_<W>s.csv  (one per width; sorted by bucket; columns per channel:
+                              <ch>_count, <ch>_min, <ch>_max, <ch>_mean, <ch>_std)
+- processed/rollup_index.csv (width, file, n_buckets, first/last bucket start, channels)
+
+Usage Examples
+--------------
+1) Build rollups:
+   python3 rollup_metrics.py build \
+     --input results/T-THM-030/RUN_YYYY-MM-DD_XYZ/raw/thermal_log.csv \
+     --output results/T-THM-030/RUN_YYYY-MM-DD_XYZ/processed \
+     --time-col time_s \
+     --bucket-seconds 10 --bucket-seconds 60 --bucket-seconds 3600
+
+2) Query a time range (aggregate per channel):
+   python3 rollup_metrics.py query \
+     --rollups results/T-THM-030/RUN_YYYY-MM-DD_XYZ/processed \
+     --start 36000 --end 50400 --channel strain_ue
+
+3) Drift series at one width:
+   python3 rollup_metrics.py query --rollups <processed_dir> --start 0 --end 86400 --series 3600
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import math
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from analysis_io import open_text_read, write_csv
+
+STAT_FIELDS = ("count", "min", "max", "mean", "std")
+
+
+class RunningStats:
+    """
+    Mergeable count/min/max/mean/variance accumulator.
+    """
+
+    __slots__ = ("n", "mean", "m2", "vmin", "vmax")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.vmin = math.inf
+        self.vmax = -math.inf
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        if x < self.vmin:
+            self.vmin = x
+        if x > self.vmax:
+            self.vmax = x
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.vmin, self.vmax = other.vmin, other.vmax
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        self.vmin = min(self.vmin, other.vmin)
+        self.vmax = max(self.vmax, other.vmax)
+
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    def cells(self) -> list:
+        if self.n == 0:
+            return [0, "", "", "", ""]
+        return [self.n, self.vmin, self.vmax, self.mean, self.std()]
+
+    @classmethod
+    def from_cells(cls, n: int, vmin: float, vmax: float, mean: float, std: float) -> "RunningStats":
+        s = cls()
+        if n > 0:
+            s.n, s.vmin, s.vmax, s.mean = n, vmin, vmax, mean
+            s.m2 = std * std * (n - 1)
+        return s
+
+
+def _check_widths(widths: Sequence[float]) -> List[float]:
+    ws = sorted(set(widths))
+    if not ws:
+        raise ValueError("At least one --bucket-seconds width is required.")
+    if ws[0] <= 0:
+        raise ValueError("--bucket-seconds must be positive.")
+    for finer, w in zip(ws, ws[1:]):
+        ratio = w / finer
+        if abs(ratio - round(ratio)) > 1e-9:
+            raise ValueError(f"Bucket width {w} s is not an integer multiple of the next finer width {finer} s.")
+    return ws
+
+
+class _RollupBuilder:
+    def __init__(self, channels: List[str], widths: List[float]) -> None:
+        self.channels = channels
+        self.widths = widths
+        self.ratios = [int(round(w / widths[0])) for w in widths]
+        self.open_idx: List[Optional[int]] = [None] * len(widths)
+        self.open_stats: List[List[RunningStats]] = [[RunningStats() for _ in channels] for _ in widths]
+        self.rows: List[List[list]] = [[] for _ in widths]
+
+    def _close(self, k: int) -> None:
+        idx = self.open_idx[k]
+        w = self.widths[k]
+        stats = self.open_stats[k]
+        row: list = [idx * w, (idx + 1) * w]
+        for s in stats:
+            row.extend(s.cells())
+        self.rows[k].append(row)
+        if k + 1 < len(self.widths):
+            parent_idx = idx // (self.ratios[k + 1] // self.ratios[k])
+            if self.open_idx[k + 1] is not None and self.open_idx[k + 1] != parent_idx:
+                self._close(k + 1)
+            self.open_idx[k + 1] = parent_idx
+            for p, s in zip(self.open_stats[k + 1], stats):
+                p.merge(s)
+        self.open_stats[k] = [RunningStats() for _ in self.channels]
+        self.open_idx[k] = None
+
+    def add_row(self, t: float, values: Sequence[Optional[float]]) -> None:
+        idx = int(math.floor(t / self.widths[0]))
+        if self.open_idx[0] is not None and idx != self.open_idx[0]:
+            self._close(0)
+        self.open_idx[0] = idx
+        for s, v in zip(self.open_stats[0], values):
+            if v is not None:
+                s.add(v)
+
+    def finish(self) -> None:
+        for k in range(len(self.widths)):
+            if self.open_idx[k] is not None:
+                self._close(k)
+
+
+def _parse_cell(value: str, *, path: str, col: str, row_idx: int) -> Optional[float]:
+    v = value.strip()
+    if not v:
+        return None
+    try:
+        return float(v)
+    except Exception as e:
+        raise ValueError(
+            f"Non-numeric value in {path} at row {row_idx+2} col '{col}': {value!r}"
+        ) from e
+
+
+def _stream_rows(
+    paths: Sequence[str], time_col: str, channels: Optional[List[str]]
+) -> Tuple[List[str], Iterable[Tuple[float, List[Optional[float]]]]]:
+    """
+    Resolve channels from the first file's header, then yield (t, values) across all
+    files in order, enforcing strictly increasing time across file boundaries.
+    """
+    with open_text_read(paths[0]) as f:
+        header = next(csv.reader(f), None)
+    if header is None:
+        raise ValueError(f"CSV has no header row: {paths[0]}")
+    if time_col not in header:
+        raise ValueError(f"Missing time column '{time_col}' in {paths[0]}. Found: {header}")
+    chans = channels or [h for h in header if h != time_col]
+    if not chans:
+        raise ValueError(f"No channel columns besides '{time_col}' in {paths[0]}")
+
+    def gen() -> Iterable[Tuple[float, List[Optional[float]]]]:
+        prev_t = -math.inf
+        for path in paths:
+            with open_text_read(path) as f:
+                reader = csv.reader(f)
+                hdr = next(reader, None)
+                if hdr is None:
+                    raise ValueError(f"CSV has no header row: {path}")
+                missing = [c for c in [time_col] + chans if c not in hdr]
+                if missing:
+                    raise ValueError(f"Missing columns {missing} in {path}. Found: {hdr}")
+                t_i = hdr.index(time_col)
+                c_i = [hdr.index(c) for c in chans]
+                need = max([t_i] + c_i) + 1
+                for i, row in enumerate(reader):
+                    if not row:
+                        continue
+                    if len(row) < need:
+                        raise ValueError(f"Row {i+2} in {path} has {len(row)} fields, expected {len(hdr)}")
+                    t = _parse_cell(row[t_i], path=path, col=time_col, row_idx=i)
+                    if t is None:
+                        raise ValueError(f"Empty time value in {path} at row {i+2}")
+                    if t <= prev_t:
+                        raise ValueError(
+                            f"Time column must be strictly increasing. Found t={t} <= {prev_t} in {path} at row {i+2}"
+                        )
+                    prev_t = t
+                    yield t, [_parse_cell(row[j], path=path, col=c, row_idx=i) for j, c in zip(c_i, chans)]
+
+    return chans, gen()
+
+
+def _width_label(w: float) -> str:
+    return f"{w:g}"
+
+
+def build_rollups(
+    paths: Sequence[str], out_dir: str, time_col: str, widths: Sequence[float], channels: Optional[List[str]] = None
+) -> None:
+    ws = _check_widths(widths)
+    chans, rows = _stream_rows(paths, time_col, channels)
+    builder = _RollupBuilder(chans, ws)
+    n = 0
+    for t, values in rows:
+        builder.add_row(t, values)
+        n += 1
+    if n == 0:
+        raise ValueError("No data rows in input.")
+    builder.finish()
+
+    header = ["bucket_start_s", "bucket_end_s"]
+    for c in chans:
+        header.extend(f"{c}_{f}" for f in STAT_FIELDS)
+
+    index_rows = []
+    for w, level_rows in zip(ws, builder.rows):
+        name = f"rollup_{_width_label(w)}s.csv"
+        write_csv(os.path.join(out_dir, name), header, level_rows)
+        index_rows.append([w, name, len(level_rows), level_rows[0][0], level_rows[-1][0], " ".join(chans)])
+    write_csv(
+        os.path.join(out_dir, "rollup_index.csv"),
+        ["bucket_seconds", "file", "n_buckets", "first_bucket_start_s", "last_bucket_start_s", "channels"],
+        index_rows,
+    )
+
+
+class RollupStore:
+    """
+    Read-side view of a rollup directory. Levels are loaded lazily, one file per width.
+    """
+
+    def __init__(self, rollup_dir: str) -> None:
+        self.dir = rollup_dir
+        index_path = os.path.join(rollup_dir, "rollup_index.csv")
+        with open_text_read(index_path) as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            raise ValueError(f"No rollup levels listed in {index_path}")
+        self.widths = sorted(float(r["bucket_seconds"]) for r in rows)
+        self.files = {float(r["bucket_seconds"]): r["file"] for r in rows}
+        self.channels = rows[0]["channels"].split()
+        self._levels: Dict[float, Tuple[List[int], List[List[RunningStats]]]] = {}
+
+    def _level(self, w: float) -> Tuple[List[int], List[List[RunningStats]]]:
+        if w not in self._levels:
+            path = os.path.join(self.dir, self.files[w])
+            idxs: List[int] = []
+            stats: List[List[RunningStats]] = []
+            with open_text_read(path) as f:
+                reader = csv.reader(f)
+                next(reader)
+                for row in reader:
+                    idxs.append(int(round(float(row[0]) / w)))
+                    per: List[RunningStats] = []
+                    for c in range(len(self.channels)):
+                        cells = row[2 + 5 * c : 7 + 5 * c]
+                        n = int(cells[0])
+                        if n == 0:
+                            per.append(RunningStats())
+                        else:
+                            per.append(RunningStats.from_cells(n, *(float(x) for x in cells[1:])))
+                    stats.append(per)
+            self._levels[w] = (idxs, stats)
+        return self._levels[w]
+
+    def _cover(self, lo: float, hi: float, k: int, acc: List[RunningStats], span: List[float]) -> None:
+        if hi <= lo or k < 0:
+            return
+        w = self.widths[k]
+        idxs, stats = self._level(w)
+        if k == 0:
+            first, last = int(math.floor(lo / w)), int(math.ceil(hi / w)) - 1
+        else:
+            first, last = int(math.ceil(lo / w)), int(math.floor(hi / w)) - 1
+            if first > last:
+                self._cover(lo, hi, k - 1, acc, span)
+                return
+        a = bisect.bisect_left(idxs, first)
+        b = bisect.bisect_right(idxs, last)
+        for i in range(a, b):
+            for s, bucket in zip(acc, stats[i]):
+                s.merge(bucket)
+        if a < b:
+            span[0] = min(span[0], idxs[a] * w)
+            span[1] = max(span[1], (idxs[b - 1] + 1) * w)
+        if k > 0:
+            self._cover(lo, first * w, k - 1, acc, span)
+            self._cover((last + 1) * w, hi, k - 1, acc, span)
+
+    def query(self, start: float, end: float) -> Tuple[Dict[str, RunningStats], Tuple[float, float]]:
+        """
+        Aggregate every channel over [start, end). Returns per-channel stats and the
+        covered span (start, end) actually spanned by the buckets used.
+        """
+        if end <= start:
+            raise ValueError("Query end must be greater than start.")
+        acc = [RunningStats() for _ in self.channels]
+        span = [math.inf, -math.inf]
+        self._cover(start, end, len(self.widths) - 1, acc, span)
+        return dict(zip(self.channels, acc)), (span[0], span[1])
+
+    def series(self, width: float, start: float, end: float) -> List[Tuple[float, List[RunningStats]]]:
+        """
+        Buckets of one width overlapping [start, end), in time order.
+        """
+        if width not in self.files:
+            raise ValueError(f"No rollup level with width {width} s. Available: {self.widths}")
+        idxs, stats = self._level(width)
+        a = bisect.bisect_left(idxs, int(math.floor(start / width)))
+        b = bisect.bisect_right(idxs, int(math.ceil(end / width)) - 1)
+        return [(idxs[i] * width, stats[i]) for i in range(a, b)]
+
+
+def _cmd_build(args: argparse.Namespace, out: TextIO) -> int:
+    build_rollups(args.input, args.output, args.time_col, args.bucket_seconds or [10.0, 60.0, 3600.0], args.channel)
+    return 0
+
+
+def _cmd_query(args: argparse.Namespace, out: TextIO) -> int:
+    store = RollupStore(args.rollups)
+    channels = args.channel or store.channels
+    unknown = [c for c in channels if c not in store.channels]
+    if unknown:
+        raise ValueError(f"Unknown channel(s) {unknown}. Available: {store.channels}")
+    col_idx = [store.channels.index(c) for c in channels]
+
+    w = csv.writer(out)
+    if args.series is not None:
+        w.writerow(["bucket_start_s", "bucket_end_s", "channel"] + list(STAT_FIELDS))
+        for t0, stats in store.series(args.series, args.start, args.end):
+            for c, i in zip(channels, col_idx):
+                w.writerow([t0, t0 + args.series, c] + stats[i].cells())
+        return 0
+
+    stats, (span_lo, span_hi) = store.query(args.start, args.end)
+    w.writerow(["query_start_s", "query_end_s", "covered_start_s", "covered_end_s", "channel"] + list(STAT_FIELDS))
+    for c in channels:
+        w.writerow([args.start, args.end, span_lo, span_hi, c] + stats[c].cells())
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None, out: Optional[TextIO] = None) -> int:
+    """
+    Run the CLI. Query results are printed to `out` (default: sys.stdout).
+    """
+    ap = argparse.ArgumentParser(description="Build and query time-bucketed rollups of long AHIS environmental logs.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="Build rollups from raw CSV logs in one streaming pass.")
+    b.add_argument("--input", action="append", required=True, help="Raw CSV log (.csv/.csv.gz). Repeat in time order.")
+    b.add_argument("--output", required=True, help="Directory where rollup files will be written.")
+    b.add_argument("--time-col", default="time_s", help="Name of the time column (seconds). Default: time_s")
+    b.add_argument(
+        "--channel",
+        action="append",
+        default=None,
+        help="Channel column to roll up. Can be repeated. Default: every column except time.",
+    )
+    b.add_argument(
+        "--bucket-seconds",
+        action="append",
+        type=float,
+        default=None,
+        help="Bucket width in seconds. Can be repeated; each must be a multiple of the next finer. Default: 10, 60, 3600",
+    )
+    b.set_defaults(func=_cmd_build)
+
+    q = sub.add_parser("query", help="Aggregate or list rollups over a time range (reads rollups only).")
+    q.add_argument("--rollups", required=True, help="Directory containing rollup_index.csv.")
+    q.add_argument("--start", required=True, type=float, help="Range start (s, same time base as the log).")
+    q.add_argument("--end", required=True, type=float, help="Range end (s, exclusive).")
+    q.add_argument("--channel", action="append", default=None, help="Channel to report. Can be repeated. Default: all")
+    q.add_argument("--series", type=float, default=None, help="List buckets of this width instead of one aggregate.")
+    q.set_defaults(func=_cmd_query)
+
+    args = ap.parse_args(argv)
+    return args.func(args, out or sys.stdout)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
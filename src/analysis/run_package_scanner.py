@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Run Package Integrity Scanner
+
+Purpose
+-------
+Audit a whole results tree in one command. The folder convention
+
+    results/<TEST_ID>/<RUN_ID>/{raw,processed,calibration,photos}
+
+is defined in results/README.md; this script checks it and records what is in each
+run package so reviewers do not have to open files one by one.
+
+For every run package the scanner:
+- reports missing required folders (raw/, processed/, calibration/, photos/) and README.md
+- hashes every file under raw/ and processed/ (SHA-256) into <RUN_ID>/MANIFEST.json
+- validates every CSV (.csv or .csv.gz) in the same read pass used for hashing:
+    - header present, no blank or duplicate column names
+    - rows with the wrong number of fields
+    - NaN/inf cells, and empty cells in time-series CSVs (blank optional columns
+      such as notes are allowed in summary tables; they are still counted)
+    - time column strictly increasing (if the time column is present)
+    - sample-interval jitter: std(dt) / mean(dt) against --max-jitter
+
+Files are processed in parallel across all run packages (--workers).
+
+Re-scans are incremental: if a file's size and mtime match its entry in the existing
+MANIFEST.json, the previous hash and checks are reused and the file is not re-read.
+The manifest records the check parameters (--time-col, --max-jitter); if they differ
+from the current run, the cached CSV checks are invalid and every CSV is re-read and
+re-checked (other files keep their hashes). Use --rehash to force a full re-read.
+
+Outputs
+-------
+- results/<TEST_ID>/<RUN_ID>/MANIFEST.json (one per run package)
+- a summary on stdout; exit status 1 if any issue was found, else 0
+
+Usage Example
+-------------
+python3 src/analysis/run_package_scanner.py --results results --time-col time_s
+
+Notes
+-----
+- The scanner never modifies raw/ or processed/ files.
+- A CSV without the time column (e.g., summary tables) only gets the header/cell checks.
+- Jitter is only meaningful for fixed-rate logs; raise --max-jitter for event-based logs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import GZIP_MAGIC, write_text
+
+REQUIRED_DIRS = ("raw", "processed", "calibration", "photos")
+HASHED_DIRS = ("raw", "processed")
+MANIFEST_NAME = "MANIFEST.json"
+MANIFEST_VERSION = 1
+READ_CHUNK_BYTES = 1 << 20
+
+
+@dataclass(frozen=True)
+class ScanJob:
+    run_dir: str
+    rel_path: str
+    time_col: str
+    max_jitter: float
+
+
+class _HashingReader(io.RawIOBase):
+    """
+    Binary stream wrapper that feeds every byte read through a hash, so a file can be
+    parsed and hashed in a single pass.
+    """
+
+    def __init__(self, raw, hasher) -> None:
+        self._raw = raw
+        self._hasher = hasher
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        if n:
+            self._hasher.update(memoryview(b)[:n])
+        return n
+
+    def drain(self) -> None:
+        while True:
+            chunk = self._raw.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            self._hasher.update(chunk)
+
+
+def _is_csv(name: str) -> bool:
+    low = name.lower()
+    return low.endswith(".csv") or low.endswith(".csv.gz")
+
+
+def _check_csv_stream(text, time_col: str, max_jitter: float) -> Dict[str, object]:
+    issues: List[str] = []
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return {"n_rows": 0, "issues": ["no header row"]}
+
+    names = [h.strip() for h in header]
+    if any(not h for h in names):
+        issues.append("blank column name in header")
+    dupes = sorted({h for h in names if h and names.count(h) > 1})
+    if dupes:
+        issues.append(f"duplicate column names: {dupes}")
+
+    n_cols = len(header)
+    t_idx = names.index(time_col) if time_col in names else None
+
+    n_rows = 0
+    ragged = 0
+    empty_cells = 0
+    nonfinite_cells = 0
+    first_bad_row: Optional[int] = None
+
+    non_monotonic = 0
+    first_non_monotonic: Optional[int] = None
+    prev_t: Optional[float] = None
+    # Welford running mean/variance of dt
+    dt_n = 0
+    dt_mean = 0.0
+    dt_m2 = 0.0
+    dt_min = math.inf
+    dt_max = -math.inf
+
+    for row in reader:
+        n_rows += 1
+        line_no = n_rows + 1
+        if len(row) != n_cols:
+            ragged += 1
+            if first_bad_row is None:
+                first_bad_row = line_no
+        for cell in row:
+            c = cell.strip()
+            if not c:
+                empty_cells += 1
+                if first_bad_row is None:
+                    first_bad_row = line_no
+            elif c[0] in "nNiI+-" and c.lower().lstrip("+-") in ("nan", "inf", "infinity"):
+                nonfinite_cells += 1
+                if first_bad_row is None:
+                    first_bad_row = line_no
+
+        if t_idx is None or t_idx >= len(row):
+            continue
+        try:
+            t = float(row[t_idx])
+        except ValueError:
+            continue
+        if not math.isfinite(t):
+            continue
+        if prev_t is not None:
+            dt = t - prev_t
+            if dt <= 0:
+                non_monotonic += 1
+                if first_non_monotonic is None:
+                    first_non_monotonic = line_no
+            else:
+                dt_n += 1
+                delta = dt - dt_mean
+                dt_mean += delta / dt_n
+                dt_m2 += delta * (dt - dt_mean)
+                dt_min = min(dt_min, dt)
+                dt_max = max(dt_max, dt)
+        prev_t = t
+
+    if n_rows == 0:
+        issues.append("no data rows")
+    if ragged:
+        issues.append(f"{ragged} row(s) with wrong field count (first at line {first_bad_row})")
+    if empty_cells and t_idx is not None:
+        # Blank cells are legitimate in summary tables (e.g., optional notes), not in logs.
+        issues.append(f"{empty_cells} empty cell(s)")
+    if nonfinite_cells:
+        issues.append(f"{nonfinite_cells} NaN/inf cell(s)")
+
+    out: Dict[str, object] = {
+        "n_rows": n_rows,
+        "n_cols": n_cols,
+        "empty_cells": empty_cells,
+        "nonfinite_cells": nonfinite_cells,
+    }
+    if first_bad_row is not None:
+        out["first_bad_line"] = first_bad_row
+
+    if t_idx is not None:
+        out["time_col"] = time_col
+        out["non_monotonic_steps"] = non_monotonic
+        if non_monotonic:
+            issues.append(f"time not strictly increasing at {non_monotonic} step(s) (first at line {first_non_monotonic})")
+        if dt_n > 0:
+            dt_std = math.sqrt(dt_m2 / (dt_n - 1)) if dt_n > 1 else 0.0
+            jitter = dt_std / dt_mean
+            out.update(
+                {
+                    "dt_mean_s": dt_mean,
+                    "dt_min_s": dt_min,
+                    "dt_max_s": dt_max,
+                    "sample_rate_hz": 1.0 / dt_mean,
+                    "dt_jitter_rel": jitter,
+                }
+            )
+            if jitter > max_jitter:
+                issues.append(f"sample-interval jitter {jitter:.3g} exceeds {max_jitter:g}")
+
+    out["issues"] = issues
+    return out
+
+
+def _scan_file(job: ScanJob) -> Tuple[str, str, Dict[str, object]]:
+    """
+    Hash one file and, for CSVs, validate it in the same read pass.
+    Runs in a worker process; returns (run_dir, rel_path, manifest entry).
+    """
+    path = os.path.join(job.run_dir, job.rel_path)
+    st = os.stat(path)
+    hasher = hashlib.sha256()
+    entry: Dict[str, object] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    with open(path, "rb") as raw:
+        if _is_csv(job.rel_path):
+            src = _HashingReader(raw, hasher)
+            buffered = io.BufferedReader(src, buffer_size=READ_CHUNK_BYTES)
+            compressed = buffered.peek(2)[:2] == GZIP_MAGIC
+            byte_stream = gzip.GzipFile(fileobj=buffered, mode="rb") if compressed else buffered
+            text = io.TextIOWrapper(byte_stream, encoding="utf-8", errors="replace", newline="")
+            try:
+                entry["csv"] = _check_csv_stream(text, job.time_col, job.max_jitter)
+            except (csv.Error, OSError, EOFError) as e:
+                entry["csv"] = {"issues": [f"unreadable CSV: {e}"]}
+            # Bytes already in the read buffer were hashed when read from disk; hash
+            # whatever the parser never pulled in (e.g., after an error).
+            src.drain()
+        else:
+            while True:
+                chunk = raw.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+
+    entry["sha256"] = hasher.hexdigest()
+    return job.run_dir, job.rel_path, entry
+
+
+def _find_run_dirs(results_root: str) -> List[str]:
+    if not os.path.isdir(results_root):
+        raise ValueError(f"Results path is not a directory: {results_root}")
+    runs: List[str] = []
+    for test_id in sorted(os.listdir(results_root)):
+        test_dir = os.path.join(results_root, test_id)
+        if not os.path.isdir(test_dir) or test_id.startswith("."):
+            continue
+        for run_id in sorted(os.listdir(test_dir)):
+            run_dir = os.path.join(test_dir, run_id)
+            if os.path.isdir(run_dir) and not run_id.startswith("."):
+                runs.append(run_dir)
+    return runs
+
+
+def _list_hashed_files(run_dir: str) -> List[str]:
+    rels: List[str] = []
+    for sub in HASHED_DIRS:
+        base = os.path.join(run_dir, sub)
+        if not os.path.isdir(base):
+            continue
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.startswith("."):
+                    continue
+                rels.append(os.path.relpath(os.path.join(dirpath, name), run_dir).replace(os.sep, "/"))
+    return rels
+
+
+def _load_manifest(run_dir: str) -> Tuple[Dict[str, Dict[str, object]], Dict[str, object]]:
+    """
+    (files, check_params) from an existing manifest; empty if missing or unreadable.
+    """
+    path = os.path.join(run_dir, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {}, {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    if data.get("manifest_version") != MANIFEST_VERSION:
+        return {}, {}
+    return data.get("files") or {}, data.get("check_params") or {}
+
+
+def _structure_issues(run_dir: str) -> List[str]:
+    issues = [f"missing folder: {d}/" for d in REQUIRED_DIRS if not os.path.isdir(os.path.join(run_dir, d))]
+    if not os.path.isfile(os.path.join(run_dir, "README.md")):
+        issues.append("missing README.md")
+    return issues
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Scan AHIS run packages, validate CSVs and write MANIFEST.json hashes.")
+    ap.add_argument("--results", default="results", help="Results root containing <TEST_ID>/<RUN_ID>/. Default: results")
+    ap.add_argument("--time-col", default="time_s", help="Time column checked for monotonicity/jitter. Default: time_s")
+    ap.add_argument(
+        "--max-jitter",
+        type=float,
+        default=0.01,
+        help="Maximum allowed std(dt)/mean(dt) for time-series CSVs. Default: 0.01",
+    )
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes. Default: CPU count")
+    ap.add_argument("--rehash", action="store_true", help="Ignore existing manifests and re-read every file.")
+
+    args = ap.parse_args(argv)
+    if args.max_jitter < 0:
+        raise ValueError("--max-jitter must be >= 0.")
+    if args.workers is not None and args.workers < 1:
+        raise ValueError("--workers must be >= 1.")
+
+    run_dirs = _find_run_dirs(args.results)
+    if not run_dirs:
+        raise ValueError(f"No run packages found under {args.results} (expected <TEST_ID>/<RUN_ID>/).")
+
+    check_params: Dict[str, object] = {"time_col": args.time_col, "max_jitter": args.max_jitter}
+    manifests: Dict[str, Dict[str, Dict[str, object]]] = {}
+    jobs: List[ScanJob] = []
+    for run_dir in run_dirs:
+        previous, prev_params = ({}, {}) if args.rehash else _load_manifest(run_dir)
+        checks_valid = prev_params == check_params
+        files: Dict[str, Dict[str, object]] = {}
+        for rel in _list_hashed_files(run_dir):
+            st = os.stat(os.path.join(run_dir, rel))
+            prev = previous.get(rel)
+            if (
+                prev
+                and prev.get("size") == st.st_size
+                and prev.get("mtime_ns") == st.st_mtime_ns
+                and (checks_valid or not _is_csv(rel))
+            ):
+                files[rel] = prev
+            else:
+                jobs.append(ScanJob(run_dir=run_dir, rel_path=rel, time_col=args.time_col, max_jitter=args.max_jitter))
+        manifests[run_dir] = files
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for run_dir, rel, entry in pool.map(_scan_file, jobs, chunksize=4):
+                manifests[run_dir][rel] = entry
+
+    total_issues = 0
+    for run_dir in run_dirs:
+        files = dict(sorted(manifests[run_dir].items()))
+        structure = _structure_issues(run_dir)
+        manifest = {
+            "manifest_version": MANIFEST_VERSION,
+            "run": os.path.relpath(run_dir, args.results).replace(os.sep, "/"),
+            "hash_algorithm": "sha256",
+            "check_params": check_params,
+            "structure_issues": structure,
+            "files": files,
+        }
+        write_text(os.path.join(run_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+        file_issues = [
+            (rel, msg) for rel, entry in files.items() for msg in (entry.get("csv") or {}).get("issues", [])
+        ]
+        total_issues += len(structure) + len(file_issues)
+        status = "OK" if not structure and not file_issues else "ISSUES"
+        print(f"[{status}] {manifest['run']}: {len(files)} file(s)")
+        for msg in structure:
+            print(f"    {msg}")
+        for rel, msg in file_issues:
+            print(f"    {rel}: {msg}")
+
+    rehashed = len(jobs)
+    print(f"Scanned {len(run_dirs)} run package(s); re-read {rehashed} file(s); {total_issues} issue(s).")
+    return 1 if total_issues else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
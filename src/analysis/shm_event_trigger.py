@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Multi-Channel SHM Event Trigger with Detection-Latency Measurement
+
+Purpose
+-------
+The README lists detection time (ms) as a primary SHM output. This script runs a
+multi-channel trigger over PVDF channels and reports, per hit:
+- when the detector fired relative to a reference event channel (impactor load cell,
+  trigger line, valve command), and
+- what the detector itself cost: processing time per sample block, measured with
+  time.perf_counter_ns() around the detector call.
+
+Detector (per channel, O(1) state per sample)
+---------------------------------------------
+The signal is de-meaned with a slow running mean, then its energy x^2 is tracked by two
+recursive averages with time constants --sta-s and --lta-s (alpha = dt / T).
+- --mode sta_lta: fires when STA / LTA >= --on-ratio after --lta-s of warm-up; re-arms
+  when the ratio drops below --off-ratio.
+- --mode energy:  fires when sqrt(STA) (short-term RMS, signal units) >= --energy-threshold.
+
+A hit is detected when --min-channels channels have fired within --coincidence-s of the
+first; the detection time is the time of the last of those channels.
+
+Batch and streaming share one code path
+---------------------------------------
+Samples are always fed to the detector in blocks of --block-size rows through the same
+MultiChannelTrigger.process_block() call. Batch mode reads a file; streaming mode
+(--input -) reads rows from stdin as they arrive. The block loop, the detector and the
+timing are identical, so batch results include the real detector cost.
+
+Latency terms (per hit)
+-----------------------
+- detection_delay_ms      = detection time - reference event time (signal time)
+- block_buffer_ms         = time from the triggering sample to the end of its block
+                            (a block is only processed once it is full)
+- block_processing_ms     = measured processing time of that block
+- effective_detection_ms  = sum of the three: earliest time a live system could report
+
+Inputs
+------
+One or more CSV files (.csv or .csv.gz), one hit per file, with a time column, the PVDF
+channel columns (--channel, repeat) and the reference column (--reference-col). The
+reference event time is the first sample where |reference| >= --reference-threshold.
+PVDF usually responds before a load cell crosses its threshold, so detections up to
+--reference-guard-s before the reference time count as the hit (negative delay); earlier
+ones are reported as false triggers.
+aligned_channels.csv from time_alignment.py can be used directly.
+
+Outputs
+-------
+- processed/shm_trigger_events.csv    (per hit: reference time, detection time and latency terms,
+                                        triggers before the reference = false triggers)
+- processed/shm_trigger_channels.csv  (per hit and channel: first trigger time and delay)
+- processed/shm_trigger_latency.csv   (per file: block processing time statistics)
+
+Usage Example
+-------------
+python3 shm_event_trigger.py \
+  --input results/T-IMP-011/RUN_x/raw \
+  --output results/T-IMP-011/RUN_x/processed \
+  --channel pvdf_1 --channel pvdf_2 --channel pvdf_3 \
+  --reference-col load_cell_n --reference-threshold 50 \
+  --mode sta_lta --sta-s 0.0005 --lta-s 0.02 --on-ratio 8 --min-channels 2
+
+Streaming (rows arrive on stdin; header first):
+  daq_reader | python3 shm_event_trigger.py --input - --output <processed_dir> ...
+
+Notes
+-----
+- The time column must be strictly increasing; dt is taken from the first two samples
+  and the sample rate is assumed constant.
+- Processing times depend on the machine and interpreter; report them with the host
+  description. They are an upper bound for a compiled implementation of the same logic.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from analysis_io import list_csv_files, open_text_read, write_csv
+
+
+@dataclass(frozen=True)
+class TriggerConfig:
+    mode: str
+    sta_s: float
+    lta_s: float
+    on_ratio: float
+    off_ratio: float
+    energy_threshold: Optional[float]
+    min_channels: int
+    coincidence_s: float
+
+
+class ChannelTrigger:
+    """
+    Recursive STA/LTA (or short-term RMS) trigger for one channel. update() is O(1).
+    """
+
+    __slots__ = ("name", "cfg", "a_sta", "a_lta", "warmup", "n", "mean", "sta", "lta", "armed", "fired_at")
+
+    def __init__(self, name: str, cfg: TriggerConfig, dt: float) -> None:
+        self.name = name
+        self.cfg = cfg
+        self.a_sta = min(1.0, dt / cfg.sta_s)
+        self.a_lta = min(1.0, dt / cfg.lta_s)
+        self.warmup = int(math.ceil(cfg.lta_s / dt))
+        self.n = 0
+        self.mean = 0.0
+        self.sta = 0.0
+        self.lta = 0.0
+        self.armed = True
+        self.fired_at: List[float] = []
+
+    def update(self, t: float, x: float) -> bool:
+        """
+        Feed one sample; return True if the channel fires on this sample.
+        """
+        n = self.n = self.n + 1
+        if n == 1:
+            self.mean = x
+        else:
+            self.mean += (x - self.mean) * self.a_lta
+        e = x - self.mean
+        e *= e
+        self.sta += (e - self.sta) * self.a_sta
+        if self.cfg.mode == "energy":
+            level = math.sqrt(self.sta)
+            on = level >= self.cfg.energy_threshold  # type: ignore[operator]
+            off = not on
+        else:
+            ratio = self.sta / self.lta if self.lta > 0 else 0.0
+            on = n > self.warmup and ratio >= self.cfg.on_ratio
+            off = ratio < self.cfg.off_ratio
+        # LTA is updated after the test so the event itself does not raise the baseline first.
+        self.lta += (e - self.lta) * self.a_lta
+        if self.armed and on:
+            self.armed = False
+            self.fired_at.append(t)
+            return True
+        if not self.armed and off:
+            self.armed = True
+        return False
+
+
+@dataclass
+class Detection:
+    time_s: float
+    channels: List[Tuple[str, float]]
+    block_index: int
+    block_end_time_s: float
+
+
+@dataclass
+class MultiChannelTrigger:
+    """
+    Feeds blocks to every ChannelTrigger and applies the k-of-n coincidence rule.
+    """
+
+    cfg: TriggerConfig
+    channels: List[ChannelTrigger]
+    detections: List[Detection] = field(default_factory=list)
+    block_ns: List[int] = field(default_factory=list)
+    _pending: List[Tuple[str, float]] = field(default_factory=list)
+
+    def process_block(self, t: Sequence[float], cols: Sequence[Sequence[float]]) -> None:
+        t0 = time.perf_counter_ns()
+        cfg = self.cfg
+        block_index = len(self.block_ns)
+        pending = self._pending
+        for ch, xs in zip(self.channels, cols):
+            update = ch.update
+            for ti, x in zip(t, xs):
+                if update(ti, x):
+                    pending.append((ch.name, ti))
+        if pending:
+            pending.sort(key=lambda p: p[1])
+        while pending:
+            first_t = pending[0][1]
+            group: List[Tuple[str, float]] = []
+            seen = set()
+            for name, ft in pending:
+                if ft - first_t > cfg.coincidence_s:
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    group.append((name, ft))
+            if len(group) >= cfg.min_channels:
+                group = group[: cfg.min_channels]
+                self.detections.append(
+                    Detection(time_s=group[-1][1], channels=group, block_index=block_index, block_end_time_s=t[-1])
+                )
+                cutoff = group[-1][1]
+                pending[:] = [p for p in pending if p[1] > cutoff]
+            elif t[-1] - first_t > cfg.coincidence_s:
+                pending.pop(0)  # window closed without enough channels
+            else:
+                break  # later blocks may still complete this group
+        self.block_ns.append(time.perf_counter_ns() - t0)
+
+
+def _iter_rows(path: str) -> Iterator[List[str]]:
+    if path == "-":
+        yield from csv.reader(sys.stdin)
+        return
+    with open_text_read(path) as f:
+        yield from csv.reader(f)
+
+
+def iter_blocks(
+    rows: Iterable[List[str]],
+    *,
+    source: str,
+    time_col: str,
+    columns: Sequence[str],
+    block_size: int,
+) -> Iterator[Tuple[List[float], List[List[float]]]]:
+    """
+    Yield (times, [column values...]) blocks of up to block_size rows as rows arrive.
+    """
+    it = iter(rows)
+    header = next(it, None)
+    if header is None:
+        raise ValueError(f"CSV has no header row: {source}")
+    header = [h.strip() for h in header]
+    missing = [c for c in [time_col] + list(columns) if c not in header]
+    if missing:
+        raise ValueError(f"Missing columns in {source}: {missing}. Found: {header}")
+    ti = header.index(time_col)
+    idx = [header.index(c) for c in columns]
+
+    t: List[float] = []
+    cols: List[List[float]] = [[] for _ in idx]
+    last_t = -math.inf
+    for row_idx, row in enumerate(it):
+        if not row:
+            continue
+        try:
+            tv = float(row[ti])
+            vals = [float(row[j]) for j in idx]
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Bad or non-numeric value in {source} at row {row_idx+2}: {row!r}") from e
+        if tv <= last_t:
+            raise ValueError(f"Time column must be strictly increasing in {source} (row {row_idx+2})")
+        last_t = tv
+        t.append(tv)
+        for c, v in zip(cols, vals):
+            c.append(v)
+        if len(t) == block_size:
+            yield t, cols
+            t = []
+            cols = [[] for _ in idx]
+    if t:
+        yield t, cols
+
+
+def _percentile(sorted_xs: Sequence[float], q: float) -> float:
+    if not sorted_xs:
+        raise ValueError("Cannot compute percentile of empty list")
+    k = (len(sorted_xs) - 1) * q
+    lo = int(math.floor(k))
+    hi = min(lo + 1, len(sorted_xs) - 1)
+    return sorted_xs[lo] + (sorted_xs[hi] - sorted_xs[lo]) * (k - lo)
+
+
+@dataclass(frozen=True)
+class HitResult:
+    filename: str
+    reference_time_s: Optional[float]
+    detection: Optional[Detection]
+    false_triggers: int
+    fired: Dict[str, List[float]]
+    reference_guard_s: float
+    block_ns: List[int]
+    block_size: int
+    n_samples: int
+    dt: float
+
+
+def run_trigger(
+    path: str,
+    *,
+    cfg: TriggerConfig,
+    time_col: str,
+    channels: Sequence[str],
+    reference_col: str,
+    reference_threshold: float,
+    reference_guard_s: float,
+    block_size: int,
+) -> HitResult:
+    source = "<stdin>" if path == "-" else path
+    blocks = iter_blocks(
+        _iter_rows(path), source=source, time_col=time_col, columns=list(channels) + [reference_col], block_size=block_size
+    )
+    trigger: Optional[MultiChannelTrigger] = None
+    ref_time: Optional[float] = None
+    n_samples = 0
+    dt = 0.0
+    prev_t: Optional[float] = None
+    for t, cols in blocks:
+        if trigger is None:
+            if len(t) < 2:
+                raise ValueError(f"Need at least 2 samples in the first block of {source} to set dt.")
+            dt = t[1] - t[0]
+            trigger = MultiChannelTrigger(cfg=cfg, channels=[ChannelTrigger(c, cfg, dt) for c in channels])
+        n_samples += len(t)
+        prev_t = t[-1]
+        # Ground truth is not part of the detector; it is evaluated outside the timed call.
+        if ref_time is None:
+            for ti, r in zip(t, cols[-1]):
+                if abs(r) >= reference_threshold:
+                    ref_time = ti
+                    break
+        trigger.process_block(t, cols[:-1])
+    if trigger is None or prev_t is None:
+        raise ValueError(f"No data rows in {source}")
+
+    detection = None
+    false_triggers = 0
+    for d in trigger.detections:
+        if ref_time is not None and d.time_s < ref_time - reference_guard_s:
+            false_triggers += 1
+        elif detection is None:
+            detection = d
+    return HitResult(
+        filename=os.path.basename(source),
+        reference_time_s=ref_time,
+        detection=detection,
+        false_triggers=false_triggers,
+        fired={ch.name: ch.fired_at for ch in trigger.channels},
+        reference_guard_s=reference_guard_s,
+        block_ns=trigger.block_ns,
+        block_size=block_size,
+        n_samples=n_samples,
+        dt=dt,
+    )
+
+
+def _write_outputs(out_dir: str, results: Sequence[HitResult]) -> None:
+    event_rows = []
+    channel_rows = []
+    latency_rows = []
+    for r in results:
+        d = r.detection
+        ref = r.reference_time_s
+        if d is not None:
+            processing_ms = r.block_ns[d.block_index] / 1e6
+            buffer_ms = (d.block_end_time_s - d.time_s) * 1000.0
+            delay_ms = (d.time_s - ref) * 1000.0 if ref is not None else None
+            event_rows.append([
+                r.filename,
+                "" if ref is None else ref,
+                True,
+                d.time_s,
+                "" if delay_ms is None else delay_ms,
+                buffer_ms,
+                processing_ms,
+                "" if delay_ms is None else delay_ms + buffer_ms + processing_ms,
+                len(d.channels),
+                d.channels[0][0],
+                ";".join(name for name, _ in d.channels),
+                r.false_triggers,
+            ])
+        else:
+            event_rows.append([r.filename, "" if ref is None else ref, False, "", "", "", "", "", 0, "", "", r.false_triggers])
+
+        for name, times in r.fired.items():
+            after = [x for x in times if ref is None or x >= ref - r.reference_guard_s]
+            first = after[0] if after else None
+            channel_rows.append([
+                r.filename,
+                name,
+                "" if first is None else first,
+                "" if first is None or ref is None else (first - ref) * 1000.0,
+                len(times),
+            ])
+
+        ns = sorted(r.block_ns)
+        us = [x / 1000.0 for x in ns]
+        latency_rows.append([
+            r.filename,
+            r.n_samples,
+            r.block_size,
+            len(ns),
+            r.block_size * r.dt * 1000.0,
+            sum(us) / len(us),
+            _percentile(us, 0.5),
+            _percentile(us, 0.95),
+            us[-1],
+            sum(ns) / r.n_samples,
+        ])
+
+    write_csv(
+        os.path.join(out_dir, "shm_trigger_events.csv"),
+        [
+            "filename",
+            "reference_time_s",
+            "detected",
+            "detection_time_s",
+            "detection_delay_ms",
+            "block_buffer_ms",
+            "block_processing_ms",
+            "effective_detection_ms",
+            "n_channels",
+            "first_channel",
+            "channels",
+            "false_triggers_before_reference",
+        ],
+        event_rows,
+    )
+    write_csv(
+        os.path.join(out_dir, "shm_trigger_channels.csv"),
+        ["filename", "channel", "first_trigger_time_s", "delay_ms", "n_fires"],
+        channel_rows,
+    )
+    write_csv(
+        os.path.join(out_dir, "shm_trigger_latency.csv"),
+        [
+            "filename",
+            "n_samples",
+            "block_size",
+            "n_blocks",
+            "block_duration_ms",
+            "mean_block_processing_us",
+            "p50_block_processing_us",
+            "p95_block_processing_us",
+            "max_block_processing_us",
+            "mean_ns_per_sample",
+        ],
+        latency_rows,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Multi-channel SHM event trigger with detection-latency measurement.")
+    ap.add_argument("--input", required=True, help="Hit CSV file, directory of hit CSVs, or '-' for stdin streaming.")
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--time-col", default="time_s", help="Name of the time column (seconds). Default: time_s")
+    ap.add_argument("--channel", action="append", required=True, help="PVDF channel column. Can be repeated.")
+    ap.add_argument("--reference-col", required=True, help="Reference event column (ground truth).")
+    ap.add_argument("--reference-threshold", required=True, type=float, help="|reference| level marking the event.")
+    ap.add_argument(
+        "--reference-guard-s",
+        type=float,
+        default=0.001,
+        help="Detections this long before the reference still count as the hit (s). Default: 0.001",
+    )
+    ap.add_argument("--mode", choices=["sta_lta", "energy"], default="sta_lta", help="Default: sta_lta")
+    ap.add_argument("--sta-s", type=float, default=0.0005, help="Short-term time constant (s). Default: 0.0005")
+    ap.add_argument("--lta-s", type=float, default=0.02, help="Long-term time constant (s). Default: 0.02")
+    ap.add_argument("--on-ratio", type=float, default=5.0, help="STA/LTA trigger ratio. Default: 5")
+    ap.add_argument("--off-ratio", type=float, default=1.5, help="STA/LTA re-arm ratio. Default: 1.5")
+    ap.add_argument("--energy-threshold", type=float, default=None, help="Short-term RMS threshold (energy mode).")
+    ap.add_argument("--min-channels", type=int, default=1, help="Channels required for a detection. Default: 1")
+    ap.add_argument("--coincidence-s", type=float, default=0.001, help="Coincidence window (s). Default: 0.001")
+    ap.add_argument("--block-size", type=int, default=256, help="Samples per processing block. Default: 256")
+
+    args = ap.parse_args(argv)
+    if args.sta_s <= 0 or args.lta_s <= args.sta_s:
+        raise ValueError("Require 0 < --sta-s < --lta-s.")
+    if args.mode == "sta_lta" and not (0 < args.off_ratio < args.on_ratio):
+        raise ValueError("Require 0 < --off-ratio < --on-ratio.")
+    if args.mode == "energy" and (args.energy_threshold is None or args.energy_threshold <= 0):
+        raise ValueError("--energy-threshold (> 0) is required with --mode energy.")
+    if not (1 <= args.min_channels <= len(args.channel)):
+        raise ValueError("--min-channels must be between 1 and the number of --channel columns.")
+    if args.block_size < 2:
+        raise ValueError("--block-size must be >= 2.")
+    if args.reference_guard_s < 0:
+        raise ValueError("--reference-guard-s must be >= 0.")
+    if args.coincidence_s < 0:
+        raise ValueError("--coincidence-s must be >= 0.")
+
+    cfg = TriggerConfig(
+        mode=args.mode,
+        sta_s=args.sta_s,
+        lta_s=args.lta_s,
+        on_ratio=args.on_ratio,
+        off_ratio=args.off_ratio,
+        energy_threshold=args.energy_threshold,
+        min_channels=args.min_channels,
+        coincidence_s=args.coincidence_s,
+    )
+    if args.input == "-":
+        paths = ["-"]
+    elif os.path.isdir(args.input):
+        paths = list_csv_files(args.input)
+    else:
+        paths = [args.input]
+
+    results = [
+        run_trigger(
+            p,
+            cfg=cfg,
+            time_col=args.time_col,
+            channels=args.channel,
+            reference_col=args.reference_col,
+            reference_threshold=args.reference_threshold,
+            reference_guard_s=args.reference_guard_s,
+            block_size=args.block_size,
+        )
+        for p in paths
+    ]
+    _write_outputs(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
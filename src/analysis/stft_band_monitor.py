@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Streaming STFT Band-Energy Monitor for PVDF Channels (T-SHM-060 / T-FAT-020)
+
+Purpose
+-------
+Guided-wave and vibration monitoring needs energy per frequency band over time (bands
+taken from the FRF characterization, docs/20_Modal_Testing_FRF_Method.md), not only
+time-domain peaks. This script runs a short-time FFT over long multi-channel captures
+and writes a compact band-energy time series per channel, without ever holding a full
+spectrogram or the whole capture in memory.
+
+Method
+------
+- Rows are read as a stream; each channel keeps one overlap buffer of --fft-size samples.
+- Every --hop new samples a frame is taken: Hann (or rectangular) window, radix-2 FFT.
+  Two real channels share one complex FFT (x + i*y), which halves the transform count.
+- The one-sided power spectrum is reduced to bands with a band matrix precomputed once:
+  for each band, the bins whose centre frequency lies in [f_low, f_high) and their
+  weights. Weights are normalized so a band covering 0..fs/2 returns the mean square of
+  the windowed frame (Parseval), i.e. band values are mean-square signal units^2.
+
+Memory is O(channels * fft_size + bands), independent of capture length; output rows are
+written as frames are produced.
+
+Inputs
+------
+1) Capture CSV (.csv or .csv.gz) with a time column and channel columns (--channel, repeat).
+   The sample rate is taken from the first two timestamps and assumed constant.
+2) Bands CSV (--bands): band_id,f_low_hz,f_high_hz
+   (e.g. one band around each mode from the FRF characterization)
+
+Outputs
+-------
+- processed/stft_band_energy.csv    (frame_time_s + one column per <channel>:<band_id>)
+- processed/stft_band_summary.csv   (per channel and band: frames, mean, std, max, time of max)
+
+Usage Example
+-------------
+python3 stft_band_monitor.py \
+  --input results/T-FAT-020/RUN_x/raw/pvdf_capture.csv \
+  --bands results/T-FAT-020/RUN_x/calibration/modal_bands.csv \
+  --output results/T-FAT-020/RUN_x/processed \
+  --channel pvdf_1 --channel pvdf_2 --fft-size 1024 --hop 512
+
+Notes
+-----
+- Bands must lie inside 0..fs/2 and contain at least one FFT bin (raise --fft-size for
+  narrow bands: bin spacing is fs / fft_size).
+- --db writes 10*log10(value) instead of linear mean-square values (summary stays linear).
+- A trailing partial frame (fewer than --fft-size samples) is not analysed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import math
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, List, Optional, Sequence, Tuple
+
+from analysis_io import gz_name, open_text_read, write_csv
+from fft_utils import fft_inplace
+
+
+@dataclass(frozen=True)
+class Band:
+    band_id: str
+    f_low_hz: float
+    f_high_hz: float
+
+
+# (band, [(bin index, weight), ...]) — one sparse row of the band matrix per band
+BandRow = Tuple[Band, List[Tuple[int, float]]]
+
+
+def _load_bands(path: str) -> List[Band]:
+    with open_text_read(path) as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        missing = {"band_id", "f_low_hz", "f_high_hz"} - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Missing required columns in {path}: {sorted(missing)}")
+        bands: List[Band] = []
+        for i, r in enumerate(reader):
+            band_id = (r["band_id"] or "").strip()
+            try:
+                lo, hi = float(r["f_low_hz"]), float(r["f_high_hz"])
+            except Exception as e:
+                raise ValueError(f"Non-numeric band edge in {path} at row {i+2}") from e
+            if not band_id:
+                raise ValueError(f"Empty band_id in {path} at row {i+2}")
+            if not (0 <= lo < hi):
+                raise ValueError(f"Require 0 <= f_low_hz < f_high_hz in {path} at row {i+2}")
+            bands.append(Band(band_id=band_id, f_low_hz=lo, f_high_hz=hi))
+    if not bands:
+        raise ValueError(f"No bands in {path}")
+    if len({b.band_id for b in bands}) != len(bands):
+        raise ValueError(f"Duplicate band_id in {path}")
+    return bands
+
+
+def hann(n: int) -> List[float]:
+    return [0.5 - 0.5 * math.cos(2.0 * math.pi * i / n) for i in range(n)]  # periodic Hann
+
+
+def band_matrix(bands: Sequence[Band], fs: float, n: int, window: Sequence[float]) -> List[BandRow]:
+    """
+    Sparse band-aggregation matrix. Weight = one-sided factor / (n * sum(w^2)), so
+    sum over all bins of weight * |X_k|^2 equals the mean square of the windowed frame.
+    """
+    nyquist = fs / 2.0
+    df = fs / n
+    norm = n * sum(w * w for w in window)
+    rows: List[BandRow] = []
+    for b in bands:
+        if b.f_high_hz > nyquist + 1e-9:
+            raise ValueError(f"Band '{b.band_id}' extends above Nyquist ({nyquist:g} Hz).")
+        entries = []
+        for k in range(n // 2 + 1):
+            f = k * df
+            if b.f_low_hz <= f < b.f_high_hz or (k == n // 2 and b.f_high_hz >= nyquist and f >= b.f_low_hz):
+                one_sided = 1.0 if k == 0 or k == n // 2 else 2.0
+                entries.append((k, one_sided / norm))
+        if not entries:
+            raise ValueError(
+                f"Band '{b.band_id}' contains no FFT bin (bin spacing {df:g} Hz); increase --fft-size."
+            )
+        rows.append((b, entries))
+    return rows
+
+
+def _power_pair(re: List[float], im: List[float]) -> Tuple[List[float], List[float]]:
+    """
+    Split the FFT of x + i*y into |X_k|^2 and |Y_k|^2 for k = 0..n/2.
+    """
+    n = len(re)
+    px: List[float] = []
+    py: List[float] = []
+    for k in range(n // 2 + 1):
+        j = (n - k) % n
+        zr, zi, cr, ci = re[k], im[k], re[j], -im[j]  # Z_k and conj(Z_{n-k})
+        xr, xi = 0.5 * (zr + cr), 0.5 * (zi + ci)
+        # Y_k = (Z_k - conj(Z_{n-k})) / (2i)
+        yr, yi = 0.5 * (zi - ci), -0.5 * (zr - cr)
+        px.append(xr * xr + xi * xi)
+        py.append(yr * yr + yi * yi)
+    return px, py
+
+
+class StftBandMonitor:
+    """
+    Streaming multi-channel STFT reduced to band mean-square values.
+    """
+
+    def __init__(self, n_channels: int, fft_size: int, hop: int, window: Sequence[float], rows: List[BandRow]) -> None:
+        self.n_channels = n_channels
+        self.fft_size = fft_size
+        self.hop = hop
+        self.window = list(window)
+        self.rows = rows
+        self.buffers: List[Deque[float]] = [deque(maxlen=fft_size) for _ in range(n_channels)]
+        self.times: Deque[float] = deque(maxlen=fft_size)
+        self.n_seen = 0
+
+    def _band_values(self, power: Sequence[float]) -> List[float]:
+        return [sum(w * power[k] for k, w in entries) for _, entries in self.rows]
+
+    def _frame(self) -> List[float]:
+        """
+        Band values for the current buffers: channel-major, band-minor.
+        """
+        w = self.window
+        out: List[float] = []
+        for c in range(0, self.n_channels, 2):
+            re = [a * b for a, b in zip(self.buffers[c], w)]
+            if c + 1 < self.n_channels:
+                im = [a * b for a, b in zip(self.buffers[c + 1], w)]
+            else:
+                im = [0.0] * self.fft_size
+            fft_inplace(re, im)
+            px, py = _power_pair(re, im)
+            out.extend(self._band_values(px))
+            if c + 1 < self.n_channels:
+                out.extend(self._band_values(py))
+        return out
+
+    def push(self, t: float, values: Sequence[float]) -> Optional[Tuple[float, List[float]]]:
+        """
+        Add one sample per channel; return (frame centre time, band values) when a frame completes.
+        """
+        self.times.append(t)
+        for buf, v in zip(self.buffers, values):
+            buf.append(v)
+        self.n_seen += 1
+        if self.n_seen < self.fft_size or (self.n_seen - self.fft_size) % self.hop:
+            return None
+        return 0.5 * (self.times[0] + self.times[-1]), self._frame()
+
+
+def _iter_samples(path: str, time_col: str, channels: Sequence[str]) -> Iterator[Tuple[float, List[float]]]:
+    with open_text_read(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"CSV has no header row: {path}")
+        header = [h.strip() for h in header]
+        missing = [c for c in [time_col] + list(channels) if c not in header]
+        if missing:
+            raise ValueError(f"Missing columns in {path}: {missing}. Found: {header}")
+        ti = header.index(time_col)
+        idx = [header.index(c) for c in channels]
+        last_t = -math.inf
+        for row_idx, row in enumerate(reader):
+            if not row:
+                continue
+            try:
+                t = float(row[ti])
+                vals = [float(row[j]) for j in idx]
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"Bad or non-numeric value in {path} at row {row_idx+2}: {row!r}") from e
+            if t <= last_t:
+                raise ValueError(f"Time column must be strictly increasing in {path} (row {row_idx+2})")
+            last_t = t
+            yield t, vals
+
+
+class _RunningStat:
+    __slots__ = ("n", "mean", "m2", "max", "t_max")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max = -math.inf
+        self.t_max = math.nan
+
+    def add(self, t: float, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        if x > self.max:
+            self.max = x
+            self.t_max = t
+
+    def std_sample(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Streaming STFT band-energy monitor for AHIS PVDF channels.")
+    ap.add_argument("--input", required=True, help="Capture CSV (time + channel columns).")
+    ap.add_argument("--bands", required=True, help="Bands CSV: band_id,f_low_hz,f_high_hz")
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--time-col", default="time_s", help="Name of the time column (seconds). Default: time_s")
+    ap.add_argument("--channel", action="append", required=True, help="Channel column. Can be repeated.")
+    ap.add_argument("--fft-size", type=int, default=1024, help="Frame length (power of two). Default: 1024")
+    ap.add_argument("--hop", type=int, default=None, help="Samples between frames. Default: fft-size / 2")
+    ap.add_argument("--window", choices=["hann", "rect"], default="hann", help="Default: hann")
+    ap.add_argument("--db", action="store_true", help="Write band values as 10*log10(mean square).")
+    ap.add_argument("--gzip", action="store_true", help="Write stft_band_energy.csv.gz.")
+
+    args = ap.parse_args(argv)
+    n = args.fft_size
+    if n < 2 or n & (n - 1):
+        raise ValueError("--fft-size must be a power of two >= 2.")
+    hop = args.hop if args.hop is not None else n // 2
+    if not (1 <= hop <= n):
+        raise ValueError("--hop must be between 1 and --fft-size.")
+    if len(set(args.channel)) != len(args.channel):
+        raise ValueError("Duplicate --channel names.")
+
+    bands = _load_bands(args.bands)
+    samples = _iter_samples(args.input, args.time_col, args.channel)
+    # Peek one frame before any output is written, so a short capture leaves no file.
+    head = list(itertools.islice(samples, n))
+    if len(head) < n:
+        raise ValueError(f"Capture shorter than one frame ({len(head)} < {n} samples): {args.input}")
+    fs = 1.0 / (head[1][0] - head[0][0])
+    window = hann(n) if args.window == "hann" else [1.0] * n
+    monitor = StftBandMonitor(len(args.channel), n, hop, window, band_matrix(bands, fs, n, window))
+
+    stats = [_RunningStat() for _ in range(len(args.channel) * len(bands))]
+
+    def frames() -> Iterator[List[float]]:
+        for t, vals in itertools.chain(head, samples):
+            out = monitor.push(t, vals)
+            if out is None:
+                continue
+            t_c, values = out
+            for st, v in zip(stats, values):
+                st.add(t_c, v)
+            if args.db:
+                values = [10.0 * math.log10(v) if v > 0 else -math.inf for v in values]
+            yield [t_c] + values
+
+    names = [f"{c}:{b.band_id}" for c in args.channel for b in bands]
+    write_csv(
+        os.path.join(args.output, gz_name("stft_band_energy.csv", args.gzip)),
+        ["frame_time_s"] + names,
+        frames(),
+    )
+    write_csv(
+        os.path.join(args.output, "stft_band_summary.csv"),
+        [
+            "channel",
+            "band_id",
+            "f_low_hz",
+            "f_high_hz",
+            "n_frames",
+            "mean_ms",
+            "std_ms_sample",
+            "max_ms",
+            "t_at_max_s",
+            "sample_rate_hz",
+            "fft_size",
+            "hop",
+            "window",
+        ],
+        (
+            [c, b.band_id, b.f_low_hz, b.f_high_hz, st.n, st.mean, st.std_sample(), st.max, st.t_max, fs, n, hop, args.window]
+            for (c, b), st in zip(((c, b) for c in args.channel for b in bands), stats)
+        ),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Multi-Logger Time Alignment and Resampling (T-PRS-050 / T-IMP-011)
+
+Purpose
+-------
+Instrumented tests record PVDF/SHM channels and pressure on different loggers, each
+with its own clock and sample rate (docs/09_PoC_Test_Procedures.md: "record PVDF/SHM
+channels synchronized to pressure logs"). This script maps every logger onto the
+reference logger's clock and resamples all channels onto one common time base, so the
+leak and impact stages read a single aligned table instead of re-interpolating per file.
+
+Clock model
+-----------
+For each non-reference file:    t_ref = offset_s + scale * t_file
+(scale = 1 + drift_ppm * 1e-6). The reference file has offset 0, scale 1.
+
+Estimation methods (--method):
+- sync:  each file has a sync channel (--align-col) carrying shared sync pulses. Rising
+         crossings of --sync-threshold are detected (linear-interpolated in time). Each
+         file pulse, shifted by --initial-offset, is paired with the nearest reference
+         pulse within --pair-tolerance (default: half the smallest reference pulse
+         spacing), so loggers that started or stopped at different times still pair.
+         One pair gives offset only, two or more give offset and drift by least squares.
+         Periodic pulses are ambiguous by whole periods: set --initial-offset to within
+         half a period when the clocks are far apart.
+- xcorr: each file has a channel that sees one shared event (--align-col), e.g. the
+         impact or valve-open transient. Both are resampled to a uniform --xcorr-dt grid
+         and cross-correlated (FFT); the best lag, refined by parabolic interpolation,
+         gives the offset. Drift is assumed 0 (short records).
+
+Resampling
+----------
+The common time base is the reference file's own timestamps, or a uniform grid with
+--rate. Each channel is resampled in one merge-asof style sweep over the sorted grid
+and the sorted (clock-corrected) source times: O(n_grid + n_source) per channel.
+--interp linear interpolates between neighbours; --interp previous takes the last
+sample at or before the grid time. A grid point whose source neighbours are more than
+--tolerance seconds apart (linear) or older than --tolerance (previous) is left empty.
+
+By default the grid is trimmed to the time span covered by every file, so the aligned
+table has no empty cells except tolerance gaps; --full-range keeps the reference span.
+
+Inputs
+------
+--reference and one or more --input CSV files (.csv or .csv.gz), each with a time column
+(--time-col) and numeric channel columns. Channel names must be unique across files
+(the alignment column itself is not copied unless --keep-align-cols is set; drop other
+duplicates with --exclude-col).
+
+Outputs
+-------
+- processed/aligned_channels.csv   (time_s + every channel on the common time base)
+- processed/alignment_summary.csv  (per file: method, offset_s, drift_ppm, pairs/peak,
+                                     residual RMS, sample counts)
+
+Usage Example
+-------------
+python3 time_alignment.py \
+  --reference results/T-PRS-050/RUN_x/raw/pressure_log.csv \
+  --input results/T-PRS-050/RUN_x/raw/pvdf_daq.csv \
+  --output results/T-PRS-050/RUN_x/processed \
+  --method sync --align-col sync_v --sync-threshold 2.5
+
+Then for example:
+python3 leak_rate_metrics.py --input results/T-PRS-050/RUN_x/processed/aligned_channels.csv ...
+
+Notes
+-----
+- Time columns must be strictly increasing in every file.
+- Each logger is loaded as a TimeSeries (timeseries.py), one float64 buffer per column.
+- --align-col may be given once (same column name in every file) or once per file,
+  reference first, then inputs in order.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import statistics
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from analysis_io import gz_name, write_csv
+from fft_utils import cross_correlate
+from timeseries import TimeSeries
+
+
+@dataclass
+class LoggerFile:
+    path: str
+    name: str
+    series: TimeSeries
+
+    @property
+    def t(self) -> memoryview:
+        return self.series.t
+
+    @property
+    def channels(self) -> Dict[str, memoryview]:
+        return {name: self.series[name] for name in self.series.names}
+
+
+@dataclass(frozen=True)
+class ClockFit:
+    offset_s: float
+    scale: float
+    n_pairs: int
+    residual_rms_s: float
+    xcorr_peak: Optional[float] = None
+
+    @property
+    def drift_ppm(self) -> float:
+        return (self.scale - 1.0) * 1e6
+
+    def to_ref(self, t: float) -> float:
+        return self.offset_s + self.scale * t
+
+
+IDENTITY = ClockFit(offset_s=0.0, scale=1.0, n_pairs=0, residual_rms_s=0.0)
+
+
+def _read_logger(path: str, time_col: str) -> LoggerFile:
+    series = TimeSeries.from_csv(path, time_col, min_rows=2)
+    return LoggerFile(path=path, name=os.path.basename(path), series=series)
+
+
+def _channel(lf: LoggerFile, col: str) -> memoryview:
+    if col not in lf.series.names:
+        raise ValueError(f"Missing alignment column '{col}' in {lf.path}. Found: {sorted(lf.series.names)}")
+    return lf.series[col]
+
+
+def detect_rising_edges(t: Sequence[float], v: Sequence[float], threshold: float, min_gap_s: float) -> List[float]:
+    edges: List[float] = []
+    for i in range(1, len(v)):
+        if v[i - 1] < threshold <= v[i]:
+            te = t[i - 1] + (threshold - v[i - 1]) * (t[i] - t[i - 1]) / (v[i] - v[i - 1])
+            if edges and te - edges[-1] < min_gap_s:
+                continue
+            edges.append(te)
+    return edges
+
+
+def pair_pulses(
+    ref_edges: Sequence[float], dev_edges: Sequence[float], initial_offset: float, tolerance: Optional[float]
+) -> List[Tuple[float, float]]:
+    """
+    (ref, dev) pairs: each dev edge + initial_offset matched to the nearest reference edge
+    within `tolerance`; a reference edge is used at most once (closest dev edge wins).
+    """
+    if tolerance is None:
+        gaps = [b - a for a, b in zip(ref_edges, ref_edges[1:])]
+        tolerance = 0.5 * min(gaps) if gaps else math.inf
+    best: Dict[int, Tuple[float, float]] = {}  # ref index -> (distance, dev edge)
+    j = 0
+    for d in dev_edges:
+        target = d + initial_offset
+        while j < len(ref_edges) - 1 and abs(ref_edges[j + 1] - target) <= abs(ref_edges[j] - target):
+            j += 1
+        dist = abs(ref_edges[j] - target)
+        if dist <= tolerance and (j not in best or dist < best[j][0]):
+            best[j] = (dist, d)
+    return [(ref_edges[i], best[i][1]) for i in sorted(best)]
+
+
+def fit_clock_from_pulses(
+    ref_edges: Sequence[float],
+    dev_edges: Sequence[float],
+    *,
+    name: str,
+    initial_offset: float = 0.0,
+    tolerance: Optional[float] = None,
+) -> ClockFit:
+    if not ref_edges:
+        raise ValueError("No sync pulses found in the reference file; check --align-col/--sync-threshold.")
+    if not dev_edges:
+        raise ValueError(f"No sync pulses found in {name}; check --align-col/--sync-threshold.")
+    pairs = pair_pulses(ref_edges, dev_edges, initial_offset, tolerance)
+    if not pairs:
+        raise ValueError(
+            f"No sync pulses in {name} pair with the reference within tolerance; "
+            "check --initial-offset and --pair-tolerance."
+        )
+    ref_edges = [r for r, _ in pairs]
+    dev_edges = [d for _, d in pairs]
+    n = len(pairs)
+    if n == 1:
+        return ClockFit(offset_s=ref_edges[0] - dev_edges[0], scale=1.0, n_pairs=1, residual_rms_s=0.0)
+    mx = sum(dev_edges) / n
+    my = sum(ref_edges) / n
+    sxx = sum((x - mx) ** 2 for x in dev_edges)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(dev_edges, ref_edges))
+    if sxx <= 0:
+        raise ValueError(f"Degenerate sync pulses in {name}.")
+    scale = sxy / sxx
+    offset = my - scale * mx
+    rms = math.sqrt(sum((offset + scale * x - y) ** 2 for x, y in zip(dev_edges, ref_edges)) / n)
+    return ClockFit(offset_s=offset, scale=scale, n_pairs=n, residual_rms_s=rms)
+
+
+def _uniform(t: Sequence[float], v: Sequence[float], t0: float, t1: float, dt: float) -> List[float]:
+    """
+    Linear resample of (t, v) onto t0, t0+dt, ... <= t1 (grid assumed inside [t[0], t[-1]]).
+    """
+    n = int(math.floor((t1 - t0) / dt)) + 1
+    out: List[float] = []
+    j = 0
+    last = len(t) - 1
+    for k in range(n):
+        g = t0 + k * dt
+        while j < last - 1 and t[j + 1] <= g:
+            j += 1
+        t_a, t_b = t[j], t[j + 1]
+        w = (g - t_a) / (t_b - t_a)
+        out.append(v[j] + w * (v[j + 1] - v[j]))
+    return out
+
+
+def fit_clock_xcorr(
+    ref: LoggerFile,
+    ref_col: str,
+    dev: LoggerFile,
+    dev_col: str,
+    *,
+    dt: float,
+    window: Optional[Tuple[float, float]],
+    initial_offset: float,
+    max_lag: Optional[float],
+) -> ClockFit:
+    r0, r1 = (ref.t[0], ref.t[-1]) if window is None else window
+    r0, r1 = max(r0, ref.t[0]), min(r1, ref.t[-1])
+    if r1 - r0 < 2 * dt:
+        raise ValueError(f"Cross-correlation window is shorter than two --xcorr-dt steps for {ref.name}.")
+    if max_lag is None:
+        d0, d1 = dev.t[0], dev.t[-1]
+    else:
+        d0 = max(dev.t[0], r0 - initial_offset - max_lag)
+        d1 = min(dev.t[-1], r1 - initial_offset + max_lag)
+    if d1 - d0 < 2 * dt:
+        raise ValueError(f"{dev.name} has no samples in the search range; check --initial-offset/--max-lag.")
+
+    x = _uniform(ref.t, _channel(ref, ref_col), r0, r1, dt)
+    y = _uniform(dev.t, _channel(dev, dev_col), d0, d1, dt)
+    mx, my = sum(x) / len(x), sum(y) / len(y)
+    x = [a - mx for a in x]
+    y = [b - my for b in y]
+    c, k_min = cross_correlate(x, y)
+
+    # offset for lag k: r0 + k*dt == d0 + offset  ->  offset = r0 - d0 + k*dt
+    best = None
+    for idx, val in enumerate(c):
+        off = r0 - d0 + (k_min + idx) * dt
+        if max_lag is not None and abs(off - initial_offset) > max_lag:
+            continue
+        if best is None or val > c[best]:
+            best = idx
+    if best is None:
+        raise ValueError(f"No admissible lag for {dev.name}; widen --max-lag.")
+
+    frac = 0.0
+    if 0 < best < len(c) - 1:
+        a, b, d = c[best - 1], c[best], c[best + 1]
+        den = a - 2 * b + d
+        if den != 0:
+            frac = 0.5 * (a - d) / den
+    offset = r0 - d0 + (k_min + best + frac) * dt
+    norm = math.sqrt(sum(a * a for a in x) * sum(b * b for b in y))
+    peak = c[best] / norm if norm > 0 else 0.0
+    return ClockFit(offset_s=offset, scale=1.0, n_pairs=0, residual_rms_s=0.0, xcorr_peak=peak)
+
+
+def resample_asof(
+    src_t: Sequence[float],
+    src_v: Sequence[float],
+    grid: Sequence[float],
+    *,
+    mode: str,
+    tolerance: Optional[float],
+) -> List[Optional[float]]:
+    """
+    One forward sweep over the sorted grid and sorted source times.
+    """
+    out: List[Optional[float]] = []
+    n = len(src_t)
+    j = 0
+    t_first, t_last = src_t[0], src_t[-1]
+    for g in grid:
+        if g < t_first or g > t_last:
+            out.append(None)
+            continue
+        while j < n - 1 and src_t[j + 1] <= g:
+            j += 1
+        t_a = src_t[j]
+        if mode == "previous" or t_a == g or j == n - 1:
+            if tolerance is not None and g - t_a > tolerance:
+                out.append(None)
+            else:
+                out.append(src_v[j])
+            continue
+        t_b = src_t[j + 1]
+        if tolerance is not None and t_b - t_a > tolerance:
+            out.append(None)
+            continue
+        v_a = src_v[j]
+        out.append(v_a + (g - t_a) * (src_v[j + 1] - v_a) / (t_b - t_a))
+    return out
+
+
+def _parse_window(values: Optional[Sequence[float]]) -> Optional[Tuple[float, float]]:
+    if values is None:
+        return None
+    start, end = values
+    if end <= start:
+        raise ValueError("--event-window END must be greater than START.")
+    return start, end
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Align multi-logger AHIS channels onto one clock and time base.")
+    ap.add_argument("--reference", required=True, help="Reference logger CSV (its clock is kept).")
+    ap.add_argument("--input", action="append", required=True, help="Other logger CSV. Can be repeated.")
+    ap.add_argument("--output", required=True, help="Directory where processed outputs will be written.")
+    ap.add_argument("--time-col", default="time_s", help="Name of the time column (seconds). Default: time_s")
+    ap.add_argument("--method", choices=["sync", "xcorr"], required=True, help="Clock estimation method.")
+    ap.add_argument(
+        "--align-col",
+        action="append",
+        required=True,
+        help="Sync/event column: once for all files, or once per file (reference first).",
+    )
+    ap.add_argument("--sync-threshold", type=float, default=None, help="Rising-edge threshold (sync method).")
+    ap.add_argument("--min-pulse-gap", type=float, default=0.0, help="Ignore edges closer than this (s). Default: 0")
+    ap.add_argument("--pair-tolerance", type=float, default=None, help="Max pulse pairing distance (s).")
+    ap.add_argument("--xcorr-dt", type=float, default=None, help="Grid step for xcorr (s). Default: finest median dt")
+    ap.add_argument(
+        "--event-window",
+        type=float,
+        nargs=2,
+        metavar=("START", "END"),
+        default=None,
+        help="Reference-clock window containing the shared event (xcorr). Default: whole reference.",
+    )
+    ap.add_argument(
+        "--initial-offset", type=float, default=0.0, help="Approximate offset t_ref - t_file (s). Default: 0"
+    )
+    ap.add_argument("--max-lag", type=float, default=None, help="Search +/- this around --initial-offset (s).")
+    ap.add_argument("--rate", type=float, default=None, help="Uniform output rate (Hz). Default: reference timestamps")
+    ap.add_argument("--interp", choices=["linear", "previous"], default="linear", help="Default: linear")
+    ap.add_argument("--tolerance", type=float, default=None, help="Max source gap (s) to bridge. Default: none")
+    ap.add_argument("--full-range", action="store_true", help="Keep the whole reference span (empty cells allowed).")
+    ap.add_argument("--exclude-col", action="append", default=[], help="Channel to leave out. Can be repeated.")
+    ap.add_argument("--keep-align-cols", action="store_true", help="Also copy the sync/event columns.")
+    ap.add_argument("--gzip", action="store_true", help="Write aligned_channels.csv.gz.")
+
+    args = ap.parse_args(argv)
+    ref = _read_logger(args.reference, args.time_col)
+    devs = [_read_logger(p, args.time_col) for p in args.input]
+    files = [ref] + devs
+
+    if len(args.align_col) == 1:
+        align_cols = args.align_col * len(files)
+    elif len(args.align_col) == len(files):
+        align_cols = list(args.align_col)
+    else:
+        raise ValueError(f"--align-col must be given once or {len(files)} times (reference first).")
+    if args.method == "sync" and args.sync_threshold is None:
+        raise ValueError("--sync-threshold is required with --method sync.")
+    if args.rate is not None and args.rate <= 0:
+        raise ValueError("--rate must be positive.")
+    if args.pair_tolerance is not None and args.pair_tolerance <= 0:
+        raise ValueError("--pair-tolerance must be positive.")
+    if args.tolerance is not None and args.tolerance <= 0:
+        raise ValueError("--tolerance must be positive.")
+    window = _parse_window(args.event_window)
+
+    fits: List[ClockFit] = [IDENTITY]
+    if args.method == "sync":
+        ref_edges = detect_rising_edges(ref.t, _channel(ref, align_cols[0]), args.sync_threshold, args.min_pulse_gap)
+        for lf, col in zip(devs, align_cols[1:]):
+            dev_edges = detect_rising_edges(lf.t, _channel(lf, col), args.sync_threshold, args.min_pulse_gap)
+            fits.append(
+                fit_clock_from_pulses(
+                    ref_edges,
+                    dev_edges,
+                    name=lf.name,
+                    initial_offset=args.initial_offset,
+                    tolerance=args.pair_tolerance,
+                )
+            )
+    else:
+        dt = args.xcorr_dt
+        if dt is None:
+            dt = min(statistics.median(b - a for a, b in zip(lf.t, lf.t[1:])) for lf in files)
+        if dt <= 0:
+            raise ValueError("--xcorr-dt must be positive.")
+        for lf, col in zip(devs, align_cols[1:]):
+            fits.append(
+                fit_clock_xcorr(
+                    ref,
+                    align_cols[0],
+                    lf,
+                    col,
+                    dt=dt,
+                    window=window,
+                    initial_offset=args.initial_offset,
+                    max_lag=args.max_lag,
+                )
+            )
+
+    # Channels on the reference clock.
+    mapped: List[Tuple[str, Sequence[float], Sequence[float]]] = []  # (channel, t_ref, values)
+    spans: List[Tuple[float, float]] = []
+    seen: Dict[str, str] = {}
+    for lf, fit, col in zip(files, fits, align_cols):
+        t_ref: Sequence[float] = lf.t if fit is IDENTITY else array("d", (fit.offset_s + fit.scale * x for x in lf.t))
+        spans.append((t_ref[0], t_ref[-1]))
+        for name, values in lf.channels.items():
+            if (name == col and not args.keep_align_cols) or name in args.exclude_col:
+                continue
+            if name in seen:
+                raise ValueError(f"Channel '{name}' appears in both {seen[name]} and {lf.name}; rename one column.")
+            seen[name] = lf.name
+            mapped.append((name, t_ref, values))
+    if not mapped:
+        raise ValueError("No channels to align (only time and alignment columns found).")
+
+    g0, g1 = ref.t[0], ref.t[-1]
+    if not args.full_range:
+        g0 = max(s[0] for s in spans)
+        g1 = min(s[1] for s in spans)
+        if g1 <= g0:
+            raise ValueError("Files do not overlap in time after alignment; check the alignment inputs.")
+    if args.rate is None:
+        grid: Sequence[float] = [x for x in ref.t if g0 <= x <= g1]
+    else:
+        step = 1.0 / args.rate
+        grid = [g0 + k * step for k in range(int(math.floor((g1 - g0) * args.rate + 1e-9)) + 1)]
+    if len(grid) < 2:
+        raise ValueError("Common time base has fewer than 2 samples.")
+
+    columns = [
+        resample_asof(t_ref, values, grid, mode=args.interp, tolerance=args.tolerance)
+        for _, t_ref, values in mapped
+    ]
+    write_csv(
+        os.path.join(args.output, gz_name("aligned_channels.csv", args.gzip)),
+        [args.time_col] + [name for name, _, _ in mapped],
+        ([g] + ["" if c[k] is None else c[k] for c in columns] for k, g in enumerate(grid)),
+    )
+    write_csv(
+        os.path.join(args.output, "alignment_summary.csv"),
+        [
+            "file",
+            "role",
+            "method",
+            "align_col",
+            "offset_s",
+            "drift_ppm",
+            "n_sync_pairs",
+            "sync_residual_rms_s",
+            "xcorr_peak",
+            "n_samples",
+            "t_start_ref_s",
+            "t_end_ref_s",
+        ],
+        (
+            [
+                lf.name,
+                "reference" if i == 0 else "input",
+                "" if i == 0 else args.method,
+                col,
+                fit.offset_s,
+                fit.drift_ppm,
+                fit.n_pairs if args.method == "sync" and i > 0 else "",
+                fit.residual_rms_s if args.method == "sync" and i > 0 else "",
+                "" if fit.xcorr_peak is None else fit.xcorr_peak,
+                len(lf.t),
+                span[0],
+                span[1],
+            ]
+            for i, (lf, fit, col, span) in enumerate(zip(files, fits, align_cols, spans))
+        ),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+AHIS PoC Analysis — Compact Column-Oriented TimeSeries
+
+Purpose
+-------
+Shared in-memory container for sampled logs (pressure logs, impact waveforms, logger
+files for alignment, saved full-rate time series). Each column is one contiguous
+float64 buffer (array('d')) instead of one Python object per sample, which cuts memory
+several-fold on long logs (8 bytes per value instead of a per-row object or string
+dict) and lets parsed logs sit in the analysis worker's read cache cheaply.
+
+This module is imported by the scripts in src/analysis/. It has no CLI.
+
+Model
+-----
+- A time column plus named value columns, all the same length, each with an optional
+  unit string.
+- Columns are exposed as read-only memoryviews. Slicing (slice(), window()) shares the
+  underlying buffers: a view of a 10-million-sample log costs a few hundred bytes.
+- window(t_start, t_end) finds the sample range by binary search (bisect) on the time
+  column, so it needs a strictly increasing time base; load with increasing=False only
+  for data that is never windowed.
+- with_column() returns a new TimeSeries with one more column; the original (which may
+  be shared through the read cache) is never modified.
+
+Usage Example
+-------------
+from timeseries import TimeSeries
+
+ts = TimeSeries.from_csv("raw/pressure_log.csv", "time_s", ["pressure_pa"], units={"pressure_pa": "Pa"})
+onset = ts.window(120.0, 122.0)          # zero-copy view
+mean_p = sum(onset["pressure_pa"]) / len(onset)
+
+Notes
+-----
+- NumPy is not a dependency of this repo; memoryviews over array('d') give the same
+  contiguous layout (numpy.frombuffer(ts["col"]) works without a copy if you have it).
+- Parsing is strict: missing columns, non-numeric cells and (by default)
+  non-increasing time raise ValueError with the file, row and column.
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import sys
+from array import array
+from typing import BinaryIO, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from analysis_io import open_text_read
+
+Column = Union[array, memoryview, Sequence[float]]
+
+# Column layout of leak_rate_timeseries.f64 (written by leak_rate_metrics.py, read by
+# leak_decay_fit.py), kept here so the reader does not import the writer.
+LEAK_TIMESERIES_COLUMNS = ("time_s", "pressure", "dp_dt_per_s")
+
+
+def _as_view(values: Column) -> memoryview:
+    if isinstance(values, memoryview):
+        if values.format != "d" or values.ndim != 1:
+            raise ValueError("TimeSeries columns must be 1-D float64 buffers")
+        return values.toreadonly()
+    if not isinstance(values, array) or values.typecode != "d":
+        values = array("d", values)
+    return memoryview(values).toreadonly()
+
+
+class TimeSeries:
+    """
+    Named float64 columns on a shared time base. Columns are read-only memoryviews.
+    """
+
+    __slots__ = ("time_name", "_cols", "_units")
+
+    def __init__(
+        self,
+        time: Column,
+        columns: Mapping[str, Column],
+        *,
+        time_name: str = "time_s",
+        units: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        cols: Dict[str, memoryview] = {time_name: _as_view(time)}
+        n = len(cols[time_name])
+        for name, values in columns.items():
+            if name in cols:
+                raise ValueError(f"Duplicate column '{name}'")
+            view = _as_view(values)
+            if len(view) != n:
+                raise ValueError(f"Column '{name}' has {len(view)} samples, time has {n}")
+            cols[name] = view
+        self.time_name = time_name
+        self._cols = cols
+        self._units = dict(units or {})
+
+    # Pickling (process pools) copies the viewed range into fresh arrays.
+    def __reduce__(self):  # type: ignore[no-untyped-def]
+        cols = {k: array("d", v) for k, v in self._cols.items() if k != self.time_name}
+        return (_rebuild, (array("d", self.t), cols, self.time_name, self._units))
+
+    def __len__(self) -> int:
+        return len(self._cols[self.time_name])
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._cols
+
+    def __getitem__(self, name: str) -> memoryview:
+        try:
+            return self._cols[name]
+        except KeyError:
+            raise ValueError(f"Missing column '{name}'. Found: {self.names}") from None
+
+    @property
+    def t(self) -> memoryview:
+        return self._cols[self.time_name]
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Value column names (excluding time), in file order.
+        """
+        return [k for k in self._cols if k != self.time_name]
+
+    def unit(self, name: str) -> str:
+        return self._units.get(name, "")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self._cols.values())
+
+    def slice(self, lo: int, hi: int) -> "TimeSeries":
+        """
+        Samples [lo, hi) as a view sharing this series' buffers.
+        """
+        out = TimeSeries.__new__(TimeSeries)
+        out.time_name = self.time_name
+        out._cols = {k: v[lo:hi] for k, v in self._cols.items()}
+        out._units = self._units
+        return out
+
+    def index_at(self, t: float) -> int:
+        """
+        Index of the first sample with time >= t (len(self) if none).
+        """
+        return bisect.bisect_left(self.t, t)
+
+    def window_bounds(self, t_start: float, t_end: float) -> Tuple[int, int]:
+        """
+        (lo, hi) such that samples lo..hi-1 have t_start <= t <= t_end.
+        """
+        t = self.t
+        lo = bisect.bisect_left(t, t_start)
+        return lo, max(lo, bisect.bisect_right(t, t_end))
+
+    def window(self, t_start: float, t_end: float) -> "TimeSeries":
+        return self.slice(*self.window_bounds(t_start, t_end))
+
+    def with_column(self, name: str, values: Column, unit: str = "") -> "TimeSeries":
+        """
+        New series with an extra column; existing buffers are shared, not copied.
+        """
+        cols = {k: v for k, v in self._cols.items() if k != self.time_name}
+        cols[name] = values  # type: ignore[assignment]
+        units = dict(self._units)
+        if unit:
+            units[name] = unit
+        return TimeSeries(self.t, cols, time_name=self.time_name, units=units)
+
+    def write_f64(self, f: BinaryIO, names: Optional[Sequence[str]] = None) -> None:
+        """
+        Write time then the given (default: all) columns as little-endian float64,
+        column-major (one contiguous block per column).
+        """
+        for name in [self.time_name] + list(self.names if names is None else names):
+            view = self[name]
+            if sys.byteorder == "little":
+                f.write(view)
+            else:
+                col = array("d", view)
+                col.byteswap()
+                col.tofile(f)
+
+    @classmethod
+    def from_f64(
+        cls,
+        path: str,
+        names: Sequence[str],
+        *,
+        time_name: str = "time_s",
+        units: Optional[Mapping[str, str]] = None,
+    ) -> "TimeSeries":
+        """
+        Load a file written by write_f64(): time plus `names`, in that order.
+        """
+        data = array("d")
+        with open(path, "rb") as f:
+            data.frombytes(f.read())
+        if sys.byteorder != "little":
+            data.byteswap()
+        k = len(names) + 1
+        if len(data) % k != 0:
+            raise ValueError(f"Corrupt timeseries file (length not a multiple of {k} columns): {path}")
+        n = len(data) // k
+        view = memoryview(data)
+        return cls(
+            view[:n],
+            {name: view[(j + 1) * n : (j + 2) * n] for j, name in enumerate(names)},
+            time_name=time_name,
+            units=units,
+        )
+
+    @classmethod
+    def from_csv(
+        cls,
+        path: str,
+        time_col: str,
+        columns: Optional[Iterable[str]] = None,
+        *,
+        units: Optional[Mapping[str, str]] = None,
+        increasing: bool = True,
+        min_rows: int = 1,
+    ) -> "TimeSeries":
+        """
+        Parse `time_col` and `columns` (default: every other column) from a CSV
+        (.csv or gzip). Other columns are not parsed. Blank lines are skipped. With the
+        default (all columns) every row must have exactly as many fields as the header.
+        """
+        with open_text_read(path) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"CSV has no header row: {path}")
+            header = [h.strip() for h in header]
+            if time_col not in header:
+                raise ValueError(f"Missing time column '{time_col}' in {path}. Found: {header}")
+            names = [h for h in header if h != time_col] if columns is None else list(columns)
+            for name in names:
+                if name not in header:
+                    raise ValueError(f"Missing column '{name}' in {path}. Found: {header}")
+            wanted = [time_col] + names
+            idx = [header.index(c) for c in wanted]
+            # Parsing every column: rows must match the header exactly (no stray fields).
+            need = max(idx) + 1
+            exact = columns is None
+            bufs = [array("d") for _ in wanted]
+            appends = [b.append for b in bufs]
+            for row_idx, row in enumerate(reader):
+                if not row:
+                    continue
+                if len(row) < need or (exact and len(row) != len(header)):
+                    raise ValueError(f"Row {row_idx+2} in {path} has {len(row)} fields, expected {len(header)}")
+                for j, col, append in zip(idx, wanted, appends):
+                    try:
+                        append(float(row[j]))
+                    except ValueError as e:
+                        raise ValueError(
+                            f"Non-numeric value in {path} at row {row_idx+2} col '{col}': {row[j]!r}"
+                        ) from e
+
+        t = bufs[0]
+        if len(t) < min_rows:
+            if min_rows == 1:
+                raise ValueError(f"No data rows in {path}")
+            raise ValueError(f"Need at least {min_rows} rows in {path}, found {len(t)}")
+        if increasing:
+            for i in range(1, len(t)):
+                if t[i] <= t[i - 1]:
+                    raise ValueError(
+                        f"Time column must be strictly increasing. "
+                        f"Found non-increasing at index {i} (t={t[i]} <= {t[i-1]}) in {path}"
+                    )
+        return cls(t, dict(zip(names, bufs[1:])), time_name=time_col, units=units)
+
+
+def _rebuild(
+    time: array, columns: Dict[str, array], time_name: str, units: Dict[str, str]
+) -> TimeSeries:
+    return TimeSeries(time, columns, time_name=time_name, units=units)